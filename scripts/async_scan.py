@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+异步扫描与读取
+针对 open/stat 延迟很高的网络文件系统：用 asyncio 同时列出多个目录、同时读取多个文件，
+阻塞的文件系统调用在线程池中执行，并发数受限；扫描到的文件经有界队列交给读取任务
+（读取跟不上时扫描自动暂停），每读完一个文件即回调，分类可以边到达边进行。
+返回的文档顺序与 os.walk 的同步扫描完全一致
+"""
+
+import asyncio
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+import logging
+
+from document_store import DocumentStore
+
+# 默认并发数（同时进行的目录列举和文件读取数）
+DEFAULT_IO_CONCURRENCY = 16
+
+
+def _list_directory(path: Path) -> Tuple[List[str], List[Tuple[str, bool]]]:
+    """列出目录中的文件名和子目录名（子目录附带是否为符号链接），顺序与 os.walk 一致"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    try:
+                        is_symlink = entry.is_symlink()
+                    except OSError:
+                        is_symlink = False
+                    dirs.append((entry.name, is_symlink))
+                else:
+                    files.append(entry.name)
+    except OSError:
+        pass  # 与 os.walk 一致，忽略无法列出的目录
+    return files, dirs
+
+
+def scan_and_read(docs_path: Path, keep_directory: Callable[[Path], bool], is_document: Callable[[Path], bool],
+                  concurrency: int = DEFAULT_IO_CONCURRENCY, store: Optional[DocumentStore] = None,
+                  on_document: Optional[Callable[[Path], None]] = None,
+                  logger: Optional[logging.Logger] = None) -> List[Path]:
+    """并发扫描目录；指定 store 时同时读取文档放入缓存，读完后调用 on_document"""
+    return asyncio.run(_pipeline(Path(docs_path), keep_directory, is_document, max(1, concurrency),
+                                 store, on_document, logger or logging.getLogger(__name__)))
+
+
+async def _pipeline(docs_path: Path, keep_directory, is_document, concurrency: int,
+                    store: Optional[DocumentStore], on_document, logger: logging.Logger) -> List[Path]:
+    loop = asyncio.get_running_loop()
+    listings: Dict[Path, Tuple[List[Path], List[Path]]] = {}
+    # 队列有界：读取任务跟不上时扫描在 put 处等待（背压）
+    queue: "asyncio.Queue[Optional[Path]]" = asyncio.Queue(maxsize=concurrency * 2)
+    errors: List[BaseException] = []
+
+    async def scan(path: Path):
+        file_names, dir_entries = await loop.run_in_executor(executor, _list_directory, path)
+        files = [path / name for name in file_names if is_document(path / name)]
+        dirs = [path / name for name, _ in dir_entries if keep_directory(path / name)]
+        listings[path] = (files, dirs)
+        if store is not None:
+            for file_path in files:
+                await queue.put(file_path)
+        # os.walk 默认不进入指向目录的符号链接
+        subdirs = {name for name, is_symlink in dir_entries if not is_symlink}
+        await asyncio.gather(*(scan(d) for d in dirs if d.name in subdirs))
+
+    async def read():
+        while True:
+            doc_path = await queue.get()
+            if doc_path is None:
+                return
+            if errors:
+                continue  # 已经出错时只清空队列，避免扫描在 put 处永久等待
+            try:
+                try:
+                    st, raw = await loop.run_in_executor(executor, store.read_raw, doc_path)
+                except OSError:
+                    store.read_text(doc_path)  # 同步重试一次，失败时记录警告
+                else:
+                    # 解码和写入缓存在事件循环线程中进行，DocumentStore 无需加锁
+                    store.add_raw(doc_path, st, raw)
+                if on_document is not None:
+                    on_document(doc_path)
+            except Exception as e:
+                errors.append(e)
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="doc-io") as executor:
+        readers = [asyncio.create_task(read()) for _ in range(concurrency)] if store is not None else []
+        try:
+            await scan(docs_path)
+        finally:
+            for _ in readers:
+                await queue.put(None)
+            await asyncio.gather(*readers)
+    if errors:
+        raise errors[0]
+
+    # 按 os.walk 的先序顺序（先本目录文件，再依次进入子目录）还原文档顺序
+    documents: List[Path] = []
+    stack = [docs_path]
+    while stack:
+        files, dirs = listings.get(stack.pop(), ([], []))
+        documents.extend(files)
+        stack.extend(reversed(dirs))
+    logger.debug(f"异步扫描完成: {len(listings)} 个目录, {len(documents)} 个文档, 并发数 {concurrency}")
+    return documents
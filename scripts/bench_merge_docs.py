@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档合并脚本基准测试
+在合成语料上分阶段计时（备份、扫描、分类、主文档选择、关键信息提取、写入、删除），
+覆盖 DocumentMerger 和 EnhancedDocumentMerger，结果保存为JSON便于对比不同版本
+"""
+
+import json
+import os
+import platform
+import shutil
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from doc_metrics import RunMetrics, peak_rss_bytes
+from generate_docs_corpus import generate_corpus
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+from merged_writer import write_chunks
+
+MERGERS = {
+    "DocumentMerger": DocumentMerger,
+    "EnhancedDocumentMerger": EnhancedDocumentMerger,
+}
+
+STAGES = ["backup", "scan", "classify", "master_selection", "extract", "write", "delete"]
+
+
+def bench_merger(merger_cls, corpus_path: Path, workdir: Path, jobs: int) -> dict:
+    """在语料副本上分阶段执行一次完整的合并流程"""
+    docs_path = workdir / "docs"
+    shutil.copytree(corpus_path, docs_path)
+
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        merger = merger_cls(str(docs_path), jobs=jobs)
+        timer = RunMetrics(merger_cls.__name__)
+
+        with timer.stage("backup"):
+            merger.create_backup()
+        with timer.stage("scan"):
+            documents = merger.scan_documents()
+        with timer.stage("classify"):
+            theme_groups = merger.classify_by_theme(documents)
+
+        masters = {}
+        with timer.stage("master_selection"):
+            for theme, docs in theme_groups.items():
+                if len(docs) > 1:
+                    masters[theme] = merger.select_master_document(docs)
+
+        deleted = 0
+        for theme, master_doc in masters.items():
+            docs = theme_groups[theme]
+            merged_path = merger.merged_output_path(theme, master_doc)
+            with timer.stage("extract"):
+                chunks = list(merger.iter_merged_content(docs, master_doc))
+            with timer.stage("write"):
+                write_chunks(merged_path, chunks)
+            del chunks
+            with timer.stage("delete"):
+                for doc in docs:
+                    if doc != merged_path:
+                        doc.unlink()
+                        deleted += 1
+
+        empty_stage = {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0}
+        stages = {stage: timer.stages.get(stage, empty_stage) for stage in STAGES}
+        return {
+            "stages": stages,
+            "total_wall_seconds": sum(stage["wall_seconds"] for stage in stages.values()),
+            "documents": len(documents),
+            "themes": len(theme_groups),
+            "merged_themes": len(masters),
+            "deleted": deleted,
+            "store": dict(merger.store.stats),
+            "peak_rss_bytes": peak_rss_bytes(),
+        }
+    finally:
+        os.chdir(cwd)
+
+
+def compare_results(current: dict, baseline: dict):
+    """逐阶段对比两次基准测试结果"""
+    print("\n📊 与基准结果对比（当前 / 基准）")
+    for size, mergers in current["results"].items():
+        for name, result in mergers.items():
+            base = baseline.get("results", {}).get(size, {}).get(name)
+            if not base:
+                continue
+            print(f"\n{name} @ {size} 个文档")
+            for stage in STAGES:
+                now = result["stages"][stage]["wall_seconds"]
+                before = base["stages"].get(stage, {}).get("wall_seconds", 0.0)
+                ratio = f"{now / before:.2f}x" if before > 0 else "-"
+                print(f"  {stage:<17} {now:10.3f}s {before:10.3f}s  {ratio}")
+
+
+def run_benchmarks(sizes: List[int], merger_names: List[str], jobs: int, seed: int,
+                   corpus: Optional[str], keep_workdir: bool) -> dict:
+    workdir = Path(tempfile.mkdtemp(prefix="bench_merge_docs_"))
+    results: Dict[str, Dict[str, dict]] = {}
+    corpora = {}
+    try:
+        for size in sizes:
+            if corpus:
+                corpus_path = Path(corpus)
+                corpus_stats = {"files": None, "bytes": None, "seed": None, "path": str(corpus_path)}
+            else:
+                corpus_path = workdir / f"corpus-{size}"
+                print(f"📄 生成 {size} 个文档的合成语料...")
+                corpus_stats = generate_corpus(str(corpus_path), size, seed=seed)
+            corpora[str(size)] = corpus_stats
+
+            results[str(size)] = {}
+            for name in merger_names:
+                run_dir = workdir / f"run-{name}-{size}"
+                run_dir.mkdir()
+                print(f"⏱️ {name} @ {size} 个文档...")
+                result = bench_merger(MERGERS[name], corpus_path, run_dir, jobs)
+                results[str(size)][name] = result
+                print(f"   总计 {result['total_wall_seconds']:.3f}s " + ", ".join(
+                    f"{stage} {result['stages'][stage]['wall_seconds']:.3f}s" for stage in STAGES))
+                if not keep_workdir:
+                    shutil.rmtree(run_dir)
+    finally:
+        if keep_workdir:
+            print(f"📁 工作目录已保留: {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    return {
+        "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "jobs": jobs,
+        "corpora": corpora,
+        "results": results,
+    }
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='文档合并脚本基准测试')
+    parser.add_argument('--files', type=int, nargs='+', default=[1000],
+                        help='合成语料的文档数量，可指定多个规模（如 1000 10000 100000）')
+    parser.add_argument('--corpus', help='使用已有的文档目录代替合成语料')
+    parser.add_argument('--merger', choices=list(MERGERS), action='append',
+                        help='只测试指定的合并器（默认全部）')
+    parser.add_argument('--jobs', type=int, default=1, help='分类阶段的并行进程数')
+    parser.add_argument('--seed', type=int, default=42, help='合成语料的随机种子')
+    parser.add_argument('--output', help='结果JSON文件（默认 bench_results/merge_docs_时间戳.json）')
+    parser.add_argument('--baseline', help='与之前保存的结果JSON对比')
+    parser.add_argument('--keep-workdir', action='store_true', help='保留临时工作目录')
+    parser.add_argument('--log', action='store_true', help='保留合并器的INFO日志输出（默认关闭以免影响计时）')
+
+    args = parser.parse_args()
+
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    report = run_benchmarks(args.files, args.merger or list(MERGERS), args.jobs, args.seed,
+                            args.corpus, args.keep_workdir)
+
+    output = Path(args.output or f"bench_results/merge_docs_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"💾 基准测试结果已保存: {output}")
+
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            compare_results(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+压缩文档的透明读写
+归档的文档和报告常以压缩形式保存（.md.gz、.md.zst、.txt.xz 等）。读取时流式解压，
+只需要文档开头时只解压所需的部分；合并文档和备份快照也可以选择压缩写出。
+gzip 和 xz 使用标准库，zstd 需要安装 zstandard（未安装时不识别 .zst 文件）
+"""
+
+import gzip
+import io
+import lzma
+import zlib
+from pathlib import Path
+from typing import BinaryIO, Iterable, Iterator, List, Optional, Union
+
+try:
+    import zstandard
+except ImportError:  # zstandard 为可选依赖
+    zstandard = None
+
+# 压缩扩展名 → 格式名
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.xz': 'xz', '.zst': 'zstd'}
+
+# 可以压缩保存的文档类型（.docx 本身已是 zip 包）
+COMPRESSIBLE_SUFFIXES = {'.md', '.txt'}
+
+# 解压损坏或被截断的文件时可能抛出的异常
+DECOMPRESSION_ERRORS = (OSError, EOFError, ValueError, lzma.LZMAError) + (
+    (zstandard.ZstdError,) if zstandard is not None else ())
+
+# gzip 压缩级别（与 zlib 默认一致，兼顾速度和压缩率）
+GZIP_LEVEL = 6
+
+
+# 当前环境支持的压缩扩展名
+AVAILABLE_COMPRESSIONS = frozenset(suffix for suffix in COMPRESSION_SUFFIXES if suffix != '.zst' or zstandard is not None)
+
+
+def compression_of(path: Union[str, Path]) -> Optional[str]:
+    """文件的压缩扩展名（如 .gz），未压缩或格式不受支持时返回None"""
+    suffix = Path(path).suffix.lower()
+    return suffix if suffix in AVAILABLE_COMPRESSIONS else None
+
+
+def logical_path(path: Path) -> Path:
+    """去掉压缩扩展名后的路径（a.md.gz → a.md）"""
+    return path.with_suffix('') if compression_of(path) else path
+
+
+def document_suffix(path: Path) -> str:
+    """文档类型扩展名（小写，不含压缩扩展名）"""
+    return logical_path(path).suffix.lower()
+
+
+def document_stem(path: Path) -> str:
+    """文档名（不含文档类型和压缩扩展名）"""
+    return logical_path(path).stem
+
+
+def compressed_variants(path: Path) -> List[Path]:
+    """同一文档以其他格式（未压缩或其他压缩格式）保存时的路径"""
+    base = logical_path(path)
+    candidates = [base] + [base.with_name(base.name + suffix) for suffix in sorted(AVAILABLE_COMPRESSIONS)]
+    return [candidate for candidate in candidates if candidate != path]
+
+
+def is_supported_document(path: Path, suffixes: Iterable[str]) -> bool:
+    """文件是否为 suffixes 中的文档类型（压缩保存时只接受纯文本文档）"""
+    if compression_of(path) is None:
+        return path.suffix.lower() in suffixes
+    suffix = document_suffix(path)
+    return suffix in suffixes and suffix in COMPRESSIBLE_SUFFIXES
+
+
+def open_decompressed(source: BinaryIO, compression: Optional[str]) -> BinaryIO:
+    """在已打开的文件上流式解压（未压缩时原样返回）；zstd 解压流不支持回退"""
+    if compression is None:
+        return source
+    if compression == '.gz':
+        return gzip.GzipFile(fileobj=source, mode='rb')
+    if compression == '.xz':
+        return lzma.LZMAFile(source, mode='rb')
+    if compression == '.zst' and zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(source, read_across_frames=True)
+    raise ValueError(f"不支持的压缩格式: {compression}")
+
+
+def read_up_to(stream: BinaryIO, size: int) -> bytes:
+    """读取至多 size 个字节（解压流单次读取可能返回更少的字节）"""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        parts.append(chunk)
+        remaining -= len(chunk)
+    return b''.join(parts)
+
+
+def decompress(data: bytes, compression: Optional[str]) -> bytes:
+    """解压整个文件的内容（未压缩时原样返回）"""
+    if compression is None:
+        return data
+    with open_decompressed(io.BytesIO(data), compression) as stream:
+        return stream.read()
+
+
+def _compressor(compression: str):
+    if compression == '.gz':
+        return zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)  # gzip 格式
+    if compression == '.xz':
+        return lzma.LZMACompressor()
+    if compression == '.zst' and zstandard is not None:
+        return zstandard.ZstdCompressor().compressobj()
+    raise ValueError(f"不支持的压缩格式: {compression}")
+
+
+def iter_compressed(chunks: Iterable[Union[str, bytes]], compression: Optional[str],
+                    encoding: str = 'utf-8') -> Iterator[Union[str, bytes]]:
+    """流式压缩内容片段（文本片段先编码），未指定压缩格式时原样产出"""
+    if compression is None:
+        yield from chunks
+        return
+    compressor = _compressor(compression)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode(encoding) if isinstance(chunk, str) else chunk)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档全文索引
+在 SQLite FTS5 中持久化文档的标题、各级标题、正文、所属主题和重要性得分，
+每次运行只重新索引新增或变化的文档，可直接回答“哪些文档提到了某个词”而无需遍历目录
+"""
+
+import sqlite3
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+import logging
+
+INDEX_VERSION = 1
+
+# trigram 分词器支持中文任意子串检索（需要 SQLite 3.34+），不可用时退回 unicode61
+TOKENIZERS = ["trigram", "unicode61"]
+
+# trigram 分词器只能用 MATCH 检索长度不少于3个字符的词，更短的词改用 LIKE
+MIN_MATCH_LENGTH = 3
+
+
+def extract_headings(content: str) -> str:
+    """提取 Markdown 标题行（跳过代码块中以 # 开头的注释）"""
+    headings = []
+    in_fence = False
+    for line in content.split('\n'):
+        stripped = line.strip()
+        if stripped.startswith('```'):
+            in_fence = not in_fence
+        elif not in_fence and stripped.startswith('#'):
+            heading = stripped.lstrip('#')
+            if heading.startswith(' '):
+                headings.append(heading.strip())
+    return '\n'.join(headings)
+
+
+def quote_term(term: str) -> str:
+    """按短语检索，避免用户输入被解析为 FTS5 查询语法"""
+    return '"' + term.replace('"', '""') + '"'
+
+
+def like_pattern(term: str) -> str:
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+class DocumentIndex:
+    def __init__(self, index_path: Path, logger: Optional[logging.Logger] = None):
+        self.index_path = Path(index_path)
+        self.logger = logger or logging.getLogger(__name__)
+        self.conn: Optional[sqlite3.Connection] = None
+        self.tokenizer: Optional[str] = None
+
+    def open(self) -> "DocumentIndex":
+        """打开（必要时创建）索引；SQLite 未编译 FTS5 时抛出 RuntimeError"""
+        self.index_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(str(self.index_path))
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+        meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+        if meta.get("version") != str(INDEX_VERSION):
+            self._create_schema()
+        else:
+            self.tokenizer = meta.get("tokenizer")
+        return self
+
+    def _create_schema(self):
+        self.conn.execute("DROP TABLE IF EXISTS documents")
+        self.conn.execute("DROP TABLE IF EXISTS documents_fts")
+        self.conn.execute(
+            "CREATE TABLE documents ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER, mtime_ns INTEGER, "
+            "hash TEXT, theme TEXT, score INTEGER, length INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX documents_theme ON documents (theme)")
+
+        for tokenizer in TOKENIZERS:
+            try:
+                self.conn.execute(
+                    f"CREATE VIRTUAL TABLE documents_fts USING fts5(title, headings, body, tokenize='{tokenizer}')"
+                )
+                self.tokenizer = tokenizer
+                break
+            except sqlite3.OperationalError as e:
+                last_error = e
+        else:
+            self.conn.close()
+            self.conn = None
+            raise RuntimeError(f"SQLite 不支持 FTS5 全文索引: {last_error}")
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)",
+            [("version", str(INDEX_VERSION)), ("tokenizer", self.tokenizer)],
+        )
+        self.conn.commit()
+
+    def get(self, key: str) -> Optional[Dict]:
+        row = self.conn.execute("SELECT * FROM documents WHERE path = ?", (key,)).fetchone()
+        return dict(row) if row else None
+
+    def upsert(self, key: str, size: int, mtime_ns: int, content_hash: str, theme: Optional[str],
+               score: Optional[int], length: int, title: str, content: str):
+        """写入或替换文档的元数据和全文"""
+        row = self.conn.execute("SELECT id FROM documents WHERE path = ?", (key,)).fetchone()
+        if row:
+            doc_id = row["id"]
+            self.conn.execute(
+                "UPDATE documents SET size = ?, mtime_ns = ?, hash = ?, theme = ?, score = ?, length = ? "
+                "WHERE id = ?",
+                (size, mtime_ns, content_hash, theme, score, length, doc_id),
+            )
+            self.conn.execute("DELETE FROM documents_fts WHERE rowid = ?", (doc_id,))
+        else:
+            doc_id = self.conn.execute(
+                "INSERT INTO documents (path, size, mtime_ns, hash, theme, score, length) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, size, mtime_ns, content_hash, theme, score, length),
+            ).lastrowid
+        self.conn.execute(
+            "INSERT INTO documents_fts (rowid, title, headings, body) VALUES (?, ?, ?, ?)",
+            (doc_id, title, extract_headings(content), content),
+        )
+
+    def update_meta(self, key: str, theme: Optional[str], score: Optional[int]):
+        """文档内容未变化时只更新主题和得分（未知的值保留原值）"""
+        self.conn.execute(
+            "UPDATE documents SET theme = COALESCE(?, theme), score = COALESCE(?, score) WHERE path = ?",
+            (theme, score, key),
+        )
+
+    def prune(self, exists: Callable[[str], bool]) -> int:
+        """删除文件已不存在的文档，返回删除的条数"""
+        missing = [(row["id"],) for row in self.conn.execute("SELECT id, path FROM documents")
+                   if not exists(row["path"])]
+        self.conn.executemany("DELETE FROM documents_fts WHERE rowid = ?", missing)
+        self.conn.executemany("DELETE FROM documents WHERE id = ?", missing)
+        return len(missing)
+
+    def count(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+
+    def commit(self):
+        self.conn.commit()
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+            self.conn = None
+
+    def search(self, terms: List[str], theme: Optional[str] = None, limit: int = 20) -> List[Dict]:
+        """检索同时包含所有词的文档；有可匹配的词时按相关度排序，否则按重要性得分排序"""
+        if self.tokenizer == "trigram":
+            match_terms = [term for term in terms if len(term) >= MIN_MATCH_LENGTH]
+        else:
+            match_terms = list(terms)
+        like_terms = [term for term in terms if term not in match_terms]
+
+        where = []
+        params: list = []
+        if match_terms:
+            where.append("documents_fts MATCH ?")
+            params.append(" AND ".join(quote_term(term) for term in match_terms))
+            snippet = "snippet(documents_fts, 2, '[', ']', '…', 16)"
+            order = "bm25(documents_fts, 10.0, 5.0, 1.0), d.score DESC, d.path"
+        elif like_terms:
+            # 没有可用于 MATCH 的词时截取第一个词首次出现位置附近的正文
+            snippet = "substr(documents_fts.body, max(instr(documents_fts.body, ?) - 30, 1), 80)"
+            params.append(like_terms[0])
+            order = "d.score DESC, d.path"
+        else:
+            snippet = "substr(documents_fts.body, 1, 80)"
+            order = "d.score DESC, d.path"
+        for term in like_terms:
+            where.append("(" + " OR ".join(
+                f"documents_fts.{column} LIKE ? ESCAPE '\\'" for column in ("title", "headings", "body")
+            ) + ")")
+            params.extend([like_pattern(term)] * 3)
+        if theme:
+            where.append("d.theme = ?")
+            params.append(theme)
+
+        sql = (
+            f"SELECT d.path, d.theme, d.score, {snippet} AS snippet "
+            "FROM documents_fts JOIN documents d ON d.id = documents_fts.rowid"
+            + (" WHERE " + " AND ".join(where) if where else "")
+            + f" ORDER BY {order} LIMIT ?"
+        )
+        params.append(limit)
+        return [dict(row) for row in self.conn.execute(sql, params)]
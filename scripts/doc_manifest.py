@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档指纹清单
+在磁盘上持久化每个文档的路径、大小、修改时间、内容哈希、所属主题和重要性得分，
+用于增量运行时只处理新增或发生变化的文档
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+import logging
+
+from storage_backend import LocalStorage, StorageBackend
+
+MANIFEST_VERSION = 1
+
+
+def config_fingerprint(*tables) -> str:
+    """计算分类/评分配置表的指纹，配置变化时清单自动失效"""
+    payload = json.dumps(tables, ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class DocumentManifest:
+    def __init__(self, manifest_path: Path, docs_path: Path, config_hash: str,
+                 logger: Optional[logging.Logger] = None, storage: Optional[StorageBackend] = None):
+        self.manifest_path = Path(manifest_path)
+        self.docs_path = Path(docs_path)
+        self.config_hash = config_hash
+        self.logger = logger or logging.getLogger(__name__)
+        self.storage = storage or LocalStorage()
+        self.entries: Dict[str, dict] = {}
+
+    def key(self, doc_path: Path) -> str:
+        """清单中使用相对于文档目录的POSIX路径作为键"""
+        return Path(doc_path).relative_to(self.docs_path).as_posix()
+
+    def load(self) -> bool:
+        """加载清单，清单不存在、损坏或配置已变化时返回False"""
+        if not self.storage.exists(self.manifest_path):
+            return False
+        try:
+            data = json.loads(self.storage.read_bytes(self.manifest_path).decode('utf-8'))
+        except Exception as e:
+            self.logger.warning(f"⚠️ 无法读取文档清单 {self.manifest_path}: {e}")
+            return False
+
+        if data.get("version") != MANIFEST_VERSION or data.get("config_hash") != self.config_hash:
+            self.logger.info("🔁 主题或评分配置已变化，文档清单失效")
+            return False
+        if Path(data.get("docs_path", "")).resolve() != self.docs_path.resolve():
+            self.logger.info(f"🔁 文档清单记录的是 {data.get('docs_path')}，与当前文档目录不一致，清单失效")
+            return False
+
+        self.entries = data.get("files", {})
+        return True
+
+    def save(self):
+        """原子写入清单文件"""
+        data = {
+            "version": MANIFEST_VERSION,
+            "docs_path": str(self.docs_path.resolve()),
+            "config_hash": self.config_hash,
+            "files": self.entries,
+        }
+        payload = json.dumps(data, ensure_ascii=False, indent=2, sort_keys=True)
+        self.storage.write_bytes(self.manifest_path, payload.encode('utf-8'))
+
+    def get(self, doc_path: Path) -> Optional[dict]:
+        return self.entries.get(self.key(doc_path))
+
+    def is_unchanged(self, doc_path: Path, st: os.stat_result) -> bool:
+        """仅根据stat判断文档是否未变化（不读取文件内容）"""
+        entry = self.get(doc_path)
+        return (entry is not None
+                and entry.get("size") == st.st_size
+                and entry.get("mtime_ns") == st.st_mtime_ns)
+
+    def removed(self, documents: Iterable[Path]) -> Dict[str, dict]:
+        """返回清单中存在但本次扫描未发现的文档"""
+        present = {self.key(doc) for doc in documents}
+        return {key: entry for key, entry in self.entries.items() if key not in present}
+
+    def replace(self, entries: Dict[str, dict]):
+        self.entries = entries
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+运行指标
+记录每个阶段的墙钟时间和CPU时间、读写文件数和字节数、缓存命中次数及峰值内存，
+输出为JSON文件，并可选输出 Prometheus 文本格式，便于定时任务绘图和告警
+"""
+
+import json
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+from storage_backend import LocalStorage, StorageBackend
+
+try:
+    import resource
+except ImportError:  # Windows 没有 resource 模块
+    resource = None
+
+
+def peak_rss_bytes(who: str = "self") -> Optional[int]:
+    """进程峰值常驻内存（字节），平台不支持时返回None"""
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF if who == "self" else resource.RUSAGE_CHILDREN)
+    # Linux 以KB为单位，macOS 以字节为单位
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+
+
+class RunMetrics:
+    def __init__(self, tool: str):
+        self.tool = tool
+        self.started = datetime.now()
+        self.status = "running"
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.counters: Dict[str, int] = {
+            "documents_scanned": 0,
+            "themes": 0,
+            "themes_merged": 0,
+            "files_read": 0,
+            "bytes_read": 0,
+            "prefix_reads": 0,
+            "streamed_reads": 0,
+            "files_written": 0,
+            "bytes_written": 0,
+            "files_deleted": 0,
+            "cache_hits": 0,
+            "score_cache_hits": 0,
+            "score_cache_misses": 0,
+        }
+        self._wall_start = time.perf_counter()
+        self._cpu_start = time.process_time()
+
+    @contextmanager
+    def stage(self, name: str):
+        """累计某个阶段的墙钟时间和CPU时间（同名阶段多次进入时累加）"""
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield
+        finally:
+            stage = self.stages.setdefault(name, {"wall_seconds": 0.0, "cpu_seconds": 0.0, "calls": 0})
+            stage["wall_seconds"] += time.perf_counter() - wall_start
+            stage["cpu_seconds"] += time.process_time() - cpu_start
+            stage["calls"] += 1
+
+    def add(self, counter: str, value: int = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def record_written(self, size: int):
+        self.add("files_written")
+        self.add("bytes_written", size)
+
+    def to_dict(self) -> dict:
+        return {
+            "tool": self.tool,
+            "status": self.status,
+            "started": self.started.strftime('%Y-%m-%d %H:%M:%S'),
+            "wall_seconds": time.perf_counter() - self._wall_start,
+            "cpu_seconds": time.process_time() - self._cpu_start,
+            "peak_rss_bytes": peak_rss_bytes("self"),
+            "children_peak_rss_bytes": peak_rss_bytes("children"),
+            "stages": self.stages,
+            "counters": self.counters,
+        }
+
+    def write_json(self, path: Path, storage: Optional[StorageBackend] = None):
+        payload = json.dumps(self.to_dict(), ensure_ascii=False, indent=2)
+        (storage or LocalStorage()).write_bytes(Path(path), payload.encode('utf-8'))
+
+    def write_prometheus(self, path: Path, storage: Optional[StorageBackend] = None):
+        """以 Prometheus 文本格式写出（可供 node_exporter textfile collector 采集）"""
+        data = self.to_dict()
+        label = f'tool="{self.tool}"'
+        lines = [
+            "# HELP doc_merge_run_success 最近一次运行是否成功",
+            "# TYPE doc_merge_run_success gauge",
+            f"doc_merge_run_success{{{label}}} {1 if self.status == 'success' else 0}",
+            "# HELP doc_merge_run_timestamp_seconds 最近一次运行的开始时间",
+            "# TYPE doc_merge_run_timestamp_seconds gauge",
+            f"doc_merge_run_timestamp_seconds{{{label}}} {self.started.timestamp():.0f}",
+            "# HELP doc_merge_run_wall_seconds 整体墙钟时间",
+            "# TYPE doc_merge_run_wall_seconds gauge",
+            f"doc_merge_run_wall_seconds{{{label}}} {data['wall_seconds']:.6f}",
+            "# HELP doc_merge_run_cpu_seconds 整体CPU时间",
+            "# TYPE doc_merge_run_cpu_seconds gauge",
+            f"doc_merge_run_cpu_seconds{{{label}}} {data['cpu_seconds']:.6f}",
+            "# HELP doc_merge_stage_wall_seconds 各阶段墙钟时间",
+            "# TYPE doc_merge_stage_wall_seconds gauge",
+        ]
+        lines += [f'doc_merge_stage_wall_seconds{{{label},stage="{name}"}} {stage["wall_seconds"]:.6f}'
+                  for name, stage in self.stages.items()]
+        lines += [
+            "# HELP doc_merge_stage_cpu_seconds 各阶段CPU时间",
+            "# TYPE doc_merge_stage_cpu_seconds gauge",
+        ]
+        lines += [f'doc_merge_stage_cpu_seconds{{{label},stage="{name}"}} {stage["cpu_seconds"]:.6f}'
+                  for name, stage in self.stages.items()]
+        for name, value in self.counters.items():
+            lines += [
+                f"# TYPE doc_merge_{name} gauge",
+                f"doc_merge_{name}{{{label}}} {value}",
+            ]
+        if data["peak_rss_bytes"] is not None:
+            lines += [
+                "# HELP doc_merge_peak_rss_bytes 进程峰值常驻内存",
+                "# TYPE doc_merge_peak_rss_bytes gauge",
+                f"doc_merge_peak_rss_bytes{{{label}}} {data['peak_rss_bytes']}",
+            ]
+
+        payload = "\n".join(lines) + "\n"
+        (storage or LocalStorage()).write_bytes(Path(path), payload.encode('utf-8'))
@@ -0,0 +1,236 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档目录监视
+Linux 上通过 inotify（ctypes 调用 libc，无需第三方库）接收文件变化事件，
+其他平台或 inotify 不可用时退回按间隔比较 stat 信息；连续的编辑经过去抖后合并为一批变化
+"""
+
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterator, Optional, Set, Tuple
+import logging
+
+# 最后一次变化后等待的秒数，期间的变化合并为一批
+DEFAULT_DEBOUNCE = 0.3
+
+# 轮询模式下两次扫描之间的间隔（秒）
+DEFAULT_POLL_INTERVAL = 1.0
+
+# 一批变化最多等待的秒数（持续有变化时也不会无限推迟处理）
+MAX_BATCH_DELAY = 2.0
+
+# inotify 事件掩码（见 inotify(7)）
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+
+WATCH_MASK = (IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO
+              | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF)
+
+_EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+
+# 一批变化：变化的路径，以及是否需要全部重新检查（事件队列溢出时）
+ChangeBatch = Tuple[Set[Path], bool]
+
+
+class PollingWatcher:
+    """按间隔遍历目录、比较文件大小和修改时间"""
+
+    name = "polling"
+
+    def __init__(self, root: Path, keep_directory: Callable[[Path], bool],
+                 interval: float = DEFAULT_POLL_INTERVAL):
+        self.root = Path(root)
+        self.keep_directory = keep_directory
+        self.interval = interval
+        self._state = self._snapshot()
+        self._next_scan = time.monotonic() + interval
+
+    def _snapshot(self) -> Dict[Path, Tuple[int, int]]:
+        state = {}
+        for root, dirs, files in os.walk(self.root):
+            dirs[:] = [d for d in dirs if self.keep_directory(Path(root) / d)]
+            for file in files:
+                file_path = Path(root) / file
+                try:
+                    st = os.stat(file_path)
+                except OSError:
+                    continue
+                state[file_path] = (st.st_size, st.st_mtime_ns)
+        return state
+
+    def read_changes(self, timeout: float) -> ChangeBatch:
+        """等待至多 timeout 秒，返回这段时间内发生变化的文件"""
+        delay = self._next_scan - time.monotonic()
+        if delay > timeout:
+            time.sleep(timeout)
+            return set(), False
+        if delay > 0:
+            time.sleep(delay)
+        self._next_scan = time.monotonic() + self.interval
+
+        state = self._snapshot()
+        changed = {path for path in state.keys() | self._state.keys() if state.get(path) != self._state.get(path)}
+        self._state = state
+        return changed, False
+
+    def close(self):
+        pass
+
+
+class InotifyWatcher:
+    """递归监视目录树的 inotify 封装（新建或移入的子目录自动加入监视）
+
+    运行中新目录无法加入监视时（如监视数量达到上限 ENOSPC）改为轮询，并要求全部重新检查
+    """
+
+    name = "inotify"
+
+    def __init__(self, root: Path, keep_directory: Callable[[Path], bool],
+                 poll_interval: float = DEFAULT_POLL_INTERVAL, logger: Optional[logging.Logger] = None):
+        self.root = Path(root)
+        self.keep_directory = keep_directory
+        self.poll_interval = poll_interval
+        self.logger = logger or logging.getLogger(__name__)
+        self._fallback: Optional[PollingWatcher] = None
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 失败")
+        self._watches: Dict[int, Path] = {}
+        self._add_tree(self.root)
+
+    @classmethod
+    def available(cls) -> bool:
+        if not sys.platform.startswith('linux'):
+            return False
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6')
+            return hasattr(libc, 'inotify_init1')
+        except OSError:
+            return False
+
+    def _add_watch(self, path: Path) -> bool:
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), WATCH_MASK)
+        if wd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, f"无法监视目录 {path}: {os.strerror(errno)}")
+        self._watches[wd] = path
+        return True
+
+    def _add_tree(self, path: Path) -> Set[Path]:
+        """监视目录及其全部子目录，返回其中已有的文件（用于移入的目录）"""
+        files = set()
+        for root, dirs, filenames in os.walk(path):
+            dirs[:] = [d for d in dirs if self.keep_directory(Path(root) / d)]
+            try:
+                self._add_watch(Path(root))
+            except FileNotFoundError:
+                continue  # 目录在监视前已被删除
+            files.update(Path(root) / name for name in filenames)
+        return files
+
+    def read_changes(self, timeout: float) -> ChangeBatch:
+        """等待至多 timeout 秒，返回读到的事件对应的路径"""
+        if self._fallback is not None:
+            return self._fallback.read_changes(timeout)
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set(), False
+
+        changed: Set[Path] = set()
+        rescan = False
+        while True:
+            try:
+                data = os.read(self._fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            offset = 0
+            while offset < len(data):
+                wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+                offset += _EVENT_HEADER.size
+                name = data[offset:offset + name_len].rstrip(b'\0')
+                offset += name_len
+
+                if mask & IN_Q_OVERFLOW:
+                    rescan = True
+                    continue
+                if mask & IN_IGNORED:
+                    self._watches.pop(wd, None)
+                    continue
+                directory = self._watches.get(wd)
+                if directory is None or not name:
+                    continue
+                path = directory / os.fsdecode(name)
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE | IN_MOVED_TO) and self.keep_directory(path):
+                        try:
+                            changed.update(self._add_tree(path))
+                        except OSError as e:
+                            self._fall_back_to_polling(e)
+                            return set(), True
+                    elif mask & IN_MOVED_FROM:
+                        rescan = True  # 整个子目录被移走，无法逐个得知其中的文件
+                else:
+                    changed.add(path)
+        return changed, rescan
+
+    def _fall_back_to_polling(self, error: OSError):
+        """改为轮询：之后的变化由 PollingWatcher 比较 stat 信息得到"""
+        self.logger.warning(f"⚠️ {error}，改为轮询并重新检查全部文档")
+        self.close()
+        self._fallback = PollingWatcher(self.root, self.keep_directory, self.poll_interval)
+        self.name = self._fallback.name
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(root: Path, keep_directory: Callable[[Path], bool], polling: bool = False,
+                   poll_interval: float = DEFAULT_POLL_INTERVAL, logger: Optional[logging.Logger] = None):
+    """优先使用 inotify，不可用（非Linux、监视数量超出上限等）时退回轮询；运行中达到上限时同样改为轮询"""
+    logger = logger or logging.getLogger(__name__)
+    if not polling and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(root, keep_directory, poll_interval, logger)
+        except OSError as e:
+            logger.warning(f"⚠️ inotify 不可用，改为轮询: {e}")
+    return PollingWatcher(root, keep_directory, poll_interval)
+
+
+def iter_changes(watcher, debounce: float = DEFAULT_DEBOUNCE) -> Iterator[ChangeBatch]:
+    """持续产出去抖后的变化批次：最后一次变化后 debounce 秒内没有新变化（或最多等待 MAX_BATCH_DELAY 秒）时产出"""
+    while True:
+        changed, rescan = watcher.read_changes(timeout=1.0)
+        if not changed and not rescan:
+            continue
+        first_change = last_change = time.monotonic()
+        while True:
+            now = time.monotonic()
+            wait = min(last_change + debounce, first_change + MAX_BATCH_DELAY) - now
+            if wait <= 0:
+                break
+            more, more_rescan = watcher.read_changes(timeout=wait)
+            if more or more_rescan:
+                changed |= more
+                rescan = rescan or more_rescan
+                last_change = time.monotonic()
+        yield changed, rescan
@@ -0,0 +1,282 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档读取缓存层
+每个文档只读取一次，缓存解码后的文本及派生元数据（长度、stat、内容哈希），
+供分类、评分和合并阶段共享；文本缓存按内存上限进行LRU淘汰。
+只需要文档开头的阶段（如主题分类）可以只读取所需的字节。
+文档和Word文本缓存都经由存储后端读写（默认为本地磁盘），压缩保存的文档（.md.gz 等）读取时流式解压
+"""
+
+import hashlib
+import io
+import os
+import sys
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+
+from compressed_docs import (DECOMPRESSION_ERRORS, compression_of, decompress, document_stem,
+                             document_suffix, open_decompressed, read_up_to)
+from docx_text import extract_docx_text
+from storage_backend import LocalStorage, StorageBackend
+from line_stream import iter_file_lines, iter_lines
+from text_decoding import MAX_BYTES_PER_CHAR, SNIFF_BYTES, decode_bytes, decode_prefix, sniff_encoding
+
+# 默认文本缓存上限（字节）
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# 按文本解码的文档类型
+TEXT_SUFFIXES = {'.md', '.txt'}
+
+
+@dataclass
+class DocumentInfo:
+    """文档元数据（常驻内存，不参与LRU淘汰）"""
+    path: Path
+    size: int
+    mtime_ns: int
+    length: int
+    content_hash: str
+
+
+class DocumentStore:
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES, logger: Optional[logging.Logger] = None,
+                 text_cache_path: Optional[Path] = None, storage: Optional[StorageBackend] = None):
+        self.max_bytes = max_bytes
+        self.storage = storage or LocalStorage()
+        # Word文档提取出的文本按文件内容哈希持久化缓存，文件未变化时无需重新解析
+        self.text_cache_path = Path(text_cache_path) if text_cache_path else None
+        self.logger = logger or logging.getLogger(__name__)
+        self._texts: "OrderedDict[Path, str]" = OrderedDict()
+        self._text_sizes: Dict[Path, int] = {}
+        self._infos: Dict[Path, DocumentInfo] = {}
+        self.cached_bytes = 0
+
+        # 读取统计
+        self.stats = {
+            "files_read": 0,
+            "bytes_read": 0,
+            "cache_hits": 0,
+            "prefix_reads": 0,
+            "streamed_reads": 0,
+            "evictions": 0,
+        }
+
+    def read_text(self, doc_path: Path) -> str:
+        """读取文档文本（优先命中缓存）"""
+        text = self._texts.get(doc_path)
+        if text is not None:
+            self._texts.move_to_end(doc_path)
+            self.stats["cache_hits"] += 1
+            return text
+
+        text = self._load(doc_path)
+        self._remember(doc_path, text)
+        return text
+
+    def read_prefix(self, doc_path: Path, max_chars: int) -> str:
+        """读取文档开头的 max_chars 个字符，只读取所需的字节
+
+        全文已在缓存中或文件本身不大于所需字节数时直接读取全文（同时登记元数据），
+        因此小文件仍然只读取一次。
+        """
+        text = self._texts.get(doc_path)
+        if text is not None:
+            self._texts.move_to_end(doc_path)
+            self.stats["cache_hits"] += 1
+            return text[:max_chars]
+
+        suffix = document_suffix(doc_path)
+        compression = compression_of(doc_path)
+        budget = max_chars * MAX_BYTES_PER_CHAR + 4  # 另加BOM
+        try:
+            if suffix not in TEXT_SUFFIXES | {'.docx'} or self.storage.stat(doc_path).st_size <= budget:
+                return self.read_text(doc_path)[:max_chars]
+            if suffix == '.docx':
+                if compression:
+                    return self.read_text(doc_path)[:max_chars]
+                # 只解压 document.xml 的开头部分，读到足够的段落即停止
+                with self.storage.open_read(doc_path) as f:
+                    text = extract_docx_text(f, max_chars)
+                self.stats["prefix_reads"] += 1
+                return text[:max_chars]
+            # 压缩文档只解压开头所需的部分
+            with self.storage.open_read(doc_path) as source, open_decompressed(source, compression) as f:
+                raw = read_up_to(f, budget)
+        except DECOMPRESSION_ERRORS:
+            return self.read_text(doc_path)[:max_chars]
+
+        self.stats["prefix_reads"] += 1
+        self.stats["bytes_read"] += len(raw)
+        text = decode_prefix(raw, max_chars)
+        if text is None:
+            return self.read_text(doc_path)[:max_chars]
+        return text
+
+    def iter_lines(self, doc_path: Path) -> Iterator[str]:
+        """逐行读取文档（与 read_text(doc_path).split('\\n') 一致），调用方停止迭代后不再读取文件的其余部分
+
+        全文已缓存、不是纯文本文档或为 zstd 压缩（解压流不能回退）时从完整文本中逐行产出；
+        否则直接从文件流式解压、解码，不放入缓存。
+        文件后部出现与识别出的编码不符的字节时抛出 UnicodeDecodeError，调用方应改用 read_text
+        （完整解码时 UTF-8 文件中的不合法字节替换为 U+FFFD 并记录警告，其他编码才按兜底编码重新解码整个文件）。
+        """
+        text = self._texts.get(doc_path)
+        compression = compression_of(doc_path)
+        if text is not None or document_suffix(doc_path) not in TEXT_SUFFIXES or compression == '.zst':
+            yield from iter_lines(self.read_text(doc_path))
+            return
+
+        try:
+            source = self.storage.open_read(doc_path)
+        except OSError:
+            yield from iter_lines(self.read_text(doc_path))  # 由 read_text 记录警告
+            return
+        with source, open_decompressed(source, compression) as f:
+            sample = read_up_to(f, SNIFF_BYTES)
+            encoding = sniff_encoding(sample, complete=len(sample) < SNIFF_BYTES)
+            f.seek(0)
+            self.stats["streamed_reads"] += 1
+            reader = io.TextIOWrapper(f, encoding=encoding, errors='strict')
+            try:
+                yield from iter_file_lines(reader)
+            finally:
+                self.stats["bytes_read"] += f.tell()
+                reader.detach()
+
+    def info(self, doc_path: Path) -> DocumentInfo:
+        """获取文档元数据，必要时读取文档"""
+        if doc_path not in self._infos:
+            self.read_text(doc_path)
+        return self._infos[doc_path]
+
+    def peek_info(self, doc_path: Path) -> Optional[DocumentInfo]:
+        """获取已知的文档元数据，不触发读取"""
+        return self._infos.get(doc_path)
+
+    def add_info(self, info: DocumentInfo):
+        """登记在其他进程中读取的文档元数据（同时计入读取统计）"""
+        self._infos.setdefault(info.path, info)
+        self.stats["files_read"] += 1
+        self.stats["bytes_read"] += info.size
+
+    def invalidate(self, doc_path: Path):
+        """文档被修改或删除后移除缓存"""
+        self._forget(doc_path)
+        self._infos.pop(doc_path, None)
+
+    def clear(self):
+        """清空全部缓存"""
+        self._texts.clear()
+        self._text_sizes.clear()
+        self._infos.clear()
+        self.cached_bytes = 0
+
+    def __getstate__(self):
+        # 跨进程传递时不携带缓存内容
+        state = self.__dict__.copy()
+        state["_texts"] = OrderedDict()
+        state["_text_sizes"] = {}
+        state["_infos"] = {}
+        state["cached_bytes"] = 0
+        return state
+
+    def read_raw(self, doc_path: Path) -> Tuple[os.stat_result, bytes]:
+        """读取文档的 stat 信息和原始字节（压缩文档为解压后的字节；只做I/O、不访问缓存，可在其他线程中调用）"""
+        st = self.storage.stat(doc_path)
+        return st, decompress(self.storage.read_bytes(doc_path), compression_of(doc_path))
+
+    def add_raw(self, doc_path: Path, st: os.stat_result, raw: bytes) -> str:
+        """登记在其他线程中读取的原始字节：解码、记录元数据并放入缓存"""
+        text = self._ingest(doc_path, st, raw)
+        self._forget(doc_path)
+        self._remember(doc_path, text)
+        return text
+
+    def _load(self, doc_path: Path) -> str:
+        """从磁盘读取并解码文档，同时记录元数据"""
+        try:
+            st, raw = self.read_raw(doc_path)
+        except Exception as e:
+            self.logger.warning(f"⚠️ 无法读取文档 {doc_path}: {e}")
+            self._infos[doc_path] = DocumentInfo(path=doc_path, size=0, mtime_ns=0, length=0, content_hash="")
+            return ""
+        return self._ingest(doc_path, st, raw)
+
+    def _ingest(self, doc_path: Path, st: os.stat_result, raw: bytes) -> str:
+        self.stats["files_read"] += 1
+        self.stats["bytes_read"] += len(raw)
+
+        content_hash = hashlib.sha256(raw).hexdigest()
+        text = self.decode(doc_path, raw, content_hash)
+        self._infos[doc_path] = DocumentInfo(
+            path=doc_path,
+            size=st.st_size,
+            mtime_ns=st.st_mtime_ns,
+            length=len(text),
+            content_hash=content_hash,
+        )
+        return text
+
+    def decode(self, doc_path: Path, raw: bytes, content_hash: Optional[str] = None) -> str:
+        """按文件类型将原始字节解码为文本"""
+        suffix = document_suffix(doc_path)
+        if suffix in TEXT_SUFFIXES:
+            try:
+                text, encoding = decode_bytes(raw, str(doc_path), self.logger)
+            except UnicodeDecodeError as e:
+                self.logger.warning(f"⚠️ 无法读取文档 {doc_path}: {e}")
+                return ""
+            if encoding not in ('utf-8', 'utf-8-sig'):
+                self.logger.debug(f"🔤 {doc_path} 按 {encoding} 解码")
+            return text
+        elif suffix == '.docx':
+            return self._docx_text(doc_path, raw, content_hash or hashlib.sha256(raw).hexdigest())
+        elif suffix == '.doc':
+            # 旧版二进制Word文档无法直接解析，暂时只返回文件名
+            return document_stem(doc_path)
+        return ""
+
+    def _docx_text(self, doc_path: Path, raw: bytes, content_hash: str) -> str:
+        """提取Word文档文本（优先使用按内容哈希缓存的结果），无法解析时退回文件名"""
+        cache_file = None
+        if self.text_cache_path:
+            cache_file = self.text_cache_path / content_hash[:2] / f"{content_hash}.txt"
+            if self.storage.exists(cache_file):
+                return self.storage.read_bytes(cache_file).decode('utf-8')
+
+        try:
+            text = extract_docx_text(io.BytesIO(raw))
+        except ValueError as e:
+            self.logger.warning(f"⚠️ {doc_path}: {e}，按文件名处理")
+            return document_stem(doc_path)
+
+        if cache_file:
+            try:
+                self.storage.write_bytes(cache_file, text.encode('utf-8'))
+            except OSError as e:
+                self.logger.debug(f"Word文本缓存写入失败 {cache_file}: {e}")
+        return text
+
+    def _remember(self, doc_path: Path, text: str):
+        """将文本放入LRU缓存，超出上限时淘汰最久未使用的条目"""
+        size = sys.getsizeof(text)
+        if size > self.max_bytes:
+            return
+
+        self._texts[doc_path] = text
+        self._text_sizes[doc_path] = size
+        self.cached_bytes += size
+
+        while self.cached_bytes > self.max_bytes:
+            oldest, _ = self._texts.popitem(last=False)
+            self.cached_bytes -= self._text_sizes.pop(oldest)
+            self.stats["evictions"] += 1
+
+    def _forget(self, doc_path: Path):
+        if doc_path in self._texts:
+            del self._texts[doc_path]
+            self.cached_bytes -= self._text_sizes.pop(doc_path)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Word (.docx) 文本提取
+直接从 zip 包中流式读取 word/document.xml，用增量XML解析器逐段落产出文本，
+不构建完整的文档树；只需要开头若干字符时读到足够的段落即停止，图片等其他部件不会被读取
+"""
+
+import re
+import zipfile
+from pathlib import Path
+from typing import BinaryIO, Iterator, Optional, Union
+from xml.etree import ElementTree
+
+DOCUMENT_PART = 'word/document.xml'
+
+W_NS = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+_TEXT = W_NS + 't'
+_TAB = W_NS + 'tab'
+_BREAKS = {W_NS + 'br', W_NS + 'cr'}
+_PARAGRAPH = W_NS + 'p'
+_STYLE = W_NS + 'pStyle'
+_NUMBERING = W_NS + 'numPr'
+_VAL = W_NS + 'val'
+
+# 标题样式ID：英文版为 Heading1，中文版 Word 的“标题 1”样式ID通常为 1
+HEADING_STYLE = re.compile(r'^(?:heading\s*)?([1-6])$', re.IGNORECASE)
+
+
+def iter_docx_paragraphs(source: Union[str, Path, BinaryIO]) -> Iterator[str]:
+    """逐段落产出文本；标题段落转换为 Markdown 标题，列表段落以 "- " 开头
+
+    文档不是合法的 .docx 时抛出 ValueError。
+    """
+    try:
+        with zipfile.ZipFile(source) as archive, archive.open(DOCUMENT_PART) as xml_file:
+            parts = []
+            prefix = ''
+            for _, elem in ElementTree.iterparse(xml_file, events=('end',)):
+                tag = elem.tag
+                if tag == _TEXT:
+                    parts.append(elem.text or '')
+                elif tag == _TAB:
+                    parts.append('\t')
+                elif tag in _BREAKS:
+                    parts.append('\n')
+                elif tag == _STYLE:
+                    match = HEADING_STYLE.match(elem.get(_VAL, ''))
+                    if match:
+                        prefix = '#' * int(match.group(1)) + ' '
+                elif tag == _NUMBERING:
+                    prefix = prefix or '- '
+                elif tag == _PARAGRAPH:
+                    yield prefix + ''.join(parts)
+                    parts = []
+                    prefix = ''
+                    elem.clear()  # 已处理的段落立即释放
+    except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+        raise ValueError(f"无法解析Word文档: {e}") from e
+
+
+def extract_docx_text(source: Union[str, Path, BinaryIO], max_chars: Optional[int] = None) -> str:
+    """提取 .docx 文本（段落之间以换行分隔）；指定 max_chars 时读到足够的字符即停止"""
+    paragraphs = []
+    length = 0
+    for paragraph in iter_docx_paragraphs(source):
+        paragraphs.append(paragraph)
+        length += len(paragraph) + 1
+        if max_chars is not None and length >= max_chars:
+            break
+    return '\n'.join(paragraphs)
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合成文档语料生成器
+生成中英文混合的 Markdown / txt 文档树，用于文档合并脚本的基准测试
+"""
+
+import os
+import random
+from pathlib import Path
+from typing import Dict
+
+# 目录结构参照实际的 docs 目录
+BASE_DIRS = [
+    "fix-records",
+    "problems",
+    "design-docs",
+    "testing-reports",
+    "analysis-reports",
+    "reports/pages",
+    "reports/pages/backups",
+    "governance",
+    "legacy/archive",
+]
+
+# 每个目录最多存放的文件数，超出后分批放入子目录
+FILES_PER_DIR = 500
+
+TOPIC_WORDS = [
+    "交易记录", "记录页面", "日期筛选", "查询功能", "资产", "资产页面", "历史快照", "预算", "预算对比",
+    "家庭协作", "成员管理", "报表", "统计", "趋势图", "分析", "修复", "问题", "错误", "优化", "改进",
+    "测试", "验证", "检查", "数据库", "集合", "索引", "云开发", "界面", "交互", "导航", "安全区",
+    "技术", "接口", "架构", "设计", "兼容", "适配", "版本",
+    "transaction", "assets", "budget", "reports", "fix", "bug", "optimization", "enhancement",
+    "test", "database", "UI", "API", "compatibility",
+]
+TITLE_WORDS = ["总结", "完成", "最终", "方案", "报告", "记录", "分析", "计划", "指南", "说明", "草稿", "notes"]
+FILLER_WORDS = [
+    "页面", "数据", "用户", "功能", "模块", "组件", "加载", "显示", "提交", "保存", "同步", "刷新",
+    "the", "page", "data", "user", "should", "load", "when", "after", "before", "value", "state", "render",
+]
+KEY_LINE_WORDS = ["问题", "解决", "修复", "优化", "结果", "总结", "完成", "实现"]
+
+
+def random_sentence(rng: random.Random, min_words: int = 4, max_words: int = 18) -> str:
+    words = []
+    for _ in range(rng.randint(min_words, max_words)):
+        roll = rng.random()
+        if roll < 0.15:
+            words.append(rng.choice(TOPIC_WORDS))
+        elif roll < 0.2:
+            words.append(rng.choice(KEY_LINE_WORDS))
+        else:
+            words.append(rng.choice(FILLER_WORDS))
+    return " ".join(words)
+
+
+def random_document(rng: random.Random, topic: str) -> str:
+    """生成一篇结构接近真实文档的内容（标题、列表、代码块、分隔符）"""
+    lines = [f"# {topic} {rng.choice(TITLE_WORDS)}", ""]
+    # 文档长度呈长尾分布：多数为短文档，少数非常长
+    paragraphs = min(int(rng.lognormvariate(2.0, 1.0)) + 1, 400)
+    for _ in range(paragraphs):
+        roll = rng.random()
+        if roll < 0.15:
+            lines.append(f"## {random_sentence(rng, 2, 5)}")
+        elif roll < 0.3:
+            lines.extend(f"- {random_sentence(rng, 3, 10)}" for _ in range(rng.randint(2, 6)))
+        elif roll < 0.38:
+            lines.extend(f"{i}. {random_sentence(rng, 3, 10)}" for i in range(1, rng.randint(2, 6)))
+        elif roll < 0.45:
+            lines.append("```js")
+            lines.extend(f"const value{i} = loadData('{rng.choice(TOPIC_WORDS)}');" for i in range(rng.randint(2, 8)))
+            lines.append("```")
+        elif roll < 0.5:
+            lines.append("---")
+        else:
+            lines.append(random_sentence(rng))
+        lines.append("")
+    return "\n".join(lines)
+
+
+def generate_corpus(output_path: str, file_count: int, seed: int = 42, txt_ratio: float = 0.2) -> Dict[str, int]:
+    """生成 file_count 个文档，返回文件数和总字节数"""
+    rng = random.Random(seed)
+    output_path = Path(output_path)
+    dir_counts: Dict[str, int] = {}
+    total_bytes = 0
+
+    for index in range(file_count):
+        base_dir = rng.choice(BASE_DIRS)
+        batch = dir_counts.get(base_dir, 0) // FILES_PER_DIR
+        dir_counts[base_dir] = dir_counts.get(base_dir, 0) + 1
+        target_dir = output_path / base_dir / f"batch-{batch:04d}" if batch else output_path / base_dir
+        target_dir.mkdir(parents=True, exist_ok=True)
+
+        topic = rng.choice(TOPIC_WORDS)
+        suffix = ".txt" if rng.random() < txt_ratio else ".md"
+        filename = f"{topic}{rng.choice(TITLE_WORDS)}-{index:06d}{suffix}"
+        data = random_document(rng, topic).encode('utf-8')
+        with open(target_dir / filename, 'wb') as f:
+            f.write(data)
+        total_bytes += len(data)
+
+    return {"files": file_count, "bytes": total_bytes, "seed": seed}
+
+
+def main():
+    """主函数"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='合成文档语料生成器')
+    parser.add_argument('output', help='输出目录')
+    parser.add_argument('--files', type=int, default=1000, help='生成的文档数量')
+    parser.add_argument('--seed', type=int, default=42, help='随机种子（相同种子生成相同语料）')
+    parser.add_argument('--txt-ratio', type=float, default=0.2, help='txt文档所占比例')
+
+    args = parser.parse_args()
+
+    if os.path.exists(args.output) and os.listdir(args.output):
+        parser.error(f"输出目录非空: {args.output}")
+
+    stats = generate_corpus(args.output, args.files, seed=args.seed, txt_ratio=args.txt_ratio)
+    print(f"📄 已生成 {stats['files']} 个文档，共 {stats['bytes']} 字节: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多关键词匹配器
+将主题关键词表一次性编译为 Aho-Corasick 自动机，单次扫描文本即可得到
+所有命中的关键词，匹配开销只与文本长度相关，与关键词数量无关
+"""
+
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+
+class AhoCorasick:
+    """按字符构建的 Aho-Corasick 自动机"""
+
+    def __init__(self, keywords: Iterable[str]):
+        self.keywords: List[str] = []
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[Tuple[int, ...]] = [()]
+
+        outputs: List[List[int]] = [[]]
+        for keyword in keywords:
+            keyword_id = len(self.keywords)
+            self.keywords.append(keyword)
+            if not keyword:
+                continue
+            node = 0
+            for ch in keyword:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    outputs.append([])
+                node = nxt
+            outputs[node].append(keyword_id)
+
+        # 广度优先构建失败指针，并沿失败链合并输出
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                outputs[nxt].extend(outputs[self._fail[nxt]])
+
+        self._output = [tuple(ids) for ids in outputs]
+
+    def find(self, text: str) -> Set[int]:
+        """返回文本中出现过的关键词编号集合"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found: Set[int] = set()
+        node = 0
+        for ch in text:
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if output[node]:
+                found.update(output[node])
+        return found
+
+
+class ThemeMatcher:
+    """主题关键词匹配器：一次扫描得到命中的关键词（主题得分由 ThemeScorer 统一计算）"""
+
+    def __init__(self, theme_keywords: Dict[str, List[str]]):
+        self.themes = list(theme_keywords)
+
+        # 同一关键词可能属于多个主题（或在同一主题中重复出现），按原循环语义逐个计数
+        keyword_ids: Dict[str, int] = {}
+        self.keyword_themes: List[List[int]] = []  # 关键词编号 → 所属主题下标
+        for theme_index, keywords in enumerate(theme_keywords.values()):
+            for keyword in keywords:
+                if keyword not in keyword_ids:
+                    keyword_ids[keyword] = len(keyword_ids)
+                    self.keyword_themes.append([])
+                self.keyword_themes[keyword_ids[keyword]].append(theme_index)
+
+        self.automaton = AhoCorasick(keyword_ids)
+
+    @property
+    def keyword_count(self) -> int:
+        return len(self.keyword_themes)
+
+    def find(self, text: str) -> Set[int]:
+        """返回文本中命中的关键词编号集合"""
+        return self.automaton.find(text)
+
+    def keyword_hits(self, weighted_texts: Iterable[Tuple[str, int]]) -> Dict[int, int]:
+        """对多个文本分别扫描，返回每个命中关键词按文本权重累加的值（供批量评分使用）"""
+        hits: Dict[int, int] = {}
+        for text, weight in weighted_texts:
+            for keyword_id in self.find(text):
+                hits[keyword_id] = hits.get(keyword_id, 0) + weight
+        return hits
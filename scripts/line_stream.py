@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+逐行读取
+按需逐行产出文本（结果与 text.split('\n') 完全一致），调用方得到所需的行后即可停止，
+不必先把整个文档切分成行列表；LineStream 同时记录已读部分去除首尾空白后的长度
+"""
+
+from typing import Iterable, Iterator, TextIO
+
+
+def iter_lines(text: str) -> Iterator[str]:
+    """逐行产出字符串中的各行，与 text.split('\\n') 一致"""
+    start = 0
+    while True:
+        end = text.find('\n', start)
+        if end < 0:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_file_lines(f: TextIO) -> Iterator[str]:
+    """逐行产出文本文件的各行（不含换行符），与 f.read().split('\\n') 一致"""
+    ended = True
+    for line in f:
+        ended = line.endswith('\n')
+        yield line[:-1] if ended else line
+    if ended:
+        yield ''  # 以换行结尾（或空文件）时 split 会多出一个空串
+
+
+class LineStream:
+    """包装逐行迭代器，记录已读部分去除首尾空白后的长度"""
+
+    def __init__(self, lines: Iterable[str]):
+        self._lines = iter(lines)
+        self._offset = 0
+        self._first = None  # 第一个非空白字符的位置
+        self._last = None   # 最后一个非空白字符的位置
+
+    def __iter__(self) -> "LineStream":
+        return self
+
+    def __next__(self) -> str:
+        line = next(self._lines)
+        stripped = line.strip()
+        if stripped:
+            if self._first is None:
+                self._first = self._offset + len(line) - len(line.lstrip())
+            self._last = self._offset + len(line.rstrip()) - 1
+        self._offset += len(line) + 1
+        return line
+
+    def stripped_length(self) -> int:
+        """已读部分去除首尾空白后的长度"""
+        return 0 if self._first is None else self._last - self._first + 1
+
+    def stripped_length_exceeds(self, min_chars: int) -> bool:
+        """全文去除首尾空白后是否超过 min_chars 个字符，必要时继续读取直到可以确定"""
+        while self.stripped_length() <= min_chars:
+            if next(self, None) is None:
+                return False
+        return True
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日志管道
+默认与 logging.basicConfig 一致，由调用线程直接写控制台和日志文件；
+异步模式下日志调用只把记录放入队列，由后台线程写出，逐文档的日志不再阻塞扫描和合并。
+日志可选按 JSON Lines 格式输出（每行一个JSON对象），便于日志系统采集
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
+from pathlib import Path
+from typing import Optional
+
+# 日志格式和级别（命令行选项的可选值）
+LOG_FORMATS = ('text', 'json')
+LOG_LEVELS = ('DEBUG', 'INFO', 'WARNING', 'ERROR')
+
+TEXT_FORMAT = '%(asctime)s - %(levelname)s - %(message)s'
+
+# LogRecord 的标准属性，其余属性视为调用方通过 extra 传入的结构化字段
+_RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'taskName'}
+
+# 当前进程中运行的后台写日志线程及其队列处理器
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional[QueueHandler] = None
+
+
+class _RecordQueueHandler(QueueHandler):
+    """放入队列前只展开消息参数和异常堆栈（不可跨线程保留），格式化留给后台线程"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        message = record.getMessage()
+        exc_text = record.exc_text
+        if record.exc_info and not exc_text:
+            exc_text = logging.Formatter().formatException(record.exc_info)
+        record = copy.copy(record)
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = exc_text
+        return record
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """每条日志输出为一行JSON：时间、级别、日志器、消息及 extra 传入的字段"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+def log_file_suffix(log_format: str) -> str:
+    """日志文件扩展名"""
+    return '.jsonl' if log_format == 'json' else '.log'
+
+
+def configure_logging(log_file: Optional[Path] = None, level: str = 'INFO', log_format: str = 'text',
+                      async_mode: bool = False) -> Optional[QueueListener]:
+    """配置根日志器：输出到控制台，指定 log_file 时同时写入文件
+
+    与 basicConfig 一致，根日志器已配置过处理器时不做任何修改。
+    异步模式返回后台写日志线程，进程退出时自动停止并写出队列中剩余的日志。
+    """
+    global _listener, _queue_handler
+    root = logging.getLogger()
+    if root.handlers:
+        return None
+
+    formatter = JsonLinesFormatter() if log_format == 'json' else logging.Formatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.insert(0, logging.FileHandler(log_file, encoding='utf-8'))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    root.setLevel(level)
+    if not async_mode:
+        for handler in handlers:
+            root.addHandler(handler)
+        return None
+
+    # 队列不设上限：日志突增时也不阻塞调用线程
+    records = queue.SimpleQueue()
+    _queue_handler = _RecordQueueHandler(records)
+    _listener = QueueListener(records, *handlers)
+    root.addHandler(_queue_handler)
+    _listener.start()
+    atexit.register(stop_logging)
+    return _listener
+
+
+def stop_logging():
+    """停止后台写日志线程，写出队列中剩余的日志后改为直接写出"""
+    global _listener, _queue_handler
+    if _listener is None:
+        return
+    listener, _listener = _listener, None
+    listener.stop()
+    _use_direct_handlers(listener, _queue_handler)
+    _queue_handler = None
+
+
+def _use_direct_handlers(listener: QueueListener, queue_handler: QueueHandler):
+    root = logging.getLogger()
+    root.removeHandler(queue_handler)
+    for handler in listener.handlers:
+        root.addHandler(handler)
+
+
+def _after_fork_in_child():
+    # 子进程（如分析进程池）中没有后台线程，改为直接写出，避免日志滞留在队列中
+    global _listener, _queue_handler
+    if _listener is not None:
+        _use_direct_handlers(_listener, _queue_handler)
+        _listener = None
+        _queue_handler = None
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
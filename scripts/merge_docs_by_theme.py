@@ -8,20 +8,147 @@
 import os
 import re
 import json
-import shutil
+import sqlite3
+import time
 from datetime import datetime
 from pathlib import Path
 from collections import defaultdict
-from typing import Dict, List, Tuple, Set
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Set
 import logging
 
+from document_store import DocumentInfo, DocumentStore, DEFAULT_CACHE_BYTES
+from line_stream import LineStream, iter_lines
+from async_scan import scan_and_read
+from tree_scanner import DEFAULT_SCAN_THREADS, IGNORE_FILE, IgnoreRules, scan_tree
+from storage_backend import LocalStorage, StorageBackend
+from log_pipeline import LOG_FORMATS, LOG_LEVELS, configure_logging, log_file_suffix
+from compressed_docs import (AVAILABLE_COMPRESSIONS, compressed_variants, compression_of, document_stem,
+                             is_supported_document, iter_compressed)
+from keyword_matcher import ThemeMatcher
+from doc_manifest import DocumentManifest, config_fingerprint
+from merge_journal import MergeJournal
+from score_cache import ScoreCache
+from merge_queue import (DEFAULT_LOCK_TIMEOUT, DEFAULT_WAIT_INTERVAL, FINALIZE_LOCK, QUEUE_DIR_NAMES, LockLost,
+                         QueueLock, WorkQueue, worker_name)
+from merged_shards import Shard, iter_shard_list, iter_shards, stale_shards, write_shards
+from parallel_analysis import DocumentAnalysis, analyze_documents, default_jobs
+from snapshot_store import SnapshotStore, DEFAULT_KEEP_SNAPSHOTS
+from merge_plan import build_plan, save_plan, load_plan
+from doc_metrics import RunMetrics
+from doc_index import DocumentIndex
+from theme_scoring import SCORING_MODES, ThemeScorer
+from doc_watcher import DEFAULT_DEBOUNCE, DEFAULT_POLL_INTERVAL, create_watcher, iter_changes
+from similarity_grouping import DEFAULT_THRESHOLD, MAX_SHINGLE_CHARS, cluster_signatures, minhash_signature
+
 class DocumentMerger:
-    def __init__(self, docs_path: str = "./docs"):
+    def __init__(self, docs_path: str = "./docs", cache_bytes: int = DEFAULT_CACHE_BYTES,
+                 incremental: bool = False, jobs: int = 1,
+                 keep_snapshots: int = DEFAULT_KEEP_SNAPSHOTS, dry_run: bool = False,
+                 metrics_path: Optional[str] = None, prometheus_path: Optional[str] = None,
+                 use_index: bool = True, grouping: str = "keywords",
+                 similarity_threshold: float = DEFAULT_THRESHOLD, theme_scoring: str = "keywords",
+                 io_concurrency: int = 0, resume: bool = False, scan_threads: int = DEFAULT_SCAN_THREADS,
+                 exclude: Optional[List[str]] = None, include: Optional[List[str]] = None,
+                 shard_bytes: int = 0, storage: Optional[StorageBackend] = None,
+                 compress_output: Optional[str] = None, compress_backups: Optional[str] = None,
+                 log_level: str = "INFO", log_format: str = "text", async_log: bool = False):
         self.docs_path = Path(docs_path)
         self.backup_path = Path("./docs_backup")
         self.log_path = Path("./logs")
+        self.state_path = Path("./.doc_merge")
+        self.report_path = self.docs_path / "文档合并总结报告.md"
+        
+        # 存储后端：文档目录、备份快照、清单、日志和报告的读写均经由存储后端（默认为本地磁盘）
+        self.storage = storage or LocalStorage()
+        
+        # 试运行模式：只生成合并计划，不写入日志文件、评分缓存和Word文本缓存等任何文件
+        self.dry_run = dry_run
+        
+        # 日志级别、格式（text 或 json 即 JSON Lines）及是否由后台线程异步写出
+        self.log_level = log_level
+        self.log_format = log_format
+        self.async_log = async_log
         self.setup_logging()
         
+        # 文档读取缓存（每个文件只读取一次；Word文档的提取结果按内容哈希持久化）
+        self.store = DocumentStore(
+            max_bytes=cache_bytes, logger=self.logger,
+            text_cache_path=None if self.dry_run else self.state_path / "docx_text",
+            storage=self.storage,
+        )
+        
+        # 备份快照仓库（按内容哈希去重，保留多代备份；文档目录下的工作队列不做快照，恢复时也保留）
+        self.snapshots = SnapshotStore(self.backup_path, logger=self.logger, storage=self.storage,
+                                       compression=compress_backups, skip_dirs=QUEUE_DIR_NAMES)
+        self.keep_snapshots = keep_snapshots
+        self.snapshot_id = None
+        
+        # 合并预写日志（中断后可用 --resume 从最后完成的主题继续）
+        self.journal = MergeJournal(self.state_path / "journal.jsonl", Path(__file__).stem, self.docs_path,
+                                    logger=self.logger, storage=self.storage)
+        self.resume = resume
+        
+        # 多节点工作队列（位于文档目录下，共享文件系统上各节点的 worker 通过锁文件认领主题）
+        self.work_queue = WorkQueue(self.docs_path / ".doc_merge_queue", Path(__file__).stem, self.docs_path,
+                                    logger=self.logger)
+        self.coordinating = False
+        self.queue_lock: Optional[QueueLock] = None  # 工作进程当前持有的主题锁
+        
+        # 运行指标（各阶段耗时、读写计数、峰值内存）
+        self.metrics = RunMetrics(Path(__file__).stem)
+        # 指定了 --metrics-file 时每次运行覆盖该文件，否则每次运行（监视模式下每轮）写出一个带时间戳的文件
+        self.metrics_file = Path(metrics_path) if metrics_path else None
+        self.metrics_path = self.metrics_file or self.new_metrics_path()
+        self.prometheus_path = Path(prometheus_path) if prometheus_path else None
+        
+        # 全文索引（SQLite FTS5，记录正文、标题、所属主题和重要性得分）
+        self.use_index = use_index
+        self.index_path = self.state_path / "index.db"
+        self.merged_outputs: Dict[Path, str] = {}
+        
+        # 合并文档的分片大小上限（字节，0表示不分片）：超出时拆分为多个分片，合并文档改为索引
+        self.shard_bytes = shard_bytes
+        
+        # 合并文档的压缩格式（如 .gz，None 表示不压缩；压缩输出时不分片）
+        self.compress_output = compress_output
+        
+        # 增量运行状态：文档指纹清单、文档所属主题及重要性得分
+        self.incremental = incremental
+        self.manifest = None
+        self.doc_themes: Dict[Path, str] = {}
+        self.doc_scores: Dict[Path, Tuple[int, int]] = {}
+        
+        # 分析阶段的并行进程数
+        self.jobs = jobs if jobs > 0 else default_jobs()
+        
+        # 异步扫描和读取的并发数（0表示同步扫描），适用于高延迟的网络文件系统
+        self.io_concurrency = io_concurrency
+        
+        # 同步扫描时同时列出目录的线程数；增量模式下扫描顺带记录的 stat 信息
+        self.scan_threads = scan_threads
+        self.scan_stats: Dict[Path, os.stat_result] = {}
+        
+        # 扫描忽略规则（.gitignore 语法）：默认跳过备份和临时目录，
+        # 其后依次追加文档目录下 {IGNORE_FILE} 中的规则和命令行的 --exclude/--include
+        # 压缩保存的 .md/.txt（如 .md.gz、.txt.xz）读取时流式解压
+        self.supported_extensions = {'.md', '.txt', '.docx', '.doc'}
+        self.scan_suffixes = self.supported_extensions | AVAILABLE_COMPRESSIONS
+        self.ignore_rules = IgnoreRules(['.*/', '_archived/'])
+        self.ignore_rules.add_file(self.docs_path / IGNORE_FILE, storage=self.storage)
+        for pattern in exclude or []:
+            self.ignore_rules.add(pattern)
+        for pattern in include or []:
+            self.ignore_rules.add('!' + pattern)
+        
+        # 分组方式：keywords 按主题关键词，similarity 按内容相似度（MinHash/LSH）
+        self.grouping = grouping
+        self.similarity_threshold = similarity_threshold
+        
+        # 主题评分方式：keywords 按关键词命中计分，tfidf 再按关键词的逆文档频率加权
+        self.theme_scoring = theme_scoring
+        self.doc_theme_scores: Dict[Path, Dict[str, float]] = {}
+        
         # 主题关键词映射
         self.theme_keywords = {
             "交易记录": ["交易记录", "transaction", "记录页面", "日期筛选", "查询功能"],
@@ -38,6 +165,12 @@ class DocumentMerger:
             "兼容性": ["兼容", "compatibility", "适配", "版本"]
         }
         
+        # 补充文档中保留的关键行：标题、代码块标记及包含以下关键词的行（预编译为单个正则）
+        self.key_section_keywords = ['问题', '解决', '修复', '优化', '结果', '总结']
+        self.key_line_pattern = re.compile(
+            r'^(?:#|```)|' + '|'.join(re.escape(keyword) for keyword in self.key_section_keywords)
+        )
+        
         # 文档重要性权重
         self.importance_weights = {
             "总结": 10,
@@ -50,74 +183,221 @@ class DocumentMerger:
             "计划": 3,
             "指南": 2
         }
+        
+        # 内容长度得分（超过阈值字符数时按最高的一档加分）和结构得分（含有对应标记时加分）
+        self.length_weights = [(5000, 5), (2000, 3), (500, 1)]
+        self.structure_weights = {'# ': 2, '## ': 1, '```': 1}
+        
+        # 重要性评分缓存：按内容哈希记录评分依据和得分，权重表变化时按依据重新计分
+        self.score_cache = ScoreCache(
+            self.state_path / "scores.db",
+            config_fingerprint(self.importance_weights, self.length_weights, self.structure_weights),
+            logger=self.logger,
+        )
+        
+        # 非本地存储上不使用依赖本地文件的功能：SQLite 全文索引和评分缓存、分析子进程及异步扫描
+        if not self.storage.local:
+            self.use_index = False
+            self.score_cache.disabled = True
+            self.jobs = 1
+            self.io_concurrency = 0
+        if self.dry_run:
+            self.score_cache.disabled = True
 
     def setup_logging(self):
-        """设置日志系统"""
-        self.log_path.mkdir(exist_ok=True)
-        log_file = self.log_path / f"doc_merge_{datetime.now().strftime('%Y%m%d_%H%M%S')}.log"
-        
-        logging.basicConfig(
-            level=logging.INFO,
-            format='%(asctime)s - %(levelname)s - %(message)s',
-            handlers=[
-                logging.FileHandler(log_file, encoding='utf-8'),
-                logging.StreamHandler()
-            ]
-        )
+        """设置日志系统（非本地存储和试运行时只输出到控制台；异步模式下由后台线程写出）"""
+        log_file = None
+        if self.storage.local and not self.dry_run:
+            self.log_path.mkdir(exist_ok=True)
+            log_file = self.log_path / f"doc_merge_{datetime.now().strftime('%Y%m%d_%H%M%S')}{log_file_suffix(self.log_format)}"
+        
+        configure_logging(log_file, level=self.log_level, log_format=self.log_format, async_mode=self.async_log)
         self.logger = logging.getLogger(__name__)
 
+    def require_local_storage(self, feature: str):
+        """监视模式和多节点队列依赖本地文件系统（inotify、锁文件）"""
+        if not self.storage.local:
+            raise RuntimeError(f"{feature} 需要本地磁盘存储（当前存储后端: {self.storage.name}）")
+
     def create_backup(self):
-        """创建文档备份"""
+        """创建文档备份快照（按内容哈希去重，只写入变化的文件）"""
         try:
-            if self.backup_path.exists():
-                shutil.rmtree(self.backup_path)
-            shutil.copytree(self.docs_path, self.backup_path)
-            self.logger.info(f"✅ 已创建备份: {self.backup_path}")
+            snapshot = self.snapshots.create(self.docs_path)
+            self.snapshot_id = snapshot["id"]
+            self.logger.info(
+                f"✅ 已创建备份快照: {self.backup_path} ({snapshot['id']}, {len(snapshot['files'])} 个文件, "
+                f"新增 {snapshot['new_blobs']} 个文件内容 / {snapshot['new_bytes']} 字节)"
+            )
+            pruned = self.snapshots.prune(self.keep_snapshots)
+            if pruned:
+                self.logger.info(f"🧹 已清理 {pruned} 个过期快照")
         except Exception as e:
             self.logger.error(f"❌ 备份创建失败: {e}")
             raise
 
+    def restore_backup(self, snapshot_id: str):
+        """从备份快照恢复文档目录"""
+        try:
+            result = self.snapshots.restore(snapshot_id, self.docs_path)
+            self.journal.clear()  # 文档目录已回到快照状态，中断的合并无需继续
+            self.logger.info(
+                f"♻️ 已从快照 {result['id']} 恢复 {self.docs_path}: "
+                f"恢复 {result['restored']} 个文件, 移除 {result['removed']} 个新增文件"
+            )
+        except Exception as e:
+            self.logger.error(f"❌ 快照恢复失败: {e}")
+            raise
+
+    def keep_directory(self, dir_path: Path) -> bool:
+        """扫描时是否进入该子目录（按忽略规则，默认跳过备份和临时目录）"""
+        return not self.ignore_rules.match(self.relative_key(dir_path), is_dir=True)
+
+    def is_document(self, file_path: Path) -> bool:
+        """是否为需要处理的文档（跳过本工具生成的总结报告及被忽略规则排除的文件）"""
+        return (is_supported_document(file_path, self.supported_extensions) and file_path != self.report_path
+                and not self.ignore_rules.match(self.relative_key(file_path)))
+
     def scan_documents(self) -> List[Path]:
         """扫描所有文档文件"""
-        documents = []
-        supported_extensions = {'.md', '.txt', '.docx', '.doc'}
-        
-        for root, dirs, files in os.walk(self.docs_path):
-            # 跳过备份和临时目录
-            dirs[:] = [d for d in dirs if not d.startswith('.') and d != '_archived']
-            
-            for file in files:
-                file_path = Path(root) / file
-                if file_path.suffix.lower() in supported_extensions:
-                    documents.append(file_path)
+        self.scan_stats = {}
+        if self.io_concurrency > 0:
+            documents = scan_and_read(self.docs_path, self.keep_directory, self.is_document,
+                                      self.io_concurrency, logger=self.logger)
+        else:
+            # 跳过被忽略的目录；扩展名不符的文件不创建Path对象
+            documents = scan_tree(self.docs_path, self.keep_directory, self.is_document,
+                                  suffixes=self.scan_suffixes, threads=self.scan_threads,
+                                  stats=self.scan_stats if self.incremental else None,
+                                  lister=self.storage.list_directory)
         
         self.logger.info(f"📄 扫描到 {len(documents)} 个文档文件")
         return documents
 
-    def classify_by_theme(self, documents: List[Path]) -> Dict[str, List[Path]]:
+    def scan_and_read_documents(self) -> Tuple[List[Path], Optional[List[Dict[int, int]]]]:
+        """异步并发扫描并读取文档，每读完一个文档即匹配关键词，返回文档列表及各文档命中的关键词"""
+        matcher = ThemeMatcher(self.theme_keywords) if self.grouping == "keywords" else None
+        hits: Dict[Path, Dict[int, int]] = {}
+        
+        def on_document(doc_path: Path):
+            if matcher is not None:
+                hits[doc_path] = self.keyword_hits(doc_path, matcher)
+        
+        documents = scan_and_read(self.docs_path, self.keep_directory, self.is_document, self.io_concurrency,
+                                  store=self.store, on_document=on_document, logger=self.logger)
+        self.logger.info(f"📄 扫描并读取 {len(documents)} 个文档文件 (并发数 {self.io_concurrency})")
+        return documents, [hits[doc_path] for doc_path in documents] if matcher is not None else None
+
+    def keyword_hits(self, doc_path: Path, matcher: ThemeMatcher) -> Dict[int, int]:
+        """计算文档命中的关键词（主题得分由 ThemeScorer 对整批文档统一计算）"""
+        doc_name = document_stem(doc_path)
+        doc_content = self.store.read_prefix(doc_path, 1000)  # 只读取前1000字符所需的字节
+        
+        # 文件名或前1000字符命中的关键词各计1分
+        hits = matcher.find(doc_name) | matcher.find(doc_content)
+        return {keyword_id: 1 for keyword_id in hits}
+
+    def document_signature(self, doc_path: Path) -> Optional[Tuple[int, ...]]:
+        """计算文档内容的 MinHash 签名"""
+        return minhash_signature(self.store.read_prefix(doc_path, MAX_SHINGLE_CHARS))
+
+    def analyze_document(self, doc_path: Path, matcher: ThemeMatcher,
+                         cached: Optional[Tuple[int, int]] = None) -> DocumentAnalysis:
+        """分析单个文档：关键词匹配（或相似度签名）、重要性评分及元数据（可在工作进程中执行）
+
+        cached 为父进程从评分缓存中查到的 (得分, 文本长度)，此时不再读取全文和评分
+        """
+        if cached is None:
+            # 重要性评分需要全文，先读取全文，主题匹配和签名直接使用缓存中的文本
+            content = self.read_document_content(doc_path)
+            length, features = self.importance_features(content)
+            importance = self.name_importance(doc_path) + self.content_importance(length, features)
+            info = self.store.info(doc_path)
+        else:
+            (importance, length), info, features = cached, None, None
+        if self.grouping == "similarity":
+            keyword_hits, signature = {}, self.document_signature(doc_path)
+        else:
+            keyword_hits, signature = self.keyword_hits(doc_path, matcher), None
+        return DocumentAnalysis(doc_path, keyword_hits, importance, length, info, signature, features)
+
+    def group_by_similarity(self, documents: List[Path]) -> Dict[str, List[Path]]:
+        """按内容相似度聚类文档，每个聚类作为一个待合并的分组（以首个文档命名）"""
+        if self.jobs > 1 and len(documents) > 1:
+            analyses = analyze_documents(self, documents, self.jobs)
+            for analysis in analyses:
+                if analysis.info is not None:
+                    self.store.add_info(analysis.info)
+                self.doc_scores.setdefault(analysis.path, (analysis.importance, analysis.length))
+            signatures = [analysis.signature for analysis in analyses]
+        else:
+            signatures = [self.document_signature(doc_path) for doc_path in documents]
+        
+        theme_groups = {}
+        # 分组名按合并文档的文件名去重："a b" 与 "a_b" 清理后是同一个文件名，后写的会覆盖先写的
+        used_outputs = set()
+        for members in cluster_signatures(signatures, self.similarity_threshold):
+            docs = [documents[index] for index in members]
+            base_name = document_stem(docs[0]).replace('_合并文档', '')
+            name, suffix = base_name, 2
+            while self.merged_output_path(name, docs[0]).name in used_outputs:
+                name = f"{base_name}-{suffix}"
+                suffix += 1
+            used_outputs.add(self.merged_output_path(name, docs[0]).name)
+            theme_groups[name] = docs
+            for doc_path in docs:
+                self.doc_themes[doc_path] = name
+            self.logger.info(f"📂 相似文档组 {name}: {len(docs)} 个文档")
+        
+        # 没有相似文档的保持原样，不参与合并
+        ungrouped = [doc_path for doc_path in documents if doc_path not in self.doc_themes]
+        for doc_path in ungrouped:
+            self.doc_themes[doc_path] = "未分类"
+        self.logger.info(
+            f"🧬 相似度分组 (阈值 {self.similarity_threshold}): {len(theme_groups)} 个分组，"
+            f"{len(ungrouped)} 个文档没有相似文档"
+        )
+        return theme_groups
+
+
+    def classify_by_theme(self, documents: List[Path],
+                          keyword_hits: Optional[List[Dict[int, int]]] = None) -> Dict[str, List[Path]]:
         """按主题分类文档"""
+        if self.grouping == "similarity":
+            return self.group_by_similarity(documents)
+        
         theme_groups = defaultdict(list)
         unclassified = []
         
-        for doc_path in documents:
-            doc_name = doc_path.stem
-            doc_content = self.read_document_content(doc_path)
-            
-            # 查找匹配的主题
-            matched_themes = []
-            for theme, keywords in self.theme_keywords.items():
-                score = 0
-                for keyword in keywords:
-                    if keyword in doc_name or keyword in doc_content[:1000]:  # 只检查前1000字符
-                        score += 1
-                
-                if score > 0:
-                    matched_themes.append((theme, score))
-            
+        # 关键词表编译为单个自动机，每个文本只扫描一次
+        matcher = ThemeMatcher(self.theme_keywords)
+        scorer = ThemeScorer(matcher, self.theme_scoring)
+        
+        if keyword_hits is not None:
+            pass  # 异步扫描时已边读取边匹配
+        elif self.jobs > 1 and len(documents) > 1:
+            # 读取、解码、关键词匹配和重要性评分分发到进程池
+            analyses = analyze_documents(self, documents, self.jobs)
+            for analysis in analyses:
+                if analysis.info is not None:
+                    self.store.add_info(analysis.info)
+                self.doc_scores.setdefault(analysis.path, (analysis.importance, analysis.length))
+            keyword_hits = [analysis.keyword_hits for analysis in analyses]
+        else:
+            keyword_hits = [self.keyword_hits(doc_path, matcher) for doc_path in documents]
+        
+        # 整批文档一次得到所有主题的得分矩阵
+        score_matrix = scorer.score_matrix(keyword_hits)
+        if self.theme_scoring != "keywords":
+            self.logger.info(f"🧮 主题评分: {self.theme_scoring} ({scorer.backend}, {len(score_matrix)} 个文档)")
+        theme_matches = [scorer.matches(scores) for scores in score_matrix]
+        
+        for doc_path, matched_themes in zip(documents, theme_matches):
+            self.doc_theme_scores[doc_path] = dict(matched_themes)
             if matched_themes:
                 # 选择得分最高的主题
                 best_theme = max(matched_themes, key=lambda x: x[1])[0]
                 theme_groups[best_theme].append(doc_path)
+                self.doc_themes[doc_path] = best_theme
             else:
                 unclassified.append(doc_path)
         
@@ -128,54 +408,261 @@ class DocumentMerger:
         if unclassified:
             self.logger.info(f"❓ 未分类: {len(unclassified)} 个文档")
             theme_groups["未分类"] = unclassified
+            for doc_path in unclassified:
+                self.doc_themes[doc_path] = "未分类"
         
         return dict(theme_groups)
 
-    def read_document_content(self, doc_path: Path) -> str:
-        """读取文档内容"""
-        try:
-            if doc_path.suffix.lower() == '.md':
-                with open(doc_path, 'r', encoding='utf-8') as f:
-                    return f.read()
-            elif doc_path.suffix.lower() == '.txt':
-                with open(doc_path, 'r', encoding='utf-8') as f:
-                    return f.read()
-            elif doc_path.suffix.lower() in ['.docx', '.doc']:
-                # 对于Word文档，这里简化处理，实际可以使用python-docx库
-                return doc_path.stem  # 暂时只返回文件名
+    def relative_key(self, doc_path: Path) -> str:
+        """文档相对于文档目录的POSIX路径"""
+        return doc_path.relative_to(self.docs_path).as_posix()
+
+    def config_hash(self) -> str:
+        """分类、评分及分组配置的指纹（配置变化时文档清单自动失效）"""
+        tables = [self.theme_keywords, self.importance_weights, self.length_weights, self.structure_weights]
+        if self.grouping == "similarity":
+            tables.append({"grouping": self.grouping, "threshold": self.similarity_threshold})
+        if self.theme_scoring != "keywords":
+            tables.append({"theme_scoring": self.theme_scoring})
+        return config_fingerprint(*tables)
+
+    def open_manifest(self) -> DocumentManifest:
+        """创建文档指纹清单（主题和评分配置变化时清单自动失效）"""
+        return DocumentManifest(
+            self.state_path / "manifest.json",
+            self.docs_path,
+            self.config_hash(),
+            logger=self.logger,
+            storage=self.storage,
+        )
+
+    def classify_incremental(self, documents: List[Path]) -> Dict[str, List[Path]]:
+        """增量分类：只重新处理新增或变化的文档，返回受影响主题的完整分组"""
+        if not self.manifest.load():
+            self.logger.info("📋 未找到可用的文档清单，执行全量分类")
+            return self.classify_by_theme(documents)
+        
+        changed = []
+        touched_themes = set()
+        for doc_path in documents:
+            entry = self.manifest.get(doc_path)
+            if entry is not None and (
+                self.manifest.is_unchanged(doc_path, self.scan_stats.get(doc_path) or self.storage.stat(doc_path))
+                or self.store.info(doc_path).content_hash == entry.get("hash")  # 仅修改时间变化
+            ):
+                self.doc_themes[doc_path] = entry["theme"]
+                if entry.get("score") is not None:
+                    self.doc_scores[doc_path] = (entry["score"], entry["length"])
+                continue
+            
+            changed.append(doc_path)
+            if entry is not None:
+                touched_themes.add(entry["theme"])
+        
+        # 被删除文档原先所属的主题同样受影响
+        for entry in self.manifest.removed(documents).values():
+            touched_themes.add(entry["theme"])
+        
+        if changed:
+            touched_themes.update(self.classify_by_theme(changed))
+        
+        self.logger.info(f"🔍 增量模式: {len(changed)} 个新增或变化的文档，影响 {len(touched_themes)} 个主题")
+        
+        # 按扫描顺序重建受影响主题的分组，与全量运行的结果保持一致
+        theme_groups = defaultdict(list)
+        for doc_path in documents:
+            theme = self.doc_themes[doc_path]
+            if theme in touched_themes and theme != "未分类":
+                theme_groups[theme].append(doc_path)
+        for doc_path in documents:
+            if self.doc_themes[doc_path] == "未分类" and "未分类" in touched_themes:
+                theme_groups["未分类"].append(doc_path)
+        
+        return dict(theme_groups)
+
+    def save_manifest(self, documents: List[Path], keep_others: bool = False):
+        """记录本次运行后仍然存在的文档指纹（含本次写出的合并文档及分片）"""
+        entries = {}
+        if keep_others:
+            planned = {self.manifest.key(doc_path) for doc_path in chain(documents, self.merged_outputs)}
+            entries = {key: entry for key, entry in self.manifest.entries.items() if key not in planned}
+
+        # 合并文档下次扫描时是所属主题的已有文档，不记录时会被当作新文档重新分类和合并
+        known = set(documents)
+        outputs = [doc_path for doc_path in self.merged_outputs if doc_path not in known]
+        for doc_path in chain(documents, outputs):
+            try:
+                st = self.storage.stat(doc_path)
+            except FileNotFoundError:
+                continue  # 已在合并中删除
+            
+            # 本次重新写出的合并文档，之前记录的指纹和得分均已失效
+            rewritten = doc_path in self.merged_outputs
+            old_entry = {} if rewritten else (self.manifest.get(doc_path) or {})
+            info = self.store.peek_info(doc_path)
+            if info is None and old_entry:
+                content_hash, length = old_entry["hash"], old_entry.get("length")
             else:
-                return ""
-        except Exception as e:
-            self.logger.warning(f"⚠️ 无法读取文档 {doc_path}: {e}")
-            return ""
+                info = info or self.store.info(doc_path)
+                content_hash, length = info.content_hash, info.length
+            
+            score = None
+            if doc_path in self.doc_scores and not rewritten:
+                score, length = self.doc_scores[doc_path]
+            elif old_entry.get("hash") == content_hash:
+                score = old_entry.get("score")
+            
+            entries[self.manifest.key(doc_path)] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "hash": content_hash,
+                "theme": self.merged_outputs.get(doc_path) or self.doc_themes.get(doc_path),
+                "score": score,
+                "length": length,
+            }
+        
+        self.manifest.replace(entries)
+        self.manifest.save()
+        self.logger.info(f"🧾 文档清单已更新: {self.manifest.manifest_path} ({len(entries)} 个文档)")
+
+    def open_index(self) -> Optional[DocumentIndex]:
+        """打开全文索引（SQLite 不支持 FTS5 时返回None）"""
+        try:
+            return DocumentIndex(self.index_path, logger=self.logger).open()
+        except (RuntimeError, sqlite3.Error) as e:
+            self.logger.warning(f"⚠️ 全文索引不可用: {e}")
+            return None
+
+    def update_index(self, documents: List[Path]):
+        """增量更新全文索引：只重新索引新增或变化的文档（含本次生成的合并文档），移除已不存在的文档"""
+        if not self.use_index:
+            return
+        index = self.open_index()
+        if index is None:
+            return
+        
+        try:
+            reindexed = 0
+            for doc_path in list(documents) + list(self.merged_outputs):
+                try:
+                    st = self.storage.stat(doc_path)
+                except FileNotFoundError:
+                    continue  # 已在合并中删除
+                
+                key = self.relative_key(doc_path)
+                theme = self.merged_outputs.get(doc_path) or self.doc_themes.get(doc_path)
+                score = None
+                if doc_path in self.doc_scores and doc_path not in self.merged_outputs:
+                    score = self.doc_scores[doc_path][0]
+                
+                entry = index.get(key)
+                if entry and entry["size"] == st.st_size and entry["mtime_ns"] == st.st_mtime_ns:
+                    index.update_meta(key, theme, score)
+                    continue
+                
+                content = self.read_document_content(doc_path)
+                info = self.store.info(doc_path)
+                index.upsert(key, info.size, info.mtime_ns, info.content_hash, theme, score,
+                             info.length, document_stem(doc_path), content)
+                reindexed += 1
+            
+            removed = index.prune(lambda key: self.storage.exists(self.docs_path / key))
+            index.commit()
+            self.logger.info(
+                f"🔎 全文索引已更新: {self.index_path} "
+                f"(重新索引 {reindexed} 个, 移除 {removed} 个, 共 {index.count()} 个文档)"
+            )
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 全文索引更新失败: {e}")
+        finally:
+            index.close()
+
+    def query_index(self, terms: List[str], theme: Optional[str] = None, limit: int = 20) -> List[dict]:
+        """在全文索引中检索同时包含所有检索词的文档"""
+        if not self.index_path.exists():
+            raise FileNotFoundError(f"全文索引不存在: {self.index_path}（请先执行一次合并）")
+        index = DocumentIndex(self.index_path, logger=self.logger).open()
+        try:
+            return index.search(terms, theme=theme, limit=limit)
+        finally:
+            index.close()
 
-    def calculate_document_importance(self, doc_path: Path, content: str) -> int:
-        """计算文档重要性得分"""
+    def read_document_content(self, doc_path: Path) -> str:
+        """读取文档内容（经由文档缓存，每个文件只读取一次）"""
+        return self.store.read_text(doc_path)
+
+    def name_importance(self, doc_path: Path) -> int:
+        """基于文件名关键词的得分"""
         score = 0
-        doc_name = doc_path.stem
+        doc_name = document_stem(doc_path)
         
         # 基于文件名关键词评分
         for keyword, weight in self.importance_weights.items():
             if keyword in doc_name:
                 score += weight
         
-        # 基于内容长度评分
-        content_length = len(content)
-        if content_length > 5000:
-            score += 5
-        elif content_length > 2000:
-            score += 3
-        elif content_length > 500:
-            score += 1
-        
-        # 基于结构完整性评分
-        if '# ' in content:  # 有标题
-            score += 2
-        if '## ' in content:  # 有二级标题
-            score += 1
-        if '```' in content:  # 有代码块
-            score += 1
+        return score
+
+    def importance_features(self, content: str) -> Tuple[int, Dict[str, bool]]:
+        """内容部分的评分依据：文本长度及是否含有各结构标记"""
+        return len(content), {marker: marker in content for marker in self.structure_weights}
+
+    def content_importance(self, length: int, features: Dict[str, bool]) -> int:
+        """基于内容长度和结构完整性的得分"""
+        score = 0
+        for threshold, weight in self.length_weights:
+            if length > threshold:
+                score += weight
+                break
+        for marker, weight in self.structure_weights.items():
+            if features[marker]:
+                score += weight
+        return score
+
+    def document_importance(self, doc_path: Path) -> Tuple[int, int]:
+        """文档的重要性得分和文本长度
+
+        内容部分的评分依据和得分按内容哈希缓存：大小和修改时间未变的文档不再读取，
+        内容相同的文档不再重新扫描，权重表变化时直接按缓存的依据重新计分
+        """
+        cached = self.cached_importance(doc_path)
+        if cached is not None:
+            return cached
+        content = self.read_document_content(doc_path)
+        length, features = self.importance_features(content)
+        return self.name_importance(doc_path) + self.cache_importance(self.store.info(doc_path), length, features), length
+
+    def cached_importance(self, doc_path: Path) -> Optional[Tuple[int, int]]:
+        """从评分缓存得到文档的重要性得分和文本长度，未缓存时返回None（不读取文档内容）"""
+        try:
+            st = self.storage.stat(doc_path)
+        except OSError:
+            return None
+        
+        key = self.relative_key(doc_path)
+        size, mtime_ns = st.st_size, st.st_mtime_ns
+        info = self.store.peek_info(doc_path)
+        content_hash = info.content_hash if info else self.score_cache.content_hash(key, size, mtime_ns)
+        cached = self.score_cache.get(content_hash) if content_hash else None
+        if cached is None or not set(self.structure_weights) <= cached[1].keys():
+            return None
         
+        length, features, score = cached
+        self.metrics.add("score_cache_hits")
+        if score is None:
+            score = self.content_importance(length, features)
+            self.score_cache.put(key, size, mtime_ns, content_hash, length, features, score)
+        else:
+            self.score_cache.remember_file(key, size, mtime_ns, content_hash)
+        return self.name_importance(doc_path) + score, length
+
+    def cache_importance(self, info: DocumentInfo, length: int, features: Dict[str, bool]) -> int:
+        """按新算出的评分依据计算内容部分的得分并写入评分缓存"""
+        self.metrics.add("score_cache_misses")
+        score = self.content_importance(length, features)
+        if info.content_hash:
+            self.score_cache.put(self.relative_key(info.path), info.size, info.mtime_ns,
+                                 info.content_hash, length, features, score)
         return score
 
     def select_master_document(self, docs: List[Path]) -> Path:
@@ -185,9 +672,11 @@ class DocumentMerger:
         
         scored_docs = []
         for doc in docs:
-            content = self.read_document_content(doc)
-            score = self.calculate_document_importance(doc, content)
-            scored_docs.append((doc, score, len(content)))
+            if doc not in self.doc_scores:
+                self.doc_scores[doc] = self.document_importance(doc)
+            score, length = self.doc_scores[doc]
+            scored_docs.append((doc, score, length))
+        self.score_cache.commit()
         
         # 按得分排序，得分相同时按内容长度排序
         scored_docs.sort(key=lambda x: (x[1], x[2]), reverse=True)
@@ -199,13 +688,18 @@ class DocumentMerger:
 
     def extract_key_information(self, docs: List[Path], master_doc: Path) -> str:
         """提取并合并关键信息"""
-        merged_content = []
-        
-        # 读取主文档内容
-        master_content = self.read_document_content(master_doc)
-        
+        return "".join(self.iter_merged_content(docs, master_doc))
+
+    def iter_merged_content(self, docs: List[Path], master_doc: Path) -> Iterator[str]:
+        """按顺序逐段生成合并文档内容，内存占用只取决于当前处理的单个文档"""
+        for _, chunk in self.iter_merged_sections(docs, master_doc):
+            yield chunk
+        yield from self.iter_source_list(docs)
+
+    def iter_merged_sections(self, docs: List[Path], master_doc: Path) -> Iterator[Tuple[Optional[Path], str]]:
+        """逐段生成合并文档的头部和正文，每段附带其来源文档（头部和小节标题为None）"""
         # 添加合并说明头部
-        header = f"""# {master_doc.stem}
+        yield None, f"""# {document_stem(master_doc)}
 
 > 📝 本文档由多个相关文档合并而成
 > 🕒 合并时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
@@ -214,64 +708,84 @@ class DocumentMerger:
 ---
 
 """
-        merged_content.append(header)
         
         # 添加主文档内容
+        master_content = self.read_document_content(master_doc)
         if master_content:
-            merged_content.append("## 主要内容\n")
-            merged_content.append(master_content)
-            merged_content.append("\n---\n")
+            yield master_doc, "## 主要内容\n"
+            yield master_doc, master_content
+            yield master_doc, "\n---\n"
+        del master_content
         
         # 处理其他文档
         other_docs = [doc for doc in docs if doc != master_doc]
         if other_docs:
-            merged_content.append("## 补充信息\n")
+            yield None, "## 补充信息\n"
             
             for doc in other_docs:
-                content = self.read_document_content(doc)
-                if content and len(content.strip()) > 50:  # 只处理有实质内容的文档
-                    merged_content.append(f"### 来源: {doc.name}\n")
+                key_sections = self.read_key_sections(doc, min_chars=50)
+                if key_sections is not None:  # 只处理有实质内容的文档
+                    yield doc, f"### 来源: {doc.name}\n"
                     
                     # 提取关键段落（简化处理）
-                    key_sections = self.extract_key_sections(content)
-                    merged_content.append(key_sections)
-                    merged_content.append("\n")
-        
-        # 添加原始文档列表
-        merged_content.append("## 原始文档列表\n")
+                    yield doc, key_sections
+                    yield doc, "\n"
+
+    def iter_source_list(self, docs: List[Path]) -> Iterator[str]:
+        """原始文档列表（分片模式下写入索引）"""
+        yield "## 原始文档列表\n"
         for i, doc in enumerate(docs, 1):
             relative_path = doc.relative_to(self.docs_path)
-            merged_content.append(f"{i}. `{relative_path}`\n")
-        
-        return "".join(merged_content)
+            yield f"{i}. `{relative_path}`\n"
+
+    def iter_shard_index(self, header: str, shards: List[Shard], docs: List[Path]) -> Iterator[str]:
+        """分片模式下的合并文档索引：合并说明、各分片的来源文档和标题、原始文档列表"""
+        yield header
+        yield "## 分片列表\n"
+        yield from iter_shard_list(shards, self.relative_key)
+        yield "\n"
+        yield from self.iter_source_list(docs)
 
-    def extract_key_sections(self, content: str) -> str:
-        """提取文档的关键段落"""
-        lines = content.split('\n')
+    def shard_header(self, master_doc: Path, merged_path: Path) -> Callable[[int], str]:
+        """分片开头的标题和返回索引的链接"""
+        def header(number: int) -> str:
+            return f"# {document_stem(master_doc)}（第 {number} 部分）\n\n> 📑 索引: [{merged_path.name}](<{merged_path.name}>)\n\n---\n\n"
+        return header
+
+    def read_key_sections(self, doc_path: Path, min_chars: int) -> Optional[str]:
+        """逐行读取文档并提取关键段落；文档去除首尾空白后不超过 min_chars 个字符时返回None"""
+        try:
+            lines = LineStream(self.store.iter_lines(doc_path))
+            key_sections = self.extract_key_sections(lines)
+            substantial = lines.stripped_length_exceeds(min_chars)
+        except UnicodeDecodeError:
+            # 文件后部的编码与开头不一致，按完整解码的文本重新提取
+            lines = LineStream(iter_lines(self.read_document_content(doc_path)))
+            key_sections = self.extract_key_sections(lines)
+            substantial = lines.stripped_length_exceeds(min_chars)
+        return key_sections if substantial else None
+
+    def extract_key_sections(self, lines: Iterable[str], max_lines: int = 20) -> str:
+        """提取文档的关键段落（逐行处理，保留的行数达到上限即停止读取）"""
         key_lines = []
         
         for line in lines:
             line = line.strip()
-            if not line:
-                continue
-                
-            # 保留标题
-            if line.startswith('#'):
-                key_lines.append(line)
-            # 保留重要信息行
-            elif any(keyword in line for keyword in ['问题', '解决', '修复', '优化', '结果', '总结']):
+            # 保留标题、代码块标记和重要信息行
+            if line and self.key_line_pattern.search(line):
+                if len(key_lines) == max_lines:
+                    key_lines.append("...")
+                    break
                 key_lines.append(line)
-            # 保留代码块
-            elif line.startswith('```'):
-                key_lines.append(line)
-        
-        # 限制长度
-        if len(key_lines) > 20:
-            key_lines = key_lines[:20]
-            key_lines.append("...")
         
         return '\n'.join(key_lines) + '\n'
 
+    def merged_output_path(self, theme: str, master_doc: Path) -> Path:
+        """合并后文档的路径"""
+        safe_theme = re.sub(r'[^\w\-_]', '_', theme)
+        merged_filename = f"{safe_theme}_合并文档.md{self.compress_output or ''}"
+        return master_doc.parent / merged_filename
+
     def merge_theme_documents(self, theme: str, docs: List[Path]) -> bool:
         """合并同主题文档"""
         try:
@@ -282,38 +796,222 @@ class DocumentMerger:
             self.logger.info(f"🔄 开始合并 {theme}: {len(docs)} 个文档")
             
             # 选择主文档
-            master_doc = self.select_master_document(docs)
+            with self.metrics.stage("master_selection"):
+                master_doc = self.select_master_document(docs)
             
-            # 提取并合并关键信息
-            merged_content = self.extract_key_information(docs, master_doc)
+            self.write_merged_document(theme, docs, master_doc, self.merged_output_path(theme, master_doc))
+            return True
             
-            # 创建合并后的文档名
-            safe_theme = re.sub(r'[^\w\-_]', '_', theme)
-            merged_filename = f"{safe_theme}_合并文档.md"
-            merged_path = master_doc.parent / merged_filename
+        except Exception as e:
+            self.logger.error(f"❌ {theme} 合并失败: {e}")
+            return False
+
+    def write_merged_document(self, theme: str, docs: List[Path], master_doc: Path, merged_path: Path):
+        """写入合并后的文档并删除原始文档"""
+        # 提取关键信息并流式写入合并后的文档
+        with self.metrics.stage("write"):
+            if self.shard_bytes > 0 and not compression_of(merged_path):
+                shards = self.write_sharded_document(docs, master_doc, merged_path)
+            else:
+                # 输出路径带压缩扩展名时（--compress-output 或计划中的输出）流式压缩写出
+                shards = []
+                content = iter_compressed(self.iter_merged_content(docs, master_doc), compression_of(merged_path))
+                self.metrics.record_written(self.storage.write_chunks(merged_path, content))
+        outputs = [merged_path] + shards
+        for output in outputs:
+            self.store.invalidate(output)
+            self.merged_outputs[output] = theme
+        self.metrics.add("themes_merged")
+        
+        # 合并文档落盘后记入日志，再删除原始文档（跳过本次运行写出的合并文档和分片）
+        delete = [doc for doc in docs if doc not in self.merged_outputs]
+        self.journal.written(theme, merged_path, delete, shards)
+        deleted_count = self.delete_source_documents(delete + self.stale_outputs(merged_path, outputs + delete))
+        
+        self.logger.info(f"✅ {theme} 合并完成: {merged_path.name} (删除了 {deleted_count} 个原文档)")
+
+    def stale_outputs(self, merged_path: Path, keep: List[Path]) -> List[Path]:
+        """之前运行留下、本次没有再生成的分片，以及以其他压缩格式保存的同一合并文档（需要删除）"""
+        variants = [path for path in compressed_variants(merged_path)
+                    if path not in keep and self.storage.exists(path)]
+        return stale_shards(merged_path, keep, self.storage) + variants
+
+    def write_sharded_document(self, docs: List[Path], master_doc: Path, merged_path: Path) -> List[Path]:
+        """按大小上限拆分写入合并文档，返回写出的分片；内容未超过上限时仍写为单个合并文档"""
+        sections = self.iter_merged_sections(docs, master_doc)
+        _, header = next(sections)
+        shard_header = self.shard_header(master_doc, merged_path)
+        shards = iter_shards(sections, self.shard_bytes, shard_header)
+        first, second = next(shards, None), next(shards, None)
+        if second is None:
+            body = [first.body] if first else []
+            self.metrics.record_written(self.storage.write_chunks(merged_path, [header, *body, *self.iter_source_list(docs)]))
+            return []
+        
+        written = write_shards(merged_path, chain([first, second], shards), shard_header,
+                               storage=self.storage)
+        for shard in written:
+            self.metrics.record_written(shard.size)
+        self.metrics.record_written(self.storage.write_chunks(merged_path, self.iter_shard_index(header, written, docs)))
+        self.logger.info(f"📑 {merged_path.name} 超过 {self.shard_bytes // 1024} KB，已拆分为 {len(written)} 个分片")
+        return [shard.path for shard in written]
+
+    def delete_source_documents(self, docs: List[Path]) -> int:
+        """删除已合并的原始文档并将删除落盘，返回删除的文档数（已不存在的文档跳过）"""
+        self.check_queue_lock()  # 主题已归其他工作进程时不再删除
+        deleted_count = 0
+        for doc in docs:
+            try:
+                with self.metrics.stage("delete"):
+                    self.storage.unlink(doc)
+                self.store.invalidate(doc)
+                self.metrics.add("files_deleted")
+                deleted_count += 1
+                self.logger.info(f"🗑️ 已删除: {doc.name}")
+            except FileNotFoundError:
+                continue  # 中断前已删除
+            except Exception as e:
+                self.logger.warning(f"⚠️ 删除失败 {doc.name}: {e}")
+        for directory in {doc.parent for doc in docs}:
+            self.storage.sync_directory(directory)
+        return deleted_count
+
+    def plan_theme_merge(self, theme: str, docs: List[Path]) -> dict:
+        """生成单个主题的合并计划（不修改任何文件）"""
+        theme_plan = {"theme": theme, "action": "skip", "master": None, "output": None, "delete": []}
+        
+        if len(docs) > 1:
+            master_doc = self.select_master_document(docs)
+            merged_path = self.merged_output_path(theme, master_doc)
+            theme_plan.update({
+                "action": "merge",
+                "master": self.relative_key(master_doc),
+                "output": self.relative_key(merged_path),
+                "delete": [self.relative_key(doc) for doc in docs if doc != merged_path],
+            })
+        
+        theme_plan["documents"] = []
+        for doc in docs:
+            info = self.store.info(doc)
+            score, length = self.doc_scores.get(doc, (None, info.length))
+            theme_plan["documents"].append({
+                "path": self.relative_key(doc),
+                "score": score,
+                "length": length,
+                "size": info.size,
+                "mtime_ns": info.mtime_ns,
+                "hash": info.content_hash,
+                "theme_scores": self.doc_theme_scores.get(doc),
+            })
+        return theme_plan
+
+    def build_merge_plan(self, theme_groups: Dict[str, List[Path]]) -> dict:
+        """生成完整的合并计划"""
+        themes = [self.plan_theme_merge(theme, docs) for theme, docs in theme_groups.items()]
+        return build_plan(
+            Path(__file__).stem,
+            self.docs_path,
+            self.config_hash(),
+            themes,
+        )
+
+    def apply_theme_plan(self, theme_plan: dict) -> bool:
+        """按计划合并单个主题"""
+        theme = theme_plan["theme"]
+        docs = [self.docs_path / doc["path"] for doc in theme_plan["documents"]]
+        try:
+            if theme_plan["action"] != "merge":
+                self.logger.info(f"⏭️ {theme}: 只有 {len(docs)} 个文档，跳过合并")
+                return True
             
-            # 写入合并后的文档
-            with open(merged_path, 'w', encoding='utf-8') as f:
-                f.write(merged_content)
+            # 计划生成后文档发生变化则拒绝执行该主题
+            for doc, planned in zip(docs, theme_plan["documents"]):
+                st = self.storage.stat(doc)
+                if st.st_size != planned["size"] or st.st_mtime_ns != planned["mtime_ns"]:
+                    self.logger.error(f"❌ {theme}: 文档 {planned['path']} 在生成计划后已变化，请重新生成计划")
+                    return False
             
-            # 删除原始文档（除了主文档，如果主文档名不同的话）
-            deleted_count = 0
-            for doc in docs:
-                if doc != merged_path:  # 避免删除刚创建的合并文档
-                    try:
-                        doc.unlink()
-                        deleted_count += 1
-                        self.logger.info(f"🗑️ 已删除: {doc.name}")
-                    except Exception as e:
-                        self.logger.warning(f"⚠️ 删除失败 {doc.name}: {e}")
-            
-            self.logger.info(f"✅ {theme} 合并完成: {merged_path.name} (删除了 {deleted_count} 个原文档)")
+            self.logger.info(f"🔄 按计划合并 {theme}: {len(docs)} 个文档")
+            self.write_merged_document(
+                theme, docs, self.docs_path / theme_plan["master"], self.docs_path / theme_plan["output"]
+            )
             return True
             
         except Exception as e:
             self.logger.error(f"❌ {theme} 合并失败: {e}")
             return False
 
+    def apply_plan(self, plan_path: str):
+        """执行试运行生成的合并计划（不重新扫描和分类）"""
+        try:
+            plan = load_plan(plan_path, Path(__file__).stem, self.docs_path, self.storage)
+            if self.journal.load() is not None:
+                raise RuntimeError("上次合并中断，请先使用 --resume 继续，再执行合并计划")
+            self.logger.info(f"🚀 开始执行合并计划: {plan_path} ({len(plan['themes'])} 个主题)")
+            
+            with self.metrics.stage("backup"):
+                self.create_backup()
+            
+            self.journal.begin(
+                {theme_plan["theme"]: [self.docs_path / doc["path"] for doc in theme_plan["documents"]]
+                 for theme_plan in plan["themes"]},
+                self.snapshot_id,
+            )
+            results = {}
+            for theme_plan in plan["themes"]:
+                results[theme_plan["theme"]] = self.apply_theme_plan(theme_plan)
+                self.journal.done(theme_plan["theme"], results[theme_plan["theme"]])
+            
+            self.finish_plan(plan, results)
+            self.journal.clear()
+            self.logger.info("🎉 合并计划执行完成")
+            
+        except Exception as e:
+            self.metrics.status = "failed"
+            self.logger.error(f"💥 合并计划执行失败: {e}")
+            raise
+        finally:
+            self.score_cache.close()
+            self.write_metrics()
+
+    def finish_plan(self, plan: dict, results: Dict[str, bool]):
+        """合并计划执行完毕后更新文档指纹清单、全文索引和总结报告"""
+        documents = []
+        for theme_plan in plan["themes"]:
+            for doc in theme_plan["documents"]:
+                doc_path = self.docs_path / doc["path"]
+                documents.append(doc_path)
+                self.doc_themes[doc_path] = theme_plan["theme"]
+                if doc["score"] is not None and doc_path not in self.doc_scores:
+                    self.doc_scores[doc_path] = (doc["score"], doc["length"])
+        
+        # 只更新计划涉及的文档指纹，保留清单中的其他条目
+        self.manifest = self.open_manifest()
+        self.manifest.load()
+        with self.metrics.stage("manifest"):
+            self.save_manifest(documents, keep_others=True)
+        with self.metrics.stage("index"):
+            self.update_index(documents)
+        
+        with self.metrics.stage("report"):
+            self.generate_summary_report(results)
+
+    def write_metrics(self):
+        """写出本次运行的指标文件（试运行时只在用 --metrics-file 明确指定时写出）"""
+        if self.dry_run and self.metrics_file is None:
+            return
+        if self.metrics.status == "running":
+            self.metrics.status = "success"
+        for counter in ("files_read", "bytes_read", "prefix_reads", "streamed_reads", "cache_hits"):
+            self.metrics.counters[counter] = self.store.stats[counter]
+        try:
+            self.metrics.write_json(self.metrics_path, self.storage)
+            if self.prometheus_path:
+                self.metrics.write_prometheus(self.prometheus_path, self.storage)
+            self.logger.info(f"📈 运行指标已写入: {self.metrics_path}")
+        except Exception as e:
+            self.logger.warning(f"⚠️ 运行指标写入失败: {e}")
+
     def generate_summary_report(self, results: Dict[str, bool]):
         """生成合并总结报告"""
         report_content = f"""# 文档合并总结报告
@@ -322,6 +1020,7 @@ class DocumentMerger:
 - 执行时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 - 处理目录: {self.docs_path}
 - 备份位置: {self.backup_path}
+- 备份快照: {self.snapshot_id}
 
 ## 合并结果
 """
@@ -342,30 +1041,90 @@ class DocumentMerger:
         report_content += f"详细日志请查看: `{self.log_path}/doc_merge_*.log`\n"
         
         # 保存报告
-        report_path = self.docs_path / "文档合并总结报告.md"
-        with open(report_path, 'w', encoding='utf-8') as f:
-            f.write(report_content)
+        report_path = self.report_path
+        self.metrics.record_written(self.storage.write_chunks(report_path, [report_content]))
         
         self.logger.info(f"📊 总结报告已生成: {report_path}")
 
-    def run(self):
-        """执行文档合并流程"""
+    def run(self) -> Optional[dict]:
+        """执行文档合并流程（试运行模式下返回合并计划）"""
         try:
             self.logger.info("🚀 开始文档合并流程")
             
-            # 创建备份
-            self.create_backup()
+            self.manifest = self.open_manifest()
+            
+            # 上次运行在合并途中中断：按日志继续，或要求用户明确选择
+            pending = None if self.dry_run else self.journal.load()
+            if pending is not None:
+                if not self.resume:
+                    raise RuntimeError(
+                        f"上次合并于 {pending['created']} 中断，请使用 --resume 继续，"
+                        f"或执行 restore --snapshot {pending['snapshot']} 恢复后重新运行"
+                    )
+                self.resume_merge(pending)
+                return
+            if self.resume:
+                self.logger.info("ℹ️ 没有中断的合并需要继续，正常执行")
+            if not self.dry_run and self.storage.local and self.work_queue.exists():
+                raise RuntimeError(f"工作队列 {self.work_queue.queue_path} 中还有未完成的主题，请先运行 worker 处理完毕")
+            
+            # 创建备份（增量模式下仅在确有主题需要合并时备份，试运行不备份）
+            if not self.incremental and not self.dry_run:
+                with self.metrics.stage("backup"):
+                    self.create_backup()
             
             # 扫描文档
-            documents = self.scan_documents()
+            keyword_hits = None
+            with self.metrics.stage("scan"):
+                if self.io_concurrency > 0 and self.jobs == 1 and not self.incremental:
+                    # 扫描、读取和关键词匹配同时进行
+                    documents, keyword_hits = self.scan_and_read_documents()
+                else:
+                    documents = self.scan_documents()
+            self.metrics.add("documents_scanned", len(documents))
             if not documents:
                 self.logger.warning("⚠️ 未找到任何文档文件")
                 return
             
             # 按主题分类
-            theme_groups = self.classify_by_theme(documents)
+            with self.metrics.stage("classify"):
+                if self.incremental:
+                    theme_groups = self.classify_incremental(documents)
+                else:
+                    theme_groups = self.classify_by_theme(documents, keyword_hits)
+            self.metrics.add("themes", len(theme_groups))
+            
+            if self.incremental:
+                if not theme_groups:
+                    self.logger.info("✨ 没有文档发生变化，无需合并")
+                    if self.dry_run:
+                        return self.build_merge_plan({})
+                    with self.metrics.stage("manifest"):
+                        self.save_manifest(documents)
+                    with self.metrics.stage("index"):
+                        self.update_index(documents)
+                    return
+                if not self.dry_run:
+                    with self.metrics.stage("backup"):
+                        self.create_backup()
             
-            # 合并每个主题的文档
+            # 试运行：只输出合并计划，不写入或删除任何文件
+            if self.dry_run:
+                plan = self.build_merge_plan(theme_groups)
+                self.logger.info(f"🔍 试运行完成: 已生成 {len(plan['themes'])} 个主题的合并计划，未修改任何文件")
+                return plan
+            
+            # 协调者：把合并计划写入工作队列，由各节点的 worker 认领主题
+            if self.coordinating:
+                plan = self.build_merge_plan(theme_groups)
+                self.work_queue.create(plan, self.snapshot_id)
+                self.logger.info(
+                    f"📬 已写入工作队列: {self.work_queue.queue_path} ({len(plan['themes'])} 个主题)，请在各节点运行 worker"
+                )
+                return
+            
+            # 合并每个主题的文档（每个主题完成后记入日志）
+            self.journal.begin(theme_groups, self.snapshot_id)
             results = {}
             for theme, docs in theme_groups.items():
                 if len(docs) > 1:  # 只合并有多个文档的主题
@@ -373,15 +1132,263 @@ class DocumentMerger:
                 else:
                     self.logger.info(f"⏭️ {theme}: 只有1个文档，跳过合并")
                     results[theme] = True
+                self.journal.done(theme, results[theme])
+            
+            # 更新文档指纹清单
+            with self.metrics.stage("manifest"):
+                self.save_manifest(documents)
+            
+            # 更新全文索引
+            with self.metrics.stage("index"):
+                self.update_index(documents)
             
             # 生成总结报告
-            self.generate_summary_report(results)
+            with self.metrics.stage("report"):
+                self.generate_summary_report(results)
+            self.journal.clear()
             
             self.logger.info("🎉 文档合并流程完成")
             
         except Exception as e:
+            self.metrics.status = "failed"
             self.logger.error(f"💥 文档合并流程失败: {e}")
             raise
+        finally:
+            self.score_cache.close()
+            self.write_metrics()
+
+    def resume_merge(self, pending: dict):
+        """按预写日志继续中断的合并：跳过已完成的主题，已写入合并文档的主题只补删剩余的原文档"""
+        self.snapshot_id = pending["snapshot"]
+        self.logger.info(
+            f"⏯️ 继续 {pending['created']} 中断的合并: {len(pending['done'])}/{len(pending['themes'])} 个主题已完成"
+        )
+        
+        results = {}
+        documents = []
+        for group in pending["themes"]:
+            theme = group["theme"]
+            docs = [self.docs_path / key for key in group["documents"]]
+            documents.extend(docs)
+            for doc in docs:
+                self.doc_themes[doc] = theme
+            
+            if theme in pending["done"]:
+                results[theme] = pending["done"][theme]
+                continue
+            
+            written = pending["written"].get(theme)
+            if written is not None:
+                results[theme] = self.finish_written_theme(theme, written)
+            elif all(self.storage.exists(doc) for doc in docs):
+                results[theme] = self.merge_theme_documents(theme, docs)
+            else:
+                self.logger.error(f"❌ {theme}: 部分原文档在中断后被移除，跳过该主题")
+                results[theme] = False
+            self.journal.done(theme, results[theme])
+        
+        # 只更新日志涉及的文档指纹，保留清单中的其他条目
+        self.manifest.load()
+        with self.metrics.stage("manifest"):
+            self.save_manifest(documents, keep_others=True)
+        with self.metrics.stage("index"):
+            self.update_index(documents)
+        with self.metrics.stage("report"):
+            self.generate_summary_report(results)
+        self.journal.clear()
+        self.logger.info("🎉 中断的合并已全部完成")
+
+    def finish_written_theme(self, theme: str, written: dict) -> bool:
+        """合并文档已写入、原文档可能未删完的主题：补删剩余的原文档"""
+        merged_path = self.docs_path / written["output"]
+        outputs = [merged_path] + [self.docs_path / key for key in written.get("shards", [])]
+        for output in outputs:
+            self.merged_outputs[output] = theme
+        delete = [self.docs_path / key for key in written["delete"]]
+        deleted_count = self.delete_source_documents(delete + self.stale_outputs(merged_path, outputs + delete))
+        self.logger.info(f"✅ {theme} 合并完成: {merged_path.name} (补删了 {deleted_count} 个原文档)")
+        return True
+
+    def coordinate(self):
+        """协调者：扫描和分类后把各主题的合并计划写入工作队列（不合并），由各节点的 worker 认领"""
+        self.require_local_storage("coordinate")
+        self.coordinating = True
+        self.run()
+
+    def run_worker(self, wait: bool = False, lock_timeout: float = DEFAULT_LOCK_TIMEOUT,
+                   wait_interval: float = DEFAULT_WAIT_INTERVAL):
+        """工作进程：认领并合并工作队列中的主题，全部主题完成后由最后一个工作进程收尾
+
+        wait 为True时，没有可认领的主题也继续等待其他工作进程，直到队列全部完成
+        （其间回收崩溃进程超时的锁并接手对应的主题）
+        """
+        self.require_local_storage("worker")
+        try:
+            queue = self.work_queue.load()
+            if queue is None:
+                self.logger.info("ℹ️ 没有待处理的工作队列")
+                return
+            self.work_queue.lock_timeout = lock_timeout
+            self.snapshot_id = queue["snapshot"]
+            self.logger.info(f"👷 工作进程 {worker_name()} 开始处理工作队列: {len(queue['themes'])} 个主题")
+            
+            # 队列中所有主题的合并文档都不能被其他主题当作原文档删除
+            for theme_plan in queue["themes"]:
+                if theme_plan["output"]:
+                    self.merged_outputs[self.docs_path / theme_plan["output"]] = theme_plan["theme"]
+            
+            while True:
+                processed = self.work_through_queue(queue)
+                if not self.work_queue.exists():
+                    self.logger.info("ℹ️ 工作队列已由其他工作进程收尾")
+                    return
+                results = self.work_queue.results(queue)
+                pending = [theme for theme, ok in results.items() if ok is None]
+                if not pending:
+                    self.finalize_queue(queue, results)
+                    return
+                if not wait:
+                    self.logger.info(f"⏸️ 本进程处理了 {processed} 个主题，其余 {len(pending)} 个主题由其他工作进程处理中")
+                    return
+                time.sleep(wait_interval)
+                
+        except Exception as e:
+            self.metrics.status = "failed"
+            self.logger.error(f"💥 工作进程失败: {e}")
+            raise
+        finally:
+            self.score_cache.close()
+            self.write_metrics()
+
+    def work_through_queue(self, queue: dict) -> int:
+        """依次认领并合并队列中尚未完成的主题，返回本次处理的主题数"""
+        processed = 0
+        for item_id, theme_plan in self.work_queue.items(queue):
+            if self.work_queue.is_done(item_id):
+                continue
+            lock = self.work_queue.claim(item_id)
+            if lock is None:
+                continue
+            with lock:
+                if self.work_queue.is_done(item_id):
+                    continue  # 检查与认领之间已被其他工作进程完成
+                try:
+                    self.merge_queue_item(item_id, theme_plan, lock)
+                except LockLost as e:
+                    self.logger.warning(f"⚠️ 放弃主题 {theme_plan['theme']}: {e}")
+                    continue
+                processed += 1
+        return processed
+
+    def merge_queue_item(self, item_id: str, theme_plan: dict, lock: Optional[QueueLock] = None) -> bool:
+        """合并队列中的一个主题（使用该主题自己的预写日志，崩溃后由接手的工作进程继续）
+
+        锁被其他工作进程回收后抛出 LockLost，不再删除原文档或写入完成标记。
+        """
+        theme = theme_plan["theme"]
+        docs = [self.docs_path / doc["path"] for doc in theme_plan["documents"]]
+        journal = self.journal
+        self.journal = MergeJournal(self.work_queue.journal_path(item_id), Path(__file__).stem, self.docs_path,
+                                    logger=self.logger)
+        self.queue_lock = lock
+        try:
+            self.check_queue_lock()
+            pending = self.journal.load()
+            written = pending["written"].get(theme) if pending else None
+            if written is not None:
+                self.logger.info(f"⏯️ 接手中断的主题: {theme}")
+                ok = self.finish_written_theme(theme, written)
+            else:
+                self.journal.begin({theme: docs}, self.snapshot_id)
+                ok = self.apply_theme_plan(theme_plan)
+            self.check_queue_lock()
+            self.work_queue.mark_done(item_id, theme, ok)
+            self.journal.clear()
+            return ok
+        finally:
+            self.journal = journal
+            self.queue_lock = None
+
+    def check_queue_lock(self):
+        """工作进程确认主题锁仍由自己持有（锁超时被回收时抛出 LockLost）"""
+        if self.queue_lock is not None:
+            self.queue_lock.verify()
+
+    def finalize_queue(self, queue: dict, results: Dict[str, bool]):
+        """全部主题完成后更新清单、全文索引和总结报告，并删除工作队列（只由一个工作进程执行）"""
+        lock = self.work_queue.claim(FINALIZE_LOCK)
+        if lock is None:
+            self.logger.info("ℹ️ 其他工作进程正在收尾")
+            return
+        with lock:
+            if not self.work_queue.exists():
+                return  # 已由其他工作进程收尾
+            self.finish_plan(queue, results)
+        self.work_queue.remove()
+        self.logger.info("🎉 工作队列已全部完成")
+
+    def new_metrics_path(self) -> Path:
+        """默认的运行指标文件（同一秒内开始的多轮运行依次加序号）"""
+        base = f"doc_merge_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        path, number = self.log_path / f"{base}.json", 2
+        while self.storage.exists(path):
+            path, number = self.log_path / f"{base}_{number}.json", number + 1
+        return path
+
+    def reset_run_state(self):
+        """清除上一轮运行的分类结果和指标（监视模式下每轮运行前调用，文档缓存保留）"""
+        self.metrics = RunMetrics(self.metrics.tool)
+        self.metrics_path = self.metrics_file or self.new_metrics_path()
+        self.manifest = None
+        self.snapshot_id = None
+        self.doc_themes = {}
+        self.doc_scores = {}
+        self.doc_theme_scores = {}
+        self.merged_outputs = {}
+        self.scan_stats = {}
+
+    def is_recorded(self, doc_path: Path) -> bool:
+        """文档的当前状态是否已记录在清单中（本工具自身写入或删除的文件不需要再次处理）"""
+        try:
+            st = self.storage.stat(doc_path)
+        except FileNotFoundError:
+            return self.manifest.get(doc_path) is None
+        return self.manifest.is_unchanged(doc_path, st)
+
+    def watch(self, debounce: float = DEFAULT_DEBOUNCE, poll_interval: float = DEFAULT_POLL_INTERVAL,
+              polling: bool = False):
+        """监视文档目录：文件变化后（去抖）只重新分类变化的文档，并重新合并受影响的主题"""
+        self.require_local_storage("watch")
+        self.incremental = True
+        self.resume = True  # 某一轮中断后，下一轮自动继续
+        watcher = create_watcher(self.docs_path, self.keep_directory, polling=polling,
+                                 poll_interval=poll_interval, logger=self.logger)
+        try:
+            self.run()
+            self.logger.info(f"👀 开始监视 {self.docs_path} ({watcher.name})，按 Ctrl+C 退出")
+            for changed, rescan in iter_changes(watcher, debounce):
+                changed = {path for path in changed if self.is_document(path) and not self.is_recorded(path)}
+                if not changed and not rescan:
+                    continue
+                
+                # 变化的文档必须移出缓存，否则增量分类会按旧内容判断为未变化
+                if rescan:
+                    self.logger.info("🔔 文件变化事件过多或目录被移动，重新检查全部文档")
+                    self.store.clear()
+                else:
+                    self.logger.info(f"🔔 检测到 {len(changed)} 个文档变化")
+                    for doc_path in changed:
+                        self.store.invalidate(doc_path)
+                
+                self.reset_run_state()
+                try:
+                    self.run()
+                except Exception:
+                    pass  # 失败已记录日志，继续监视
+        except KeyboardInterrupt:
+            self.logger.info("👋 已停止监视")
+        finally:
+            watcher.close()
 
 def main():
     """主函数"""
@@ -389,16 +1396,149 @@ def main():
     
     parser = argparse.ArgumentParser(description='文档主题合并工具')
     parser.add_argument('--docs-path', default='./docs', help='文档目录路径')
-    parser.add_argument('--dry-run', action='store_true', help='试运行模式（不实际修改文件）')
+    parser.add_argument('--dry-run', action='store_true', help='试运行模式（不实际修改文件，输出JSON合并计划）')
+    parser.add_argument('--plan-output', help='试运行时合并计划的输出文件（默认输出到标准输出）')
+    parser.add_argument('--apply-plan', metavar='PLAN_JSON', help='直接执行试运行生成的合并计划，不重新扫描和分类')
+    parser.add_argument('--incremental', action='store_true',
+                        help='增量模式：只处理新增或变化的文档，只重新合并受影响的主题')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='读取和分类阶段的并行进程数（0表示使用全部CPU）')
+    parser.add_argument('--io-concurrency', type=int, default=0,
+                        help='异步扫描和读取的并发数，适用于高延迟的网络文件系统（0表示同步扫描）')
+    parser.add_argument('--scan-threads', type=int, default=DEFAULT_SCAN_THREADS,
+                        help='同步扫描时同时列出目录的线程数（1表示单线程）')
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help=f'扫描时忽略匹配的文件或目录（.gitignore 语法，可多次指定；也可写入文档目录下的 {IGNORE_FILE}）')
+    parser.add_argument('--include', action='append', default=[], metavar='PATTERN',
+                        help='重新包含被忽略规则排除的文件（相当于 .gitignore 中的 !PATTERN，可多次指定）')
+    parser.add_argument('--shard-size', type=int, default=0, metavar='KB',
+                        help='合并文档超过该大小（KB）时拆分为多个分片，原合并文档改为分片索引（0表示不分片）')
+    parser.add_argument('--compress-output', choices=sorted(suffix[1:] for suffix in AVAILABLE_COMPRESSIONS),
+                        help='压缩写出合并文档（如 {主题}_合并文档.md.gz）；zst 需要安装 zstandard')
+    parser.add_argument('--compress-backups', choices=sorted(suffix[1:] for suffix in AVAILABLE_COMPRESSIONS),
+                        help='备份快照中新写入的文件内容压缩保存')
+    parser.add_argument('--log-level', choices=LOG_LEVELS, default='INFO',
+                        help='日志级别（WARNING 及以上时不输出逐文档的日志）')
+    parser.add_argument('--log-format', choices=LOG_FORMATS, default='text',
+                        help='日志格式：text 为文本，json 为 JSON Lines（每行一个JSON对象，日志文件扩展名为 .jsonl）')
+    parser.add_argument('--async-log', action='store_true',
+                        help='由后台线程异步写出日志，日志调用不再阻塞扫描和合并')
+    parser.add_argument('--cache-mb', type=int, default=DEFAULT_CACHE_BYTES // (1024 * 1024),
+                        help='文档文本缓存上限（MB），超出后按LRU淘汰')
+    parser.add_argument('--metrics-file', help='运行指标JSON文件（默认写入 logs/ 目录）')
+    parser.add_argument('--prometheus-file', help='同时以 Prometheus 文本格式写出运行指标')
+    parser.add_argument('--keep-snapshots', type=int, default=DEFAULT_KEEP_SNAPSHOTS,
+                        help='保留的备份快照代数（0表示全部保留）')
+    parser.add_argument('--resume', action='store_true',
+                        help='按合并日志继续上次中断的合并（跳过已完成的主题）')
+    parser.add_argument('--no-index', action='store_true', help='不维护全文索引')
+    parser.add_argument('--grouping', choices=['keywords', 'similarity'], default='keywords',
+                        help='分组方式：keywords 按主题关键词，similarity 按内容相似度（MinHash/LSH）聚类')
+    parser.add_argument('--similarity-threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help='相似度分组时归入同一组所需的最低相似度（0~1）')
+    parser.add_argument('--theme-scoring', choices=SCORING_MODES, default='keywords',
+                        help='主题评分方式：keywords 按关键词命中计分，tfidf 按关键词的逆文档频率加权')
+    
+    subparsers = parser.add_subparsers(dest='command')
+    restore_parser = subparsers.add_parser('restore', help='从备份快照恢复文档目录')
+    restore_parser.add_argument('--snapshot', help='快照ID（latest表示最新快照）')
+    restore_parser.add_argument('--list', action='store_true', help='列出所有备份快照')
+    query_parser = subparsers.add_parser('query', help='在全文索引中检索文档')
+    query_parser.add_argument('terms', nargs='*', help='检索词（多个词须同时出现，不指定时按得分列出文档）')
+    query_parser.add_argument('--theme', help='只返回指定主题的文档')
+    query_parser.add_argument('--limit', type=int, default=20, help='最多返回的文档数')
+    watch_parser = subparsers.add_parser('watch', help='监视文档目录，文件变化时自动增量合并')
+    watch_parser.add_argument('--debounce', type=float, default=DEFAULT_DEBOUNCE,
+                              help='最后一次变化后等待的秒数，期间的变化合并为一批处理')
+    watch_parser.add_argument('--poll-interval', type=float, default=DEFAULT_POLL_INTERVAL,
+                              help='轮询模式下两次扫描之间的间隔（秒）')
+    watch_parser.add_argument('--polling', action='store_true', help='不使用 inotify，始终按间隔轮询')
+    subparsers.add_parser('coordinate', help='扫描分类后把各主题写入工作队列，由一个或多个节点上的 worker 认领合并')
+    worker_parser = subparsers.add_parser('worker', help='认领并合并工作队列中的主题（可在多台机器上同时运行）')
+    worker_parser.add_argument('--wait', action='store_true',
+                               help='没有可认领的主题时继续等待，直到队列全部完成（接手崩溃进程的主题）')
+    worker_parser.add_argument('--lock-timeout', type=float, default=DEFAULT_LOCK_TIMEOUT,
+                               help='锁文件超过该秒数未更新即视为持有者已崩溃')
+    worker_parser.add_argument('--wait-interval', type=float, default=DEFAULT_WAIT_INTERVAL,
+                               help='--wait 模式下检查队列进度的间隔（秒）')
     
     args = parser.parse_args()
+    if args.incremental and args.grouping == 'similarity':
+        parser.error('--incremental 暂不支持 --grouping similarity（相似度聚类需要全部文档的签名）')
+    if args.incremental and args.theme_scoring == 'tfidf':
+        parser.error('--incremental 暂不支持 --theme-scoring tfidf（逆文档频率需要全部文档参与计算）')
+    if args.resume and (args.dry_run or args.apply_plan):
+        parser.error('--resume 不能与 --dry-run 或 --apply-plan 同时使用')
+    if args.command in ('coordinate', 'worker') and (args.dry_run or args.apply_plan or args.resume):
+        parser.error(f'{args.command} 不能与 --dry-run、--apply-plan 或 --resume 同时使用')
+    if args.compress_output and args.shard_size:
+        parser.error('--compress-output 不能与 --shard-size 同时使用（分片用于编辑器直接查看）')
+    if args.command == 'watch':
+        if args.dry_run or args.apply_plan:
+            parser.error('watch 不能与 --dry-run 或 --apply-plan 同时使用')
+        if args.grouping == 'similarity' or args.theme_scoring == 'tfidf':
+            parser.error('watch 基于增量模式，暂不支持 --grouping similarity 和 --theme-scoring tfidf')
+    
+    merger = DocumentMerger(
+        args.docs_path,
+        cache_bytes=args.cache_mb * 1024 * 1024,
+        incremental=args.incremental,
+        jobs=args.jobs,
+        keep_snapshots=args.keep_snapshots,
+        dry_run=args.dry_run,
+        metrics_path=args.metrics_file,
+        prometheus_path=args.prometheus_file,
+        use_index=not args.no_index,
+        grouping=args.grouping,
+        similarity_threshold=args.similarity_threshold,
+        theme_scoring=args.theme_scoring,
+        io_concurrency=args.io_concurrency,
+        resume=args.resume,
+        scan_threads=args.scan_threads,
+        exclude=args.exclude,
+        include=args.include,
+        shard_bytes=args.shard_size * 1024,
+        compress_output=f".{args.compress_output}" if args.compress_output else None,
+        compress_backups=f".{args.compress_backups}" if args.compress_backups else None,
+        log_level=args.log_level,
+        log_format=args.log_format,
+        async_log=args.async_log,
+    )
+    
+    if args.command == 'restore':
+        if args.list or not args.snapshot:
+            for snapshot_id in merger.snapshots.list_snapshots():
+                print(snapshot_id)
+            return
+        merger.restore_backup(args.snapshot)
+        return
+    
+    if args.command == 'query':
+        for row in merger.query_index(args.terms, theme=args.theme, limit=args.limit):
+            score = row['score'] if row['score'] is not None else '-'
+            print(f"{row['path']}  [{row['theme'] or '未分类'}] 得分: {score}")
+            print(f"    {' '.join(row['snippet'].split())}")
+        return
+    
+    if args.command == 'coordinate':
+        merger.coordinate()
+        return
+    
+    if args.command == 'worker':
+        merger.run_worker(wait=args.wait, lock_timeout=args.lock_timeout, wait_interval=args.wait_interval)
+        return
+    
+    if args.command == 'watch':
+        merger.watch(debounce=args.debounce, poll_interval=args.poll_interval, polling=args.polling)
+        return
     
-    if args.dry_run:
-        print("🔍 试运行模式 - 不会实际修改文件")
-        # 在试运行模式下，可以只执行分类和分析，不执行实际合并
+    if args.apply_plan:
+        merger.apply_plan(args.apply_plan)
+        return
     
-    merger = DocumentMerger(args.docs_path)
-    merger.run()
+    plan = merger.run()
+    if args.dry_run and plan is not None:
+        save_plan(plan, args.plan_output)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并预写日志
+合并开始前记录本次运行的全部主题分组，每个主题写完合并文档、删完原文档后各追加一条记录
+（每条记录写入后立即落盘）。运行中断后可据此跳过已完成的主题、补完只删除了一部分原文档的主题，
+无需恢复备份再全量重跑；运行正常结束时删除日志
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+import logging
+
+from storage_backend import LocalStorage, StorageBackend
+
+JOURNAL_VERSION = 1
+
+
+class MergeJournal:
+    def __init__(self, journal_path: Path, tool: str, docs_path: Path,
+                 logger: Optional[logging.Logger] = None, storage: Optional[StorageBackend] = None):
+        self.journal_path = Path(journal_path)
+        self.tool = tool
+        self.docs_path = Path(docs_path)
+        self.logger = logger or logging.getLogger(__name__)
+        self.storage = storage or LocalStorage()
+        self.active = False
+
+    def key(self, doc_path: Path) -> str:
+        """日志中使用相对于文档目录的POSIX路径"""
+        return Path(doc_path).relative_to(self.docs_path).as_posix()
+
+    @staticmethod
+    def _line(record: dict) -> bytes:
+        return (json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8')
+
+    def _append(self, record: dict):
+        self.storage.append(self.journal_path, self._line(record))
+
+    def begin(self, theme_groups: Dict[str, List[Path]], snapshot_id: Optional[str]):
+        """记录本次运行的主题分组（覆盖之前的日志）"""
+        self.storage.write_bytes(self.journal_path, self._line({
+            "event": "begin",
+            "version": JOURNAL_VERSION,
+            "tool": self.tool,
+            "docs_path": str(self.docs_path.resolve()),
+            "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "snapshot": snapshot_id,
+            "themes": [
+                {"theme": theme, "documents": [self.key(doc) for doc in docs]}
+                for theme, docs in theme_groups.items()
+            ],
+        }))
+        self.storage.sync_directory(self.journal_path.parent)
+        self.active = True
+
+    def written(self, theme: str, merged_path: Path, delete: List[Path], shards: List[Path] = ()):
+        """合并文档（及分片）已写入并落盘，即将删除的原文档"""
+        if self.active:
+            self._append({
+                "event": "written",
+                "theme": theme,
+                "output": self.key(merged_path),
+                "shards": [self.key(shard) for shard in shards],
+                "delete": [self.key(doc) for doc in delete],
+            })
+
+    def done(self, theme: str, ok: bool):
+        """主题处理完毕（原文档的删除已落盘）"""
+        if self.active:
+            self._append({"event": "done", "theme": theme, "ok": ok})
+
+    def clear(self):
+        """删除日志（运行正常结束，或文档目录已从快照恢复）"""
+        self.active = False
+        self.storage.unlink(self.journal_path, missing_ok=True)
+
+    def load(self) -> Optional[dict]:
+        """读取未完成的运行：主题分组、已写入和已完成的主题；没有未完成的运行时返回None
+
+        最后一行可能在写入中途崩溃而不完整，忽略即可（对应的步骤会重新执行）
+        """
+        if not self.storage.exists(self.journal_path):
+            return None
+
+        state = None
+        lines = self.storage.read_bytes(self.journal_path).decode('utf-8', errors='replace').splitlines()
+        for line in lines:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                break
+            if record.get("event") == "begin":
+                if record.get("version") != JOURNAL_VERSION or record.get("tool") != self.tool:
+                    raise ValueError(f"无法识别的合并日志: {self.journal_path}")
+                # 状态目录相对于当前目录：换了文档目录（或在其他目录下运行）时不能按日志删除文件
+                if Path(record["docs_path"]).resolve() != self.docs_path.resolve():
+                    raise ValueError(
+                        f"合并日志 {self.journal_path} 的文档目录 {record['docs_path']} 与当前目录 {self.docs_path} 不一致"
+                    )
+                state = {
+                    "snapshot": record.get("snapshot"),
+                    "created": record.get("created"),
+                    "themes": record["themes"],
+                    "written": {},
+                    "done": {},
+                }
+            elif state is not None and record.get("event") == "written":
+                state["written"][record["theme"]] = record
+            elif state is not None and record.get("event") == "done":
+                state["done"][record["theme"]] = record["ok"]
+        self.active = state is not None
+        return state
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并计划
+试运行时把分析结果（主题分组、主文档、得分、输出路径、待删除文件）导出为JSON，
+审核后可直接执行该计划，无需重新扫描和分类
+"""
+
+import json
+import os
+import sys
+from datetime import datetime
+from pathlib import Path
+from typing import List, Optional
+
+from storage_backend import StorageBackend
+
+PLAN_VERSION = 1
+
+
+def build_plan(tool: str, docs_path: Path, config_hash: str, themes: List[dict]) -> dict:
+    """组装完整的合并计划"""
+    return {
+        "version": PLAN_VERSION,
+        "tool": tool,
+        "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        "docs_path": str(docs_path),
+        "config_hash": config_hash,
+        "themes": themes,
+    }
+
+
+def save_plan(plan: dict, plan_path: Optional[str] = None):
+    """写入计划文件；未指定路径时输出到标准输出"""
+    payload = json.dumps(plan, ensure_ascii=False, indent=2)
+    if not plan_path:
+        sys.stdout.write(payload + "\n")
+        return
+
+    plan_path = Path(plan_path)
+    tmp_path = plan_path.with_name(plan_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(payload + "\n")
+    os.replace(tmp_path, plan_path)
+
+
+def load_plan(plan_path: str, tool: str, docs_path: Path, storage: Optional[StorageBackend] = None) -> dict:
+    """读取并校验合并计划（指定存储后端时经由存储后端读取）"""
+    if storage is not None:
+        plan = json.loads(storage.read_bytes(Path(plan_path)).decode('utf-8'))
+    else:
+        with open(plan_path, 'r', encoding='utf-8') as f:
+            plan = json.load(f)
+
+    if plan.get("version") != PLAN_VERSION:
+        raise ValueError(f"不支持的合并计划版本: {plan.get('version')}")
+    if plan.get("tool") != tool:
+        raise ValueError(f"合并计划由 {plan.get('tool')} 生成，不能用 {tool} 执行")
+    if Path(plan["docs_path"]).resolve() != Path(docs_path).resolve():
+        raise ValueError(f"合并计划的文档目录 {plan['docs_path']} 与当前目录 {docs_path} 不一致")
+    return plan
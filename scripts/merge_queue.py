@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+多节点合并工作队列
+协调者完成扫描和分类后，把合并计划（每个主题一项）写入共享文件系统上的队列目录；
+一台或多台机器上的工作进程通过锁文件认领主题（O_EXCL 创建，同一主题只有一个进程能拿到），
+各自合并后写入完成标记。持有锁的进程定期更新锁文件的修改时间，进程崩溃后锁在超时后被回收，
+该主题由其他工作进程按自己的预写日志继续。全部主题完成后，最后一个工作进程统一收尾
+
+队列目录结构:
+    queue.json          合并计划及备份快照ID（原子创建，同时只能存在一个队列）
+    locks/{编号}.lock   主题锁（内容为持有者的主机名、进程号和本次认领的唯一令牌）
+    done/{编号}.json    完成标记
+    journal/{编号}.jsonl 主题的预写日志
+"""
+
+import json
+import os
+import shutil
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Tuple
+import logging
+
+from merged_writer import fsync_directory
+
+QUEUE_VERSION = 1
+
+# 锁文件超过该秒数没有更新即视为持有者已崩溃，可以被回收
+DEFAULT_LOCK_TIMEOUT = 300.0
+
+# worker --wait 模式下检查其他工作进程进度的间隔（秒）
+DEFAULT_WAIT_INTERVAL = 5.0
+
+# 收尾（更新清单、索引和总结报告）使用的锁
+FINALIZE_LOCK = "finalize"
+
+# 文档目录下的工作队列目录（两个合并器各用一个），备份快照不包含，恢复时也不删除
+QUEUE_DIR_NAMES = (".doc_merge_queue", ".doc_merge_queue_enhanced")
+
+
+def worker_name() -> str:
+    """当前工作进程的标识（主机名:进程号）"""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class LockLost(RuntimeError):
+    """锁已不再属于本进程（超时后被其他工作进程回收），应放弃该主题"""
+
+
+def read_lock(lock_path: Path) -> dict:
+    """锁文件的内容，锁不存在或无法读取时返回空字典"""
+    try:
+        with open(lock_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+class QueueLock:
+    """已持有的锁：后台线程定期更新锁文件的修改时间，退出时删除锁文件
+
+    锁文件中记录认领时生成的令牌，更新和删除前都先核对，锁被其他进程回收后不再触碰它。
+    """
+
+    def __init__(self, lock_path: Path, token: str, interval: float, logger: logging.Logger):
+        self.lock_path = lock_path
+        self.token = token
+        self.logger = logger
+        self.lost = False
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._heartbeat, args=(interval,),
+                                        name="queue-lock-heartbeat", daemon=True)
+        self._thread.start()
+
+    def owned(self) -> bool:
+        """锁文件是否仍是本进程认领时创建的"""
+        return not self.lost and read_lock(self.lock_path).get("token") == self.token
+
+    def verify(self):
+        """确认锁仍由本进程持有，否则抛出 LockLost"""
+        if not self.owned():
+            self.lost = True
+            raise LockLost(f"锁 {self.lock_path.name} 已被其他工作进程回收（本进程更新锁超时）")
+
+    def _heartbeat(self, interval: float):
+        while not self._stop.wait(interval):
+            if not self.owned():
+                self.lost = True
+                self.logger.warning(f"⚠️ 锁文件已被回收: {self.lock_path.name}（本进程更新锁超时）")
+                return
+            try:
+                os.utime(self.lock_path)
+            except FileNotFoundError:
+                pass  # 核对之后刚被回收，下一次心跳时发现
+
+    def release(self):
+        self._stop.set()
+        self._thread.join()
+        if self.owned():
+            self.lock_path.unlink(missing_ok=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class WorkQueue:
+    def __init__(self, queue_path: Path, tool: str, docs_path: Path,
+                 lock_timeout: float = DEFAULT_LOCK_TIMEOUT, logger: Optional[logging.Logger] = None):
+        self.queue_path = Path(queue_path)
+        self.tool = tool
+        self.docs_path = Path(docs_path)
+        self.lock_timeout = lock_timeout
+        self.logger = logger or logging.getLogger(__name__)
+        self.queue_file = self.queue_path / "queue.json"
+        self.lock_dir = self.queue_path / "locks"
+        self.done_dir = self.queue_path / "done"
+        self.journal_dir = self.queue_path / "journal"
+
+    def exists(self) -> bool:
+        return self.queue_file.exists()
+
+    def create(self, plan: dict, snapshot_id: Optional[str]):
+        """写入工作队列；已有未收尾的队列时拒绝（避免两个协调者同时分派同一批主题）"""
+        for directory in (self.lock_dir, self.done_dir, self.journal_dir):
+            directory.mkdir(parents=True, exist_ok=True)
+        queue = dict(plan, queue_version=QUEUE_VERSION, snapshot=snapshot_id, coordinator=worker_name())
+        tmp_path = self.queue_path / f".queue.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(queue, ensure_ascii=False, indent=2) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        try:
+            # 硬链接到目标路径：目标已存在时失败，保证同时只有一个协调者能创建队列
+            os.link(tmp_path, self.queue_file)
+        except FileExistsError:
+            raise RuntimeError(f"工作队列 {self.queue_path} 中还有未完成的主题，请先运行 worker 处理完毕")
+        finally:
+            tmp_path.unlink(missing_ok=True)
+        fsync_directory(self.queue_path)
+
+    def load(self) -> Optional[dict]:
+        """读取工作队列，没有队列时返回None"""
+        try:
+            with open(self.queue_file, 'r', encoding='utf-8') as f:
+                queue = json.load(f)
+        except FileNotFoundError:
+            return None
+        if queue.get("queue_version") != QUEUE_VERSION or queue.get("tool") != self.tool:
+            raise ValueError(f"无法识别的工作队列: {self.queue_file}")
+        return queue
+
+    def items(self, queue: dict) -> Iterator[Tuple[str, dict]]:
+        """队列中的各项（编号, 主题计划）"""
+        for number, theme_plan in enumerate(queue["themes"], 1):
+            yield f"{number:04d}", theme_plan
+
+    def journal_path(self, item_id: str) -> Path:
+        return self.journal_dir / f"{item_id}.jsonl"
+
+    def is_done(self, item_id: str) -> bool:
+        return (self.done_dir / f"{item_id}.json").exists()
+
+    def mark_done(self, item_id: str, theme: str, ok: bool):
+        """写入完成标记（原子替换并落盘）"""
+        done_path = self.done_dir / f"{item_id}.json"
+        tmp_path = self.done_dir / f".{item_id}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "theme": theme,
+                "ok": ok,
+                "worker": worker_name(),
+                "finished": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            }, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, done_path)
+        fsync_directory(self.done_dir)
+
+    def results(self, queue: dict) -> Dict[str, Optional[bool]]:
+        """各主题的结果（尚未完成的主题为None）"""
+        results = {}
+        for item_id, theme_plan in self.items(queue):
+            try:
+                with open(self.done_dir / f"{item_id}.json", 'r', encoding='utf-8') as f:
+                    results[theme_plan["theme"]] = json.load(f)["ok"]
+            except FileNotFoundError:
+                results[theme_plan["theme"]] = None
+        return results
+
+    def holder(self, name: str) -> Optional[str]:
+        """锁的当前持有者"""
+        return read_lock(self.lock_dir / f"{name}.lock").get("worker")
+
+    def claim(self, name: str) -> Optional[QueueLock]:
+        """尝试获取锁；已被其他进程持有（且未超时）时返回None"""
+        lock_path = self.lock_dir / f"{name}.lock"
+        token = uuid.uuid4().hex
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644)
+            except FileExistsError:
+                if not self._reclaim(lock_path):
+                    return None
+                continue
+            except FileNotFoundError:
+                return None  # 队列已由其他工作进程收尾并删除
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"worker": worker_name(), "token": token,
+                           "claimed": datetime.now().strftime('%Y-%m-%d %H:%M:%S')}, f)
+                f.flush()
+                os.fsync(f.fileno())
+            # 其他进程回收时可能把刚创建的锁改名移走、再放回之前被第三个进程抢先创建：核对令牌
+            if read_lock(lock_path).get("token") != token:
+                return None
+            return QueueLock(lock_path, token, self.lock_timeout / 4, self.logger)
+        return None
+
+    def _reclaim(self, lock_path: Path) -> bool:
+        """回收超时的锁，返回是否可以重新尝试创建"""
+        try:
+            if time.time() - os.stat(lock_path).st_mtime < self.lock_timeout:
+                return False
+        except FileNotFoundError:
+            return True  # 持有者刚好释放
+        # 先改名再删除：改名是原子的，多个进程同时回收时只有一个会成功
+        stale_path = lock_path.with_name(f".{lock_path.name}.{uuid.uuid4().hex}.stale")
+        try:
+            os.rename(lock_path, stale_path)
+        except FileNotFoundError:
+            return False
+        try:
+            if time.time() - os.stat(stale_path).st_mtime < self.lock_timeout:
+                # 检查与改名之间锁已被其他进程回收并重新创建：放回原处
+                # （放回前已被第三个进程创建时，原持有者核对令牌后会放弃该主题）
+                try:
+                    os.link(stale_path, lock_path)
+                except FileExistsError:
+                    pass
+                return False
+            self.logger.warning(f"⚠️ 回收超时的锁: {lock_path.name}")
+            return True
+        finally:
+            stale_path.unlink(missing_ok=True)
+
+    def remove(self):
+        """删除整个队列目录（收尾完成后）：先删除 queue.json，其他进程随即视为没有队列"""
+        self.queue_file.unlink(missing_ok=True)
+        shutil.rmtree(self.queue_path, ignore_errors=True)
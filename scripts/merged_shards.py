@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并文档分片
+来源文档很多的主题，合并后的文档可能有数MB，编辑器和小程序文档查看器只能整篇加载。
+分片模式下按字节上限把合并内容拆分为多个分片（{主题}_001_合并文档.md …），
+原合并文档改为轻量索引，列出每个分片的来源文档和标题，读者只需加载需要的分片
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+from compressed_docs import logical_path
+from storage_backend import LocalStorage, StorageBackend
+
+# 合并文档的文件名后缀（增强版扫描时据此跳过合并文档，分片沿用同一后缀）
+MERGED_SUFFIX = '_合并文档.md'
+
+# 索引中每个分片最多列出的标题数
+MAX_INDEX_HEADINGS = 20
+
+_HEADING = re.compile(r'^(#{1,2})\s+(.+?)\s*#*\s*$')
+
+
+@dataclass
+class Shard:
+    """一个分片的内容及其来源文档、一二级标题"""
+    body: str = ""
+    sources: List[Path] = field(default_factory=list)
+    headings: List[str] = field(default_factory=list)
+    size: int = 0
+    path: Optional[Path] = None
+
+
+def shard_path(merged_path: Path, number: int) -> Path:
+    """第 number 个分片的路径（与合并文档同目录）"""
+    name = merged_path.name
+    prefix = name[:-len(MERGED_SUFFIX)] if name.endswith(MERGED_SUFFIX) else merged_path.stem
+    return merged_path.with_name(f"{prefix}_{number:03d}{MERGED_SUFFIX}")
+
+
+def existing_shards(merged_path: Path, storage: Optional[StorageBackend] = None) -> List[Path]:
+    """存储中已有的该合并文档的分片（合并文档压缩保存时为之前未压缩时留下的分片）"""
+    name = logical_path(merged_path).name
+    prefix = name[:-len(MERGED_SUFFIX)] if name.endswith(MERGED_SUFFIX) else merged_path.stem
+    pattern = re.compile(re.escape(prefix) + r'_\d{3}' + re.escape(MERGED_SUFFIX) + r'\Z')
+    try:
+        names = (storage or LocalStorage()).listdir(merged_path.parent)
+        return sorted(merged_path.parent / name for name in names if pattern.match(name))
+    except OSError:
+        return []
+
+
+def _pieces(chunk: str, max_bytes: int) -> Iterator[Tuple[str, int]]:
+    """把片段切成不超过 max_bytes 的若干段（按行切分，单行超过上限时独占一段）"""
+    size = len(chunk.encode('utf-8'))
+    if size <= max_bytes:
+        yield chunk, size
+        return
+    lines, lines_size = [], 0
+    for line in chunk.splitlines(keepends=True):
+        line_size = len(line.encode('utf-8'))
+        if lines and lines_size + line_size > max_bytes:
+            yield ''.join(lines), lines_size
+            lines, lines_size = [], 0
+        lines.append(line)
+        lines_size += line_size
+    if lines:
+        yield ''.join(lines), lines_size
+
+
+def iter_shards(sections: Iterable[Tuple[Optional[Path], str]], max_bytes: int,
+                shard_header: Optional[Callable[[int], str]] = None) -> Iterator[Shard]:
+    """把 (来源文档, 内容片段) 序列按字节上限装入分片，逐个产出（内存中只保留当前分片）
+
+    指定 shard_header 时分片开头的标题也计入上限（正文可用的字节数相应减少）
+    """
+    def budget(number: int) -> int:
+        header_size = len(shard_header(number).encode('utf-8')) if shard_header else 0
+        return max(1, max_bytes - header_size)
+
+    number = 1
+    limit, next_limit = budget(1), budget(2)
+    shard = Shard()
+    parts: List[str] = []
+    in_code_block = False
+    for source, chunk in sections:
+        # 按下一个分片的上限切分（编号变长时标题也变长），放不下当前分片的段落移入下一个分片后不会超出上限
+        for piece, size in _pieces(chunk, min(limit, next_limit)):
+            if parts and shard.size + size > limit:
+                shard.body = ''.join(parts)
+                yield shard
+                shard, parts = Shard(), []
+                number += 1
+                limit, next_limit = next_limit, budget(number + 1)
+            parts.append(piece)
+            shard.size += size
+            if source is not None and source not in shard.sources:
+                shard.sources.append(source)
+            for line in piece.splitlines():
+                if line.lstrip().startswith('```'):
+                    in_code_block = not in_code_block
+                elif not in_code_block and len(shard.headings) <= MAX_INDEX_HEADINGS:
+                    match = _HEADING.match(line)
+                    if match:
+                        shard.headings.append(match.group(2))
+    if parts:
+        shard.body = ''.join(parts)
+        yield shard
+
+
+def write_shards(merged_path: Path, shards: Iterable[Shard], shard_header: Callable[[int], str],
+                 storage: Optional[StorageBackend] = None) -> List[Shard]:
+    """写出全部分片，返回分片列表（不含正文）
+
+    分片先写入临时文件并落盘，全部内容生成完毕后才统一替换：
+    旧的分片或索引本身也可能是待合并的源文档，在生成结束之前不能被覆盖
+    """
+    storage = storage or LocalStorage()
+    written: List[Shard] = []
+    temp_paths: List[Path] = []
+    try:
+        for number, shard in enumerate(shards, 1):
+            shard.path = shard_path(merged_path, number)
+            tmp_path, shard.size = storage.write_temp(shard.path, (shard_header(number), shard.body))
+            temp_paths.append(tmp_path)
+            shard.body = ""
+            written.append(shard)
+        for shard, tmp_path in zip(written, temp_paths):
+            storage.replace(tmp_path, shard.path)
+    except BaseException:
+        for tmp_path in temp_paths:
+            storage.unlink(tmp_path, missing_ok=True)
+        raise
+    storage.sync_directory(merged_path.parent)
+    return written
+
+
+def stale_shards(merged_path: Path, keep: Iterable[Path], storage: Optional[StorageBackend] = None) -> List[Path]:
+    """之前运行留下、本次没有再生成的分片（需要删除）"""
+    keep = set(keep)
+    return [path for path in existing_shards(merged_path, storage) if path not in keep]
+
+
+def iter_shard_list(shards: List[Shard], relative: Callable[[Path], str]) -> Iterator[str]:
+    """索引中的分片列表：每个分片的链接、大小、来源文档和标题"""
+    for number, shard in enumerate(shards, 1):
+        yield f"{number}. [{shard.path.name}](<{shard.path.name}>) ({shard.size / 1024:.1f} KB)\n"
+        if shard.sources:
+            yield f"   - 来源: {', '.join(f'`{relative(source)}`' for source in shard.sources)}\n"
+        if shard.headings:
+            headings = shard.headings[:MAX_INDEX_HEADINGS]
+            more = " …" if len(shard.headings) > MAX_INDEX_HEADINGS else ""
+            yield f"   - 标题: {' / '.join(headings)}{more}\n"
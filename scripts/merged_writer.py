@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+合并文档流式写入
+将生成器产出的文本片段（或压缩后的字节）直接写入目标文件，避免在内存中拼接完整的合并文档
+"""
+
+import os
+from pathlib import Path
+from typing import Iterable, Union
+
+
+def temp_path_for(path: Path) -> Path:
+    """同目录下的临时文件（以点开头，不会被文档扫描收录）"""
+    return path.with_name(f".{path.name}.tmp")
+
+
+def fsync_directory(path: Path):
+    """将目录项的变化（新建、重命名、删除）落盘；Windows 不支持打开目录，直接跳过"""
+    if os.name == 'nt':
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def write_chunks(path: Path, chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8') -> int:
+    """流式写入文本片段（字节片段原样写入），返回写入的字节数
+
+    先写入同目录临时文件再替换目标文件：目标文件本身也可能是待合并的源文档，
+    在全部内容生成完毕之前不能被截断。临时文件和目录项均在返回前落盘，
+    返回后即使系统崩溃，目标文件也只会是完整的新内容
+    """
+    path = Path(path)
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, 'wb') as f:
+            for chunk in chunks:
+                f.write(chunk.encode(encoding) if isinstance(chunk, str) else chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        written = os.path.getsize(tmp_path)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    fsync_directory(path.parent)
+    return written
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+并行文档分析
+将读取、解码、关键词匹配（或 MinHash 签名）和重要性评分分发到进程池中执行，
+结果按输入顺序返回，与单进程运行完全一致
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from document_store import DocumentInfo
+from keyword_matcher import ThemeMatcher
+
+
+@dataclass
+class DocumentAnalysis:
+    """单个文档的分析结果"""
+    path: Path
+    keyword_hits: Dict[int, int]  # 命中的关键词编号 → 来源权重，主题得分在汇总后批量计算
+    importance: int
+    length: int
+    info: Optional[DocumentInfo]  # 得分取自评分缓存时未读取全文，没有元数据
+    signature: Optional[Tuple[int, ...]] = None  # 按相似度分组时的 MinHash 签名
+    features: Optional[Dict[str, bool]] = None  # 新算出的内容评分依据，由父进程写入评分缓存
+
+
+# 工作进程内的合并器实例及编译好的关键词匹配器
+_worker_merger = None
+_worker_matcher = None
+
+
+def _init_worker(merger):
+    global _worker_merger, _worker_matcher
+    _worker_merger = merger
+    _worker_matcher = ThemeMatcher(merger.theme_keywords)
+
+
+def _analyze(doc_path: Path, cached: Optional[Tuple[int, int]]) -> DocumentAnalysis:
+    analysis = _worker_merger.analyze_document(doc_path, _worker_matcher, cached)
+    # 工作进程只负责分析，分析完成后即释放文本缓存
+    _worker_merger.store.clear()
+    return analysis
+
+
+def default_jobs() -> int:
+    """默认并行度：可用CPU数"""
+    return os.cpu_count() or 1
+
+
+def analyze_documents(merger, documents: List[Path], jobs: int) -> List[DocumentAnalysis]:
+    """使用进程池分析文档，返回结果与输入顺序一致
+
+    评分缓存只在父进程中访问：已缓存得分的文档在工作进程中不再读取全文和评分，
+    工作进程新算出的评分依据在分析完成后写回缓存
+    """
+    cached = [merger.cached_importance(doc_path) for doc_path in documents]
+    # 每个工作进程分到若干批次，减少进程间通信次数
+    chunksize = max(1, len(documents) // (jobs * 4))
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=(merger,)) as pool:
+        analyses = list(pool.map(_analyze, documents, cached, chunksize=chunksize))
+    for analysis in analyses:
+        if analysis.features is not None:
+            merger.cache_importance(analysis.info, analysis.length, analysis.features)
+    merger.score_cache.commit()
+    return analyses
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+重要性评分缓存
+文档内容部分的重要性得分及其依据（文本长度、是否含有各结构标记）按内容哈希持久化在 SQLite 中，
+得分同时记录计算时所用权重表的指纹：权重变化后直接按缓存的依据重新计分，无需重新读取文档。
+另按路径记录大小、修改时间和内容哈希，未变化的文档连内容哈希都不必重新计算
+"""
+
+import json
+import sqlite3
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+import logging
+
+SCORE_CACHE_VERSION = 1
+
+
+class ScoreCache:
+    def __init__(self, cache_path: Path, weights_hash: str, logger: Optional[logging.Logger] = None):
+        self.cache_path = Path(cache_path)
+        self.weights_hash = weights_hash
+        self.logger = logger or logging.getLogger(__name__)
+        self.conn: Optional[sqlite3.Connection] = None
+        self.disabled = False
+
+    def __getstate__(self):
+        # 跨进程传递时不携带数据库连接
+        state = self.__dict__.copy()
+        state["conn"] = None
+        return state
+
+    def _connect(self) -> Optional[sqlite3.Connection]:
+        """首次使用时打开（必要时创建）缓存；无法打开时本次运行不再使用缓存"""
+        if self.conn is not None or self.disabled:
+            return self.conn
+        try:
+            self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+            self.conn = sqlite3.connect(str(self.cache_path))
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+            meta = dict(self.conn.execute("SELECT key, value FROM meta").fetchall())
+            if meta.get("version") != str(SCORE_CACHE_VERSION):
+                self.conn.execute("DROP TABLE IF EXISTS scores")
+                self.conn.execute("DROP TABLE IF EXISTS files")
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('version', ?)", (str(SCORE_CACHE_VERSION),)
+                )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS scores ("
+                "hash TEXT PRIMARY KEY, length INTEGER, features TEXT, weights TEXT, score INTEGER)"
+            )
+            self.conn.execute(
+                "CREATE TABLE IF NOT EXISTS files (path TEXT PRIMARY KEY, size INTEGER, mtime_ns INTEGER, hash TEXT)"
+            )
+            self.conn.commit()
+        except sqlite3.Error as e:
+            self.logger.warning(f"⚠️ 评分缓存不可用: {e}")
+            self.disabled = True
+            self.conn = None
+        return self.conn
+
+    def content_hash(self, key: str, size: int, mtime_ns: int) -> Optional[str]:
+        """大小和修改时间与记录一致时返回记录的内容哈希"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT hash FROM files WHERE path = ? AND size = ? AND mtime_ns = ?", (key, size, mtime_ns)
+        ).fetchone()
+        return row[0] if row else None
+
+    def get(self, content_hash: str) -> Optional[Tuple[int, Dict[str, bool], Optional[int]]]:
+        """缓存的 (文本长度, 结构标记, 得分)；得分由其他权重表算出时为None"""
+        conn = self._connect()
+        if conn is None:
+            return None
+        row = conn.execute(
+            "SELECT length, features, weights, score FROM scores WHERE hash = ?", (content_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        length, features, weights, score = row
+        return length, json.loads(features), score if weights == self.weights_hash else None
+
+    def put(self, key: str, size: int, mtime_ns: int, content_hash: str,
+            length: int, features: Dict[str, bool], score: int):
+        """记录文档的评分依据和得分"""
+        conn = self._connect()
+        if conn is None:
+            return
+        conn.execute(
+            "INSERT OR REPLACE INTO scores (hash, length, features, weights, score) VALUES (?, ?, ?, ?, ?)",
+            (content_hash, length, json.dumps(features, ensure_ascii=False, sort_keys=True),
+             self.weights_hash, score),
+        )
+        self.remember_file(key, size, mtime_ns, content_hash)
+
+    def remember_file(self, key: str, size: int, mtime_ns: int, content_hash: str):
+        """记录路径当前的大小、修改时间和内容哈希"""
+        conn = self._connect()
+        if conn is not None:
+            conn.execute(
+                "INSERT OR REPLACE INTO files (path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+                (key, size, mtime_ns, content_hash),
+            )
+
+    def commit(self):
+        if self.conn is not None:
+            try:
+                self.conn.commit()
+            except sqlite3.Error as e:
+                self.logger.warning(f"⚠️ 评分缓存写入失败: {e}")
+
+    def close(self):
+        if self.conn is not None:
+            self.commit()
+            self.conn.close()
+            self.conn = None
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+相似度聚类
+对文档的字符 shingle 计算 MinHash 签名（无需中文分词），再用局部敏感哈希（LSH）
+分桶找出候选的相似文档对，聚类开销随文档数近似线性增长，避免两两比较的 O(n²)
+"""
+
+import re
+import zlib
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# 签名长度 = 分段数 × 每段行数；32段×4行时，估计相似度约0.42以上的文档对大概率落入同一个桶
+DEFAULT_NUM_PERM = 128
+DEFAULT_BANDS = 32
+
+# 字符 shingle 长度（中文2~3个字符即可区分话题）
+DEFAULT_SHINGLE_SIZE = 3
+
+# 归入同一组所需的最低估计相似度（Jaccard）
+DEFAULT_THRESHOLD = 0.5
+
+# 只取文档前若干字符计算签名，超长文档的开销保持有界
+MAX_SHINGLE_CHARS = 20000
+
+# 空分箱占位值，以及借用相邻分箱时按距离叠加的偏移量（保证与真实哈希值不冲突）
+_EMPTY = 1 << 32
+_OFFSET = 1 << 32
+
+_WHITESPACE = re.compile(r'\s+')
+
+Signature = Tuple[int, ...]
+
+
+def minhash_signature(text: str, num_perm: int = DEFAULT_NUM_PERM,
+                      shingle_size: int = DEFAULT_SHINGLE_SIZE) -> Optional[Signature]:
+    """计算文本的 MinHash 签名，文本过短时返回None
+
+    采用单次排列哈希（one permutation hashing）：每个 shingle 只哈希一次，按哈希值分到
+    num_perm 个分箱并保留各分箱的最小值，空分箱借用右侧最近的非空分箱（rotation densification）。
+    """
+    text = _WHITESPACE.sub('', text[:MAX_SHINGLE_CHARS].lower())
+    if len(text) < shingle_size:
+        return None
+
+    bins = [_EMPTY] * num_perm
+    for shingle in {text[i:i + shingle_size] for i in range(len(text) - shingle_size + 1)}:
+        # CRC32 速度快但低位相关性较强，乘以黄金比例常数打散后再分箱
+        value = (zlib.crc32(shingle.encode('utf-8')) * 0x9E3779B1) & 0xFFFFFFFF
+        slot = value % num_perm
+        if value < bins[slot]:
+            bins[slot] = value
+
+    signature = list(bins)
+    for slot in range(num_perm):
+        if bins[slot] != _EMPTY:
+            continue
+        for distance in range(1, num_perm):
+            borrowed = bins[(slot + distance) % num_perm]
+            if borrowed != _EMPTY:
+                signature[slot] = borrowed + distance * _OFFSET
+                break
+    return tuple(signature)
+
+
+def estimate_similarity(a: Signature, b: Signature) -> float:
+    """由签名估计两个文档 shingle 集合的 Jaccard 相似度"""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+def cluster_signatures(signatures: Sequence[Optional[Signature]], threshold: float = DEFAULT_THRESHOLD,
+                       bands: int = DEFAULT_BANDS) -> List[List[int]]:
+    """用 LSH 分桶聚类签名，返回包含两个及以上文档的分组（元素为输入下标，保持输入顺序）
+
+    每个桶内只与该桶的第一个文档比较估计相似度，达到阈值即合并（并查集），
+    因此总比较次数为 文档数 × 分段数。
+    """
+    parent = list(range(len(signatures)))
+
+    def find(index: int) -> int:
+        while parent[index] != index:
+            parent[index] = parent[parent[index]]
+            index = parent[index]
+        return index
+
+    for band in range(bands):
+        buckets: Dict[Signature, int] = {}
+        for index, signature in enumerate(signatures):
+            if signature is None:
+                continue
+            rows = len(signature) // bands
+            key = signature[band * rows:(band + 1) * rows]
+            first = buckets.setdefault(key, index)
+            if first == index:
+                continue
+            root_first, root_index = find(first), find(index)
+            if root_first != root_index and estimate_similarity(signatures[first], signature) >= threshold:
+                # 以较早的文档为根，分组顺序与输入顺序一致
+                parent[max(root_first, root_index)] = min(root_first, root_index)
+
+    groups: Dict[int, List[int]] = {}
+    for index in range(len(signatures)):
+        groups.setdefault(find(index), []).append(index)
+    return [members for members in groups.values() if len(members) > 1]
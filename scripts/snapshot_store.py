@@ -0,0 +1,257 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+内容寻址的备份快照仓库
+文件内容按SHA-256哈希只存储一次（objects/），每次备份只记录一份小的快照清单（snapshots/），
+因此每次备份只需写入发生变化的字节，并且可以低成本地保留多代备份。
+文档目录和仓库都经由存储后端读写（默认为本地磁盘）；指定压缩格式时新写入的文件内容压缩保存
+"""
+
+import hashlib
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+import logging
+
+from compressed_docs import AVAILABLE_COMPRESSIONS, compression_of, decompress, iter_compressed
+from storage_backend import LocalStorage, StorageBackend
+
+SNAPSHOT_VERSION = 1
+CHUNK_SIZE = 1024 * 1024
+
+# 默认保留的快照代数
+DEFAULT_KEEP_SNAPSHOTS = 10
+
+# 快照ID：创建时间，同一秒内的后续快照加序号（{时间}_1、{时间}_2 …）
+_SNAPSHOT_ID = re.compile(r'(\d{8}_\d{6})(?:_(\d+))?\Z')
+
+
+def snapshot_order(snapshot_id: str) -> Tuple[str, int, str]:
+    """快照ID的排序键：按创建时间，同一秒内按序号的数值（_10 排在 _2 之后）"""
+    match = _SNAPSHOT_ID.match(snapshot_id)
+    if match is None:
+        return snapshot_id, 0, snapshot_id
+    return match.group(1), int(match.group(2) or 0), snapshot_id
+
+
+class SnapshotStore:
+    def __init__(self, store_path: Path, logger: Optional[logging.Logger] = None,
+                 storage: Optional[StorageBackend] = None, compression: Optional[str] = None,
+                 skip_dirs: Iterable[str] = ()):
+        self.store_path = Path(store_path)
+        self.objects_path = self.store_path / "objects"
+        self.snapshots_path = self.store_path / "snapshots"
+        self.logger = logger or logging.getLogger(__name__)
+        self.storage = storage or LocalStorage()
+        # 新文件内容的压缩格式（如 .gz，None 表示不压缩）；已存储的内容无论是否压缩都可复用
+        self.compression = compression
+        # 源目录下属于本工具的内部目录（相对路径，如工作队列）：不做快照，恢复时也原样保留
+        self.skip_dirs = set(skip_dirs)
+
+    def is_store(self) -> bool:
+        return self.storage.is_dir(self.snapshots_path)
+
+    def prepare(self):
+        """初始化仓库目录；旧版整目录复制的备份会被替换（与旧版每次运行先删除上一份备份一致）"""
+        if self.storage.exists(self.store_path) and not self.is_store():
+            self.logger.info(f"🧹 清理旧版整目录备份: {self.store_path}")
+            self.storage.remove_tree(self.store_path)
+        self.storage.mkdir(self.objects_path)
+        self.storage.mkdir(self.snapshots_path)
+
+    def list_snapshots(self) -> List[str]:
+        """按时间顺序返回所有快照ID"""
+        if not self.is_store():
+            return []
+        return sorted((name[:-len(".json")] for name in self.storage.listdir(self.snapshots_path)
+                       if name.endswith(".json") and not name.startswith(".")), key=snapshot_order)
+
+    def load_snapshot(self, snapshot_id: str) -> dict:
+        if snapshot_id == "latest":
+            snapshots = self.list_snapshots()
+            if not snapshots:
+                raise FileNotFoundError(f"备份仓库中没有快照: {self.store_path}")
+            snapshot_id = snapshots[-1]
+        snapshot_file = self.snapshots_path / f"{snapshot_id}.json"
+        if not self.storage.exists(snapshot_file):
+            raise FileNotFoundError(f"快照不存在: {snapshot_id}")
+        return json.loads(self.storage.read_bytes(snapshot_file).decode('utf-8'))
+
+    def create(self, source_path: Path) -> dict:
+        """为目录创建快照，返回快照清单"""
+        self.prepare()
+        source_path = Path(source_path)
+
+        # 大小和修改时间均未变化的文件直接沿用上一份快照中的哈希，无需重新读取
+        previous_files: Dict[str, dict] = {}
+        snapshots = self.list_snapshots()
+        if snapshots:
+            previous_files = self.load_snapshot(snapshots[-1]).get("files", {})
+
+        files = {}
+        directories = []
+        new_blobs = 0
+        new_bytes = 0
+        for root, dirs, filenames in self.storage.walk(source_path):
+            rel_root = Path(root).relative_to(source_path)
+            dirs[:] = sorted(d for d in dirs if not self._is_skipped((rel_root / d).as_posix()))
+            directories.extend((Path(root) / d).relative_to(source_path).as_posix() for d in dirs)
+            for filename in sorted(filenames):
+                file_path = Path(root) / filename
+                rel = file_path.relative_to(source_path).as_posix()
+                st = self.storage.stat(file_path)
+
+                previous = previous_files.get(rel)
+                if (previous and previous["size"] == st.st_size and previous["mtime_ns"] == st.st_mtime_ns
+                        and self.storage.exists(self._blob_path(previous["hash"], previous.get("compression")))):
+                    content_hash, compression = previous["hash"], previous.get("compression")
+                else:
+                    content_hash = self._hash_file(file_path)
+                    blob_path, is_new = self._store_blob(file_path, content_hash)
+                    compression = compression_of(blob_path)
+                    if is_new:
+                        new_blobs += 1
+                        new_bytes += st.st_size
+
+                files[rel] = {
+                    "hash": content_hash,
+                    "size": st.st_size,
+                    "mtime_ns": st.st_mtime_ns,
+                    "mode": st.st_mode & 0o777,
+                }
+                if compression:
+                    files[rel]["compression"] = compression
+
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "id": self._new_snapshot_id(),
+            "created": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            "source": str(source_path),
+            "files": files,
+            "directories": directories,
+            "new_blobs": new_blobs,
+            "new_bytes": new_bytes,
+        }
+        snapshot_file = self.snapshots_path / f"{snapshot['id']}.json"
+        payload = json.dumps(snapshot, ensure_ascii=False, indent=2, sort_keys=True)
+        self.storage.write_bytes(snapshot_file, payload.encode('utf-8'))
+        return snapshot
+
+    def restore(self, snapshot_id: str, target_path: Path) -> dict:
+        """将目录恢复为快照时的状态：恢复快照中的文件，删除快照之后新增的文件（内部目录除外）"""
+        snapshot = self.load_snapshot(snapshot_id)
+        target_path = Path(target_path)
+        files = snapshot["files"]
+        directories = set(snapshot.get("directories", []))
+
+        restored = 0
+        removed = 0
+        if self.storage.exists(target_path):
+            for root, dirs, filenames in list(self.storage.walk(target_path, topdown=False)):
+                for filename in filenames:
+                    file_path = Path(root) / filename
+                    rel = file_path.relative_to(target_path).as_posix()
+                    if rel not in files and not self._is_skipped(rel):
+                        self.storage.unlink(file_path)
+                        removed += 1
+                for dirname in dirs:
+                    dir_path = Path(root) / dirname
+                    rel = dir_path.relative_to(target_path).as_posix()
+                    if (rel not in directories and not self._is_skipped(rel)
+                            and not self.storage.listdir(dir_path)):
+                        self.storage.rmdir(dir_path)
+
+        for rel in directories:
+            self.storage.mkdir(target_path / rel)
+
+        for rel, entry in files.items():
+            file_path = target_path / rel
+            if self.storage.exists(file_path):
+                st = self.storage.stat(file_path)
+                if st.st_size == entry["size"] and st.st_mtime_ns == entry["mtime_ns"]:
+                    continue
+            blob_path = self._blob_path(entry["hash"], entry.get("compression"))
+            if entry.get("compression"):
+                data = decompress(self.storage.read_bytes(blob_path), entry["compression"])
+                self.storage.write_bytes(file_path, data, mtime_ns=entry["mtime_ns"], mode=entry["mode"])
+            else:
+                self.storage.copy_file(blob_path, file_path, mtime_ns=entry["mtime_ns"], mode=entry["mode"])
+            restored += 1
+
+        return {"id": snapshot["id"], "restored": restored, "removed": removed, "total": len(files)}
+
+    def prune(self, keep: int) -> int:
+        """只保留最近的 keep 份快照，并清理不再被引用的文件内容，返回删除的快照数"""
+        snapshots = self.list_snapshots()
+        if keep <= 0 or len(snapshots) <= keep:
+            return 0
+
+        expired = snapshots[:-keep]
+        for snapshot_id in expired:
+            self.storage.unlink(self.snapshots_path / f"{snapshot_id}.json")
+
+        referenced = set()
+        for snapshot_id in snapshots[-keep:]:
+            referenced.update(entry["hash"] for entry in self.load_snapshot(snapshot_id)["files"].values())
+        for prefix in self.storage.listdir(self.objects_path):
+            prefix_path = self.objects_path / prefix
+            if not self.storage.is_dir(prefix_path):
+                continue
+            for name in self.storage.listdir(prefix_path):
+                if not name.startswith('.') and name.partition('.')[0] not in referenced:
+                    self.storage.unlink(prefix_path / name)
+
+        return len(expired)
+
+    def _is_skipped(self, rel: str) -> bool:
+        """相对路径是否位于本工具的内部目录中"""
+        return any(rel == skipped or rel.startswith(skipped + '/') for skipped in self.skip_dirs)
+
+    def _new_snapshot_id(self) -> str:
+        base_id = datetime.now().strftime('%Y%m%d_%H%M%S')
+        snapshot_id = base_id
+        suffix = 1
+        while self.storage.exists(self.snapshots_path / f"{snapshot_id}.json"):
+            snapshot_id = f"{base_id}_{suffix}"
+            suffix += 1
+        return snapshot_id
+
+    def _blob_path(self, content_hash: str, compression: Optional[str] = None) -> Path:
+        return self.objects_path / content_hash[:2] / (content_hash + (compression or ''))
+
+    def _existing_blob(self, content_hash: str) -> Optional[Path]:
+        """已存储的该内容（优先当前的压缩格式）"""
+        for compression in dict.fromkeys([self.compression, None, *sorted(AVAILABLE_COMPRESSIONS)]):
+            blob_path = self._blob_path(content_hash, compression)
+            if self.storage.exists(blob_path):
+                return blob_path
+        return None
+
+    def _hash_file(self, file_path: Path) -> str:
+        digest = hashlib.sha256()
+        with self.storage.open_read(file_path) as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def _store_blob(self, file_path: Path, content_hash: str) -> Tuple[Path, bool]:
+        """内容尚未存储时写入（按需流式压缩），返回存储路径及是否写入了新内容"""
+        blob_path = self._existing_blob(content_hash)
+        if blob_path is not None:
+            return blob_path, False
+        blob_path = self._blob_path(content_hash, self.compression)
+        if self.compression is None:
+            self.storage.copy_file(file_path, blob_path)
+            return blob_path, True
+        self.storage.mkdir(blob_path.parent)
+        with self.storage.open_read(file_path) as f:
+            chunks = iter(lambda: f.read(CHUNK_SIZE), b'')
+            tmp_path, _ = self.storage.write_temp(blob_path, iter_compressed(chunks, self.compression))
+        try:
+            self.storage.replace(tmp_path, blob_path)
+        except BaseException:
+            self.storage.unlink(tmp_path, missing_ok=True)
+            raise
+        return blob_path, True
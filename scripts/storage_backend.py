@@ -0,0 +1,411 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+存储后端
+合并器对文档目录、备份快照、文档清单、预写日志和总结报告的读写都经由存储后端：
+LocalStorage 直接读写本地磁盘（默认）；MemoryStorage 把文件保存在内存中的 路径→字节 映射里，
+可以在其他工具或测试中以零磁盘I/O运行完整的合并流程，也便于把分类开销与存储延迟分开测量。
+路径均为 pathlib.Path，与本地磁盘上的用法一致
+"""
+
+import errno
+import io
+import os
+import shutil
+import stat as stat_module
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
+
+from merged_writer import fsync_directory, temp_path_for, write_chunks
+from tree_scanner import list_directory
+
+# list_directory 的返回值：([(文件名, stat信息或None)], [可进入的子目录名])
+DirectoryListing = Tuple[List[Tuple[str, Optional["FileStat"]]], List[str]]
+
+
+@dataclass(frozen=True)
+class FileStat:
+    """内存文件的 stat 信息（字段名与 os.stat_result 一致）"""
+    st_size: int
+    st_mtime_ns: int
+    st_mode: int = stat_module.S_IFREG | 0o644
+
+    @property
+    def st_mtime(self) -> float:
+        return self.st_mtime_ns / 1e9
+
+
+class StorageBackend(ABC):
+    """存储后端接口；local 表示是否为本地磁盘（inotify 监视、多节点队列、SQLite 索引等只在本地磁盘上可用）
+
+    子类必须实现全部抽象方法，否则创建实例时即报错（而不是在合并途中）
+    """
+
+    name = "base"
+    local = False
+
+    @abstractmethod
+    def stat(self, path: Path):
+        """文件的 stat 信息（至少包含 st_size、st_mtime_ns、st_mtime、st_mode），不存在时抛出 FileNotFoundError"""
+
+    @abstractmethod
+    def exists(self, path: Path) -> bool:
+        """文件或目录是否存在"""
+
+    @abstractmethod
+    def is_dir(self, path: Path) -> bool:
+        """是否为已存在的目录"""
+
+    @abstractmethod
+    def listdir(self, path: Path) -> List[str]:
+        """目录中的文件名和子目录名，目录不存在时抛出 FileNotFoundError"""
+
+    @abstractmethod
+    def list_directory(self, path: Path, suffixes: Optional[Set[str]] = None,
+                       want_stat: bool = False) -> DirectoryListing:
+        """列出目录中扩展名符合的文件（可附带 stat 信息）和可进入的子目录，无法列出时返回空结果"""
+
+    @abstractmethod
+    def walk(self, path: Path, topdown: bool = True) -> Iterator[Tuple[str, List[str], List[str]]]:
+        """与 os.walk 相同的遍历（topdown 时可以原地修改 dirs 控制进入的子目录）"""
+
+    @abstractmethod
+    def open_read(self, path: Path) -> BinaryIO:
+        """以二进制方式打开文件读取（支持 seek）"""
+
+    def read_bytes(self, path: Path) -> bytes:
+        with self.open_read(path) as f:
+            return f.read()
+
+    @abstractmethod
+    def write_temp(self, path: Path, chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8') -> Tuple[Path, int]:
+        """把内容写入 path 同目录的临时文件并落盘，返回临时文件路径和写入的字节数"""
+
+    @abstractmethod
+    def replace(self, src: Path, dst: Path):
+        """原子地用 src 替换 dst"""
+
+    def write_chunks(self, path: Path, chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8') -> int:
+        """流式写入：先写临时文件再原子替换目标文件，返回写入的字节数"""
+        tmp_path, written = self.write_temp(path, chunks, encoding)
+        try:
+            self.replace(tmp_path, path)
+        except BaseException:
+            self.unlink(tmp_path, missing_ok=True)
+            raise
+        self.sync_directory(path.parent)
+        return written
+
+    @abstractmethod
+    def write_bytes(self, path: Path, data: bytes, mtime_ns: Optional[int] = None, mode: Optional[int] = None):
+        """原子写入整个文件（必要时创建上级目录），可指定修改时间和权限"""
+
+    def copy_file(self, src: Path, dst: Path, mtime_ns: Optional[int] = None, mode: Optional[int] = None):
+        """原子复制文件（必要时创建上级目录），可指定修改时间和权限"""
+        self.write_bytes(dst, self.read_bytes(src), mtime_ns=mtime_ns, mode=mode)
+
+    @abstractmethod
+    def append(self, path: Path, data: bytes):
+        """追加内容并落盘"""
+
+    @abstractmethod
+    def unlink(self, path: Path, missing_ok: bool = False):
+        """删除文件，不存在时抛出 FileNotFoundError（missing_ok 时忽略）"""
+
+    @abstractmethod
+    def mkdir(self, path: Path):
+        """创建目录（含上级目录，已存在时忽略）"""
+
+    @abstractmethod
+    def rmdir(self, path: Path):
+        """删除空目录"""
+
+    @abstractmethod
+    def remove_tree(self, path: Path):
+        """删除整个目录树"""
+
+    def sync_directory(self, path: Path):
+        """将目录项的变化落盘"""
+
+
+class LocalStorage(StorageBackend):
+    """本地磁盘"""
+
+    name = "local"
+    local = True
+
+    def stat(self, path: Path) -> os.stat_result:
+        return os.stat(path)
+
+    def exists(self, path: Path) -> bool:
+        return os.path.exists(path)
+
+    def is_dir(self, path: Path) -> bool:
+        return os.path.isdir(path)
+
+    def listdir(self, path: Path) -> List[str]:
+        return os.listdir(path)
+
+    def list_directory(self, path: Path, suffixes: Optional[Set[str]] = None,
+                       want_stat: bool = False) -> DirectoryListing:
+        return list_directory(path, suffixes, want_stat)
+
+    def walk(self, path: Path, topdown: bool = True) -> Iterator[Tuple[str, List[str], List[str]]]:
+        return os.walk(path, topdown=topdown)
+
+    def open_read(self, path: Path) -> BinaryIO:
+        return open(path, 'rb')
+
+    def write_temp(self, path: Path, chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8') -> Tuple[Path, int]:
+        tmp_path = temp_path_for(path)
+        try:
+            with open(tmp_path, 'wb') as f:
+                for chunk in chunks:
+                    f.write(chunk.encode(encoding) if isinstance(chunk, str) else chunk)
+                f.flush()
+                os.fsync(f.fileno())
+            return tmp_path, os.path.getsize(tmp_path)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def replace(self, src: Path, dst: Path):
+        os.replace(src, dst)
+
+    def write_chunks(self, path: Path, chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8') -> int:
+        return write_chunks(path, chunks, encoding)
+
+    def _finish(self, tmp_path: Path, path: Path, mtime_ns: Optional[int], mode: Optional[int]):
+        if mode is not None:
+            os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+        if mtime_ns is not None:
+            os.utime(path, ns=(mtime_ns, mtime_ns))
+
+    def write_bytes(self, path: Path, data: bytes, mtime_ns: Optional[int] = None, mode: Optional[int] = None):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # 临时文件名带上进程号：并行分析时多个进程可能同时写入同一个缓存文件
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            self._finish(tmp_path, path, mtime_ns, mode)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def copy_file(self, src: Path, dst: Path, mtime_ns: Optional[int] = None, mode: Optional[int] = None):
+        dst = Path(dst)
+        dst.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = dst.with_name(f".{dst.name}.{os.getpid()}.tmp")
+        try:
+            shutil.copyfile(src, tmp_path)
+            self._finish(tmp_path, dst, mtime_ns, mode)
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    def append(self, path: Path, data: bytes):
+        with open(path, 'ab') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+
+    def unlink(self, path: Path, missing_ok: bool = False):
+        Path(path).unlink(missing_ok=missing_ok)
+
+    def mkdir(self, path: Path):
+        Path(path).mkdir(parents=True, exist_ok=True)
+
+    def rmdir(self, path: Path):
+        Path(path).rmdir()
+
+    def remove_tree(self, path: Path):
+        shutil.rmtree(path)
+
+    def sync_directory(self, path: Path):
+        fsync_directory(path)
+
+
+def _not_found(path) -> FileNotFoundError:
+    return FileNotFoundError(errno.ENOENT, os.strerror(errno.ENOENT), str(path))
+
+
+class MemoryStorage(StorageBackend):
+    """内存中的 路径→字节 映射；目录由文件路径隐含，也可以单独创建空目录
+
+    files 可以传入初始内容（路径 → 字节或文本），便于在测试中直接构造文档目录
+    """
+
+    name = "memory"
+    local = False
+
+    def __init__(self, files: Optional[Dict[Union[str, Path], Union[str, bytes]]] = None):
+        self._files: Dict[str, bytes] = {}
+        self._stats: Dict[str, FileStat] = {}
+        # 目录 → {子项名称: 是否为目录}（按创建顺序）
+        self._children: Dict[str, Dict[str, bool]] = {}
+        self._last_mtime_ns = 0
+        for path, data in (files or {}).items():
+            self.write_bytes(Path(path), data.encode('utf-8') if isinstance(data, str) else data)
+
+    @staticmethod
+    def _key(path) -> str:
+        return os.path.normpath(os.fspath(path))
+
+    def _now_ns(self) -> int:
+        # 修改时间严格递增，连续写入同一文件时大小不变也能被识别为变化
+        self._last_mtime_ns = max(time.time_ns(), self._last_mtime_ns + 1)
+        return self._last_mtime_ns
+
+    def _add_parents(self, key: str):
+        """登记 key 的各级上级目录"""
+        while True:
+            parent = os.path.dirname(key) or os.curdir
+            if parent == key:
+                return
+            children = self._children.setdefault(parent, {})
+            is_new = not children
+            children.setdefault(os.path.basename(key), key in self._children)
+            if not is_new or parent in (os.curdir, os.sep):
+                return
+            key = parent
+
+    def _store(self, path, data: bytes, mtime_ns: Optional[int] = None, mode: Optional[int] = None):
+        key = self._key(path)
+        if key in self._children:
+            raise IsADirectoryError(errno.EISDIR, os.strerror(errno.EISDIR), str(path))
+        self._files[key] = bytes(data)
+        self._stats[key] = FileStat(len(data), mtime_ns if mtime_ns is not None else self._now_ns(),
+                                    stat_module.S_IFREG | (mode if mode is not None else 0o644))
+        self._add_parents(key)
+
+    def files(self) -> Dict[Path, bytes]:
+        """全部文件的路径和内容（便于测试中检查结果）"""
+        return {Path(key): data for key, data in self._files.items()}
+
+    def stat(self, path: Path) -> FileStat:
+        key = self._key(path)
+        if key in self._stats:
+            return self._stats[key]
+        if key in self._children:
+            return FileStat(0, 0, stat_module.S_IFDIR | 0o755)
+        raise _not_found(path)
+
+    def exists(self, path: Path) -> bool:
+        key = self._key(path)
+        return key in self._files or key in self._children
+
+    def is_dir(self, path: Path) -> bool:
+        return self._key(path) in self._children
+
+    def listdir(self, path: Path) -> List[str]:
+        children = self._children.get(self._key(path))
+        if children is None:
+            raise _not_found(path)
+        return list(children)
+
+    def list_directory(self, path: Path, suffixes: Optional[Set[str]] = None,
+                       want_stat: bool = False) -> DirectoryListing:
+        key = self._key(path)
+        files, dirs = [], []
+        for name, is_dir in self._children.get(key, {}).items():
+            if is_dir:
+                dirs.append(name)
+            elif suffixes is None or os.path.splitext(name)[1].lower() in suffixes:
+                files.append((name, self._stats[os.path.join(key, name)] if want_stat else None))
+        return files, dirs
+
+    def walk(self, path: Path, topdown: bool = True) -> Iterator[Tuple[str, List[str], List[str]]]:
+        root = os.fspath(path)
+        children = self._children.get(self._key(path))
+        if children is None:
+            return
+        dirs = [name for name, is_dir in children.items() if is_dir]
+        files = [name for name, is_dir in children.items() if not is_dir]
+        if topdown:
+            yield root, dirs, files
+        for name in dirs:
+            yield from self.walk(os.path.join(root, name), topdown)
+        if not topdown:
+            yield root, dirs, files
+
+    def open_read(self, path: Path) -> BinaryIO:
+        key = self._key(path)
+        if key not in self._files:
+            raise _not_found(path)
+        return io.BytesIO(self._files[key])
+
+    def read_bytes(self, path: Path) -> bytes:
+        key = self._key(path)
+        if key not in self._files:
+            raise _not_found(path)
+        return self._files[key]
+
+    def write_temp(self, path: Path, chunks: Iterable[Union[str, bytes]], encoding: str = 'utf-8') -> Tuple[Path, int]:
+        data = b''.join(chunk.encode(encoding) if isinstance(chunk, str) else chunk for chunk in chunks)
+        tmp_path = temp_path_for(Path(path))
+        self._store(tmp_path, data)
+        return tmp_path, len(data)
+
+    def replace(self, src: Path, dst: Path):
+        src_key = self._key(src)
+        if src_key not in self._files:
+            raise _not_found(src)
+        data, st = self._files[src_key], self._stats[src_key]
+        self.unlink(src)
+        self._store(dst, data, mtime_ns=st.st_mtime_ns, mode=st.st_mode & 0o777)
+
+    def write_bytes(self, path: Path, data: bytes, mtime_ns: Optional[int] = None, mode: Optional[int] = None):
+        self._store(path, data, mtime_ns=mtime_ns, mode=mode)
+
+    def append(self, path: Path, data: bytes):
+        key = self._key(path)
+        self._store(path, self._files.get(key, b'') + data, mode=self._stats[key].st_mode & 0o777
+                    if key in self._stats else None)
+
+    def unlink(self, path: Path, missing_ok: bool = False):
+        key = self._key(path)
+        if key not in self._files:
+            if missing_ok:
+                return
+            raise _not_found(path)
+        del self._files[key]
+        del self._stats[key]
+        self._children[os.path.dirname(key) or os.curdir].pop(os.path.basename(key), None)
+
+    def mkdir(self, path: Path):
+        key = self._key(path)
+        if key in self._files:
+            raise FileExistsError(errno.EEXIST, os.strerror(errno.EEXIST), str(path))
+        if key not in self._children:
+            self._children[key] = {}
+            self._add_parents(key)
+
+    def rmdir(self, path: Path):
+        key = self._key(path)
+        if key not in self._children:
+            raise _not_found(path)
+        if self._children[key]:
+            raise OSError(errno.ENOTEMPTY, os.strerror(errno.ENOTEMPTY), str(path))
+        del self._children[key]
+        parent = os.path.dirname(key) or os.curdir
+        if parent in self._children:
+            self._children[parent].pop(os.path.basename(key), None)
+
+    def remove_tree(self, path: Path):
+        key = self._key(path)
+        if key not in self._children:
+            raise _not_found(path)
+        for root, dirs, files in list(self.walk(path, topdown=False)):
+            for name in files:
+                self.unlink(Path(root) / name)
+            for name in dirs:
+                self.rmdir(Path(root) / name)
+        self.rmdir(path)
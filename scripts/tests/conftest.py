@@ -0,0 +1,37 @@
+# -*- coding: utf-8 -*-
+"""文档合并脚本测试的公共夹具：脚本按同目录模块互相导入，测试时把 scripts/ 加入导入路径"""
+
+import sys
+from pathlib import Path
+from typing import Dict
+
+import pytest
+
+SCRIPTS_DIR = Path(__file__).resolve().parent.parent
+if str(SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(SCRIPTS_DIR))
+
+from generate_docs_corpus import generate_corpus  # noqa: E402
+
+REPORT_NAME = "文档合并总结报告.md"
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """在临时目录中运行合并器（备份、日志和状态目录均相对于当前目录）"""
+    monkeypatch.chdir(tmp_path)
+    return tmp_path
+
+
+@pytest.fixture
+def corpus(workdir) -> Path:
+    """合成的文档目录（中英文混合的 Markdown/txt，多个主题各有多篇文档）"""
+    docs = workdir / "docs"
+    generate_corpus(str(docs), 60, seed=7)
+    return docs
+
+
+def tree_contents(root: Path) -> Dict[str, bytes]:
+    """目录下全部文件的内容（不含带执行时间的总结报告）"""
+    return {path.relative_to(root).as_posix(): path.read_bytes()
+            for path in sorted(root.rglob('*')) if path.is_file() and path.name != REPORT_NAME}
@@ -0,0 +1,49 @@
+# -*- coding: utf-8 -*-
+"""编码识别与解码：混合编码的文件、只读取开头与完整读取的结果一致"""
+
+import codecs
+import logging
+
+from document_store import DocumentStore
+from text_decoding import SNIFF_BYTES, decode_bytes, decode_prefix
+
+CHINESE = "预算对比页面的数据修复记录，包含日期筛选和资产快照。\n"
+
+
+def utf8_with_bad_byte_after_sample() -> bytes:
+    """开头远超识别样本的合法 UTF-8，样本之后夹杂一个不合法的字节"""
+    head = (CHINESE * (SNIFF_BYTES // len(CHINESE.encode('utf-8')) + 10)).encode('utf-8')
+    return head + b"\xff" + CHINESE.encode('utf-8')
+
+
+def test_utf8_with_late_invalid_byte_keeps_utf8(caplog):
+    raw = utf8_with_bad_byte_after_sample()
+    with caplog.at_level(logging.WARNING):
+        text, encoding = decode_bytes(raw, "mixed.md")
+
+    assert encoding == 'utf-8'
+    assert text.count("�") == 1
+    assert text.replace("�", "") == raw.replace(b"\xff", b"").decode('utf-8')
+    assert "mixed.md" in caplog.text
+
+
+def test_prefix_matches_full_decode(tmp_path):
+    doc = tmp_path / "mixed.md"
+    doc.write_bytes(utf8_with_bad_byte_after_sample())
+
+    store = DocumentStore()
+    prefix = store.read_prefix(doc, 1000)
+    assert prefix == decode_prefix(doc.read_bytes()[:8192], 1000)
+    assert store.read_text(doc)[:1000] == prefix
+
+
+def test_legacy_chinese_encodings_decode():
+    text = CHINESE * 50
+    for encoding in ('gb18030', 'gbk'):
+        assert decode_bytes(text.encode(encoding))[0] == text
+    assert decode_bytes(codecs.BOM_UTF16_LE + text.encode('utf-16-le')) == (text, 'utf-16')
+    assert decode_bytes(codecs.BOM_UTF8 + text.encode('utf-8')) == (text, 'utf-8-sig')
+
+
+def test_crlf_is_normalized():
+    assert decode_bytes("第一行\r\n第二行\r第三行".encode('utf-8'))[0] == "第一行\n第二行\n第三行"
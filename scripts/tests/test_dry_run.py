@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""试运行：只生成合并计划，不写入任何文件（评分缓存、Word文本缓存、日志和指标文件）"""
+
+import zipfile
+
+import pytest
+
+from conftest import tree_contents
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+DOCUMENT_XML = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+    '<w:p><w:r><w:t>预算对比修复总结</w:t></w:r></w:p>'
+    '<w:p><w:r><w:t>预算 budget 数据修复</w:t></w:r></w:p>'
+    '</w:body></w:document>'
+)
+
+
+def write_docx(path):
+    with zipfile.ZipFile(path, 'w') as docx:
+        docx.writestr('word/document.xml', DOCUMENT_XML)
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_dry_run_writes_nothing(corpus, workdir, merger_class):
+    write_docx(corpus / "预算修复总结.docx")
+    before = tree_contents(workdir)
+
+    plan = merger_class(str(corpus), dry_run=True, jobs=2).run()
+
+    assert plan["themes"]
+    assert tree_contents(workdir) == before
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_dry_run_writes_requested_metrics_file(corpus, workdir, merger_class):
+    before = tree_contents(workdir)
+
+    merger_class(str(corpus), dry_run=True, metrics_path="metrics.json").run()
+
+    assert set(tree_contents(workdir)) - set(before) == {"metrics.json"}
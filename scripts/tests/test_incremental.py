@@ -0,0 +1,52 @@
+# -*- coding: utf-8 -*-
+"""增量模式：连续运行不应重复合并，合并文档本身不被当作新文档"""
+
+import pytest
+
+from conftest import tree_contents
+from doc_manifest import DocumentManifest
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+MERGERS = [DocumentMerger, EnhancedDocumentMerger]
+
+
+@pytest.mark.parametrize("merger_class", MERGERS)
+def test_consecutive_incremental_runs_are_noops(corpus, merger_class):
+    merger_class(str(corpus), incremental=True).run()
+    first = tree_contents(corpus)
+    assert any(name.endswith("_合并文档.md") for name in first)
+
+    for _ in range(2):
+        merger = merger_class(str(corpus), incremental=True)
+        merger.run()
+        assert merger.merged_outputs == {}
+        assert tree_contents(corpus) == first
+
+
+@pytest.mark.parametrize("merger_class", MERGERS)
+def test_incremental_run_after_change_remerges_once(corpus, merger_class):
+    merger_class(str(corpus), incremental=True).run()
+    added = [corpus / "预算修复补充.md", corpus / "预算对比说明.md"]
+    for doc in added:
+        doc.write_text(f"# {doc.stem}\n\n预算 budget 预算数据\n", encoding='utf-8')
+
+    merger = merger_class(str(corpus), incremental=True)
+    merger.run()
+    assert set(merger.merged_outputs.values()) == {"预算管理"}
+    assert not any(doc.exists() for doc in added)
+    after_change = tree_contents(corpus)
+
+    merger = merger_class(str(corpus), incremental=True)
+    merger.run()
+    assert merger.merged_outputs == {}
+    assert tree_contents(corpus) == after_change
+
+
+def test_manifest_is_ignored_for_another_docs_path(workdir):
+    manifest = DocumentManifest(workdir / "manifest.json", workdir / "docs", "config")
+    manifest.replace({"a.md": {"size": 1, "mtime_ns": 1, "hash": "x"}})
+    manifest.save()
+
+    assert DocumentManifest(workdir / "manifest.json", "./docs", "config").load()
+    assert not DocumentManifest(workdir / "manifest.json", workdir / "other_docs", "config").load()
@@ -0,0 +1,54 @@
+# -*- coding: utf-8 -*-
+"""并行分析（--jobs）和异步扫描（--io-concurrency）的结果必须与串行运行完全一致"""
+
+import re
+
+import pytest
+
+from conftest import tree_contents
+from generate_docs_corpus import generate_corpus
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+MERGERS = [DocumentMerger, EnhancedDocumentMerger]
+
+TIMESTAMP = re.compile(rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+def planned_themes(merger_class, docs, **options):
+    """试运行得到的主题分组、主文档和输出路径（串行时只为需要选主文档的主题评分，得分不参与比较）"""
+    return [
+        {"theme": theme["theme"], "action": theme["action"], "master": theme["master"],
+         "output": theme["output"], "delete": theme["delete"],
+         "documents": [doc["path"] for doc in theme["documents"]]}
+        for theme in merger_class(str(docs), dry_run=True, **options).run()["themes"]
+    ]
+
+
+def merged_result(workdir, merger_class, name, **options):
+    """在新生成的文档目录上完整运行一次，返回合并结果（去掉时间戳，不含总结报告）"""
+    docs = workdir / name / "docs"
+    generate_corpus(str(docs), 60, seed=7)
+    merger_class(str(docs), **options).run()
+    return {path: TIMESTAMP.sub(b"<time>", content)
+            for path, content in tree_contents(docs).items() if "总结报告" not in path}
+
+
+def assert_equivalent(workdir, corpus, merger_class, serial, concurrent):
+    themes = planned_themes(merger_class, corpus, **serial)
+    assert any(theme["action"] == "merge" for theme in themes)
+    assert planned_themes(merger_class, corpus, **concurrent) == themes
+
+    expected = merged_result(workdir, merger_class, "serial", **serial)
+    assert any(path.endswith("_合并文档.md") for path in expected)
+    assert merged_result(workdir, merger_class, "concurrent", **concurrent) == expected
+
+
+@pytest.mark.parametrize("merger_class", MERGERS)
+def test_jobs_do_not_change_results(workdir, corpus, merger_class):
+    assert_equivalent(workdir, corpus, merger_class, {"jobs": 1}, {"jobs": 3})
+
+
+@pytest.mark.parametrize("merger_class", MERGERS)
+def test_async_scan_does_not_change_results(workdir, corpus, merger_class):
+    assert_equivalent(workdir, corpus, merger_class, {"io_concurrency": 0}, {"io_concurrency": 8})
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+"""工作队列的主题锁：持有者崩溃后锁在超时后被回收，未超时的锁不能被抢占"""
+
+import json
+import os
+import time
+
+import pytest
+
+from conftest import tree_contents
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+from merge_queue import LockLost, WorkQueue
+
+
+def make_queue(tmp_path, lock_timeout=60.0) -> WorkQueue:
+    queue = WorkQueue(tmp_path / ".doc_merge_queue", "merge_docs_by_theme", tmp_path, lock_timeout=lock_timeout)
+    queue.create({"tool": "merge_docs_by_theme", "themes": []}, None)
+    return queue
+
+
+def leave_lock(queue: WorkQueue, name: str, age: float):
+    """模拟已崩溃的持有者留下的锁文件（最后一次心跳在 age 秒前）"""
+    lock_path = queue.lock_dir / f"{name}.lock"
+    lock_path.write_text(json.dumps({"worker": "crashed-host:1"}), encoding='utf-8')
+    stamp = time.time() - age
+    os.utime(lock_path, (stamp, stamp))
+
+
+def test_held_lock_is_not_claimed_twice(tmp_path):
+    queue = make_queue(tmp_path)
+    with queue.claim("0001") as lock:
+        assert lock is not None
+        assert queue.claim("0001") is None
+    assert queue.claim("0001") is not None
+
+
+def test_fresh_lock_of_crashed_worker_is_kept(tmp_path):
+    queue = make_queue(tmp_path)
+    leave_lock(queue, "0001", age=5)
+    assert queue.claim("0001") is None
+    assert queue.holder("0001") == "crashed-host:1"
+
+
+def test_stale_lock_is_reclaimed(tmp_path):
+    queue = make_queue(tmp_path)
+    leave_lock(queue, "0001", age=120)
+
+    lock = queue.claim("0001")
+    try:
+        assert lock is not None
+        assert queue.holder("0001") != "crashed-host:1"
+        assert not list(queue.lock_dir.glob(".*.stale"))
+    finally:
+        lock.release()
+    assert not (queue.lock_dir / "0001.lock").exists()
+
+
+def test_lock_taken_over_by_another_worker_is_left_alone(tmp_path):
+    queue = make_queue(tmp_path)
+    lock = queue.claim("0001")
+    leave_lock(queue, "0001", age=0)  # 超时后被回收并由其他工作进程重新认领
+
+    with pytest.raises(LockLost):
+        lock.verify()
+    lock.release()
+    assert queue.holder("0001") == "crashed-host:1"
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_worker_abandons_theme_when_its_lock_is_reclaimed(corpus, monkeypatch, merger_class):
+    merger_class(str(corpus)).coordinate()
+    before = tree_contents(corpus)
+    original = merger_class.write_merged_document
+    stolen = []
+
+    def write_merged_document(self, theme, docs, master_doc, merged_path):
+        if not stolen:
+            # 合并途中本进程的锁超时，被其他工作进程回收并重新认领
+            stolen.append(self.queue_lock.lock_path)
+            leave_lock(self.work_queue, self.queue_lock.lock_path.stem, age=0)
+        return original(self, theme, docs, master_doc, merged_path)
+
+    monkeypatch.setattr(merger_class, "write_merged_document", write_merged_document)
+    merger = merger_class(str(corpus))
+    merger.run_worker()
+
+    item_id = stolen[0].stem
+    queue = merger.work_queue
+    theme_plan = dict(queue.items(queue.load()))[item_id]
+    assert not queue.is_done(item_id)
+    assert queue.holder(item_id) == "crashed-host:1"
+    # 被放弃的主题不删除任何原文档
+    for doc in theme_plan["documents"]:
+        assert (corpus / doc["path"]).read_bytes() == before[doc["path"]]
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""预写日志：合并途中崩溃后 --resume 继续，结果与一次完整运行一致"""
+
+import re
+import shutil
+
+import pytest
+
+from conftest import tree_contents
+from generate_docs_corpus import generate_corpus
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+
+TIMESTAMP = re.compile(rb"\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}")
+
+
+def merged_tree(root):
+    """合并结果（去掉合并时间等时间戳，不含总结报告）"""
+    return {name: TIMESTAMP.sub(b"<time>", content)
+            for name, content in tree_contents(root).items() if "总结报告" not in name}
+
+
+class SimulatedCrash(BaseException):
+    """模拟进程被杀死（不被合并器的 except Exception 捕获）"""
+
+
+def crash_on_third_delete(monkeypatch, merger_class):
+    """第3个主题删除原文档时只删掉第一篇就崩溃"""
+    original = merger_class.delete_source_documents
+    calls = []
+
+    def delete_source_documents(self, docs):
+        calls.append(docs)
+        if len(calls) == 3:
+            original(self, docs[:1])
+            raise SimulatedCrash()
+        return original(self, docs)
+
+    monkeypatch.setattr(merger_class, "delete_source_documents", delete_source_documents)
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_resume_after_crash_matches_uninterrupted_run(workdir, monkeypatch, merger_class):
+    reference = workdir / "reference" / "docs"
+    generate_corpus(str(reference), 60, seed=7)
+    merger_class(str(reference)).run()
+
+    docs = workdir / "docs"
+    generate_corpus(str(docs), 60, seed=7)
+    with monkeypatch.context() as patch:
+        crash_on_third_delete(patch, merger_class)
+        with pytest.raises(SimulatedCrash):
+            merger_class(str(docs)).run()
+
+    # 未加 --resume 时拒绝在中断的合并上重新运行
+    with pytest.raises(RuntimeError, match="--resume"):
+        merger_class(str(docs)).run()
+
+    merger = merger_class(str(docs), resume=True)
+    merger.run()
+    assert merger.journal.load() is None
+    assert merged_tree(docs) == merged_tree(reference)
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_resume_refuses_a_different_docs_path(corpus, monkeypatch, merger_class):
+    with monkeypatch.context() as patch:
+        crash_on_third_delete(patch, merger_class)
+        with pytest.raises(SimulatedCrash):
+            merger_class(str(corpus)).run()
+
+    other = corpus.parent / "other_docs"
+    shutil.copytree(corpus, other)
+    before = tree_contents(other)
+    with pytest.raises(ValueError, match="不一致"):
+        merger_class(str(other), resume=True).run()
+    assert tree_contents(other) == before
+
+    # 同一目录换一种写法仍可继续
+    merger_class(f"./{corpus.name}", resume=True).run()
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+"""重要性评分缓存：并行分析时同样查询和写入缓存，运行结束后关闭缓存"""
+
+import pytest
+
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+MERGERS = [DocumentMerger, EnhancedDocumentMerger]
+
+
+@pytest.mark.parametrize("merger_class", MERGERS)
+def test_parallel_analysis_fills_and_uses_score_cache(corpus, merger_class):
+    first = merger_class(str(corpus), jobs=3)
+    documents = first.scan_documents()
+    first.classify_by_theme(documents)
+    first.score_cache.close()
+    assert first.metrics.counters.get("score_cache_misses") == len(documents)
+
+    second = merger_class(str(corpus), jobs=3)
+    second.classify_by_theme(second.scan_documents())
+    assert second.metrics.counters.get("score_cache_hits") == len(documents)
+    assert not second.metrics.counters.get("score_cache_misses")
+    assert second.doc_scores == first.doc_scores
+    second.score_cache.close()
+
+
+@pytest.mark.parametrize("merger_class", MERGERS)
+def test_score_cache_is_closed_after_run(corpus, merger_class):
+    merger = merger_class(str(corpus))
+    merger.run()
+    assert merger.metrics.counters.get("score_cache_misses")
+    assert merger.score_cache.conn is None
@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+"""分片输出：每个分片（含开头的标题）都不超过 --shard-size 上限"""
+
+from pathlib import Path
+
+import pytest
+
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+from merged_shards import MERGED_SUFFIX, iter_shards, write_shards
+from storage_backend import MemoryStorage
+
+
+def test_shard_size_includes_header():
+    sections = [(Path(f"docs/d{i}.md"), f"## 第{i}节\n" + "预算数据对比 budget line\n" * 40) for i in range(30)]
+
+    def header(number: int) -> str:
+        return f"# 预算管理（第 {number} 部分）\n\n> 📑 索引: [预算管理{MERGED_SUFFIX}]\n\n---\n\n"
+
+    storage = MemoryStorage()
+    merged_path = Path("docs") / f"预算管理{MERGED_SUFFIX}"
+    written = write_shards(merged_path, iter_shards(sections, 2048, header), header, storage=storage)
+
+    assert len(written) > 1
+    files = storage.files()
+    for number, shard in enumerate(written, 1):
+        data = files[shard.path]
+        assert len(data) == shard.size <= 2048
+        assert data.decode('utf-8').startswith(header(number))
+    bodies = ''.join(files[shard.path].decode('utf-8')[len(header(number)):]
+                     for number, shard in enumerate(written, 1))
+    assert bodies == ''.join(chunk for _, chunk in sections)
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_merged_shards_respect_shard_size(workdir, merger_class):
+    docs = workdir / "docs"
+    docs.mkdir()
+    for i in range(12):
+        lines = ''.join(f"## 预算问题 {i}-{n}\n预算数据修复结果总结 budget fix {n}\n" for n in range(60))
+        (docs / f"预算修复记录{i}.md").write_text(f"# 预算修复记录{i}\n\n{lines}", encoding='utf-8')
+
+    merger_class(str(docs), shard_bytes=8 * 1024).run()
+
+    shards = sorted(path for path in docs.rglob(f"*_[0-9][0-9][0-9]{MERGED_SUFFIX}"))
+    assert len(shards) > 1
+    assert max(path.stat().st_size for path in shards) <= 8 * 1024
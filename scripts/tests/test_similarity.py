@@ -0,0 +1,31 @@
+# -*- coding: utf-8 -*-
+"""按内容相似度分组：分组名清理成文件名后相同时，各分组仍写入各自的合并文档"""
+
+import pytest
+
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+TOPICS = {
+    "alpha beta": "预算 budget 审批流程 月度报表 导出 对账 差异 调整 科目 汇总 归档 复核",
+    "alpha_beta": "网络 network 超时 重试 代理 证书 域名 解析 连接池 断线 心跳 日志",
+}
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_colliding_group_names_get_separate_outputs(workdir, merger_class):
+    docs = workdir / "docs"
+    docs.mkdir()
+    for stem, words in TOPICS.items():
+        for number in (1, 2):
+            body = "\n".join(f"{words} 第{line}行" for line in range(20))
+            (docs / f"{stem} {number}.md").write_text(f"# {stem} {number}\n\n{body}\n", encoding='utf-8')
+
+    merger = merger_class(str(docs), grouping="similarity")
+    merger.run()
+
+    outputs = sorted(path.name for path in docs.rglob("*_合并文档.md"))
+    assert len(set(merger.merged_outputs.values())) == 2
+    assert outputs == ["alpha_beta_1-2_合并文档.md", "alpha_beta_1_合并文档.md"]
+    merged = "".join((docs / name).read_text(encoding='utf-8') for name in outputs)
+    assert "预算" in merged and "网络" in merged
@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""备份快照：快照按创建顺序排列，恢复时保留本工具的内部目录"""
+
+import json
+
+from merge_queue import QUEUE_DIR_NAMES
+from snapshot_store import SnapshotStore
+from storage_backend import MemoryStorage
+
+
+def test_snapshots_are_ordered_by_sequence_number():
+    ids = ["20261018_120000", "20261018_120000_1", "20261018_120000_2", "20261018_120000_10", "20261018_120001"]
+    storage = MemoryStorage({f"backup/snapshots/{snapshot_id}.json": json.dumps({"id": snapshot_id, "files": {}})
+                             for snapshot_id in reversed(ids)})
+    store = SnapshotStore("backup", storage=storage)
+
+    assert store.list_snapshots() == ids
+    assert store.load_snapshot("latest")["id"] == "20261018_120001"
+
+    storage.unlink(store.snapshots_path / "20261018_120001.json")
+    assert store.load_snapshot("latest")["id"] == "20261018_120000_10"
+
+
+def test_restore_keeps_queue_directory(tmp_path):
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "预算.md").write_text("# 预算\n", encoding='utf-8')
+    store = SnapshotStore(tmp_path / "backup", skip_dirs=QUEUE_DIR_NAMES)
+    snapshot = store.create(docs)
+
+    queue_file = docs / ".doc_merge_queue" / "queue.json"
+    queue_file.parent.mkdir()
+    queue_file.write_text("{}", encoding='utf-8')
+    (docs / "预算.md").unlink()
+    (docs / "新增.md").write_text("# 新增\n", encoding='utf-8')
+
+    result = store.restore(snapshot["id"], docs)
+
+    assert (docs / "预算.md").read_text(encoding='utf-8') == "# 预算\n"
+    assert not (docs / "新增.md").exists()
+    assert queue_file.read_text(encoding='utf-8') == "{}"
+    assert result["removed"] == 1
+    assert not any(path.startswith(".doc_merge_queue") for path in store.create(docs)["files"])
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""存储后端：不完整的后端在创建时报错，内存存储上可以完整运行合并流程"""
+
+import pytest
+
+from merge_docs_enhanced import EnhancedDocumentMerger
+from storage_backend import MemoryStorage, StorageBackend
+
+
+def test_incomplete_backend_fails_on_creation():
+    class ReadOnlyStorage(StorageBackend):
+        def stat(self, path):
+            raise FileNotFoundError(path)
+
+    with pytest.raises(TypeError):
+        ReadOnlyStorage()
+
+
+def test_merge_runs_in_memory(workdir):
+    storage = MemoryStorage({
+        "docs/a/预算修复.md": "# 预算修复\n\n预算 budget 修复\n",
+        "docs/a/预算总结.md": "# 预算总结\n\n预算 budget 总结\n",
+    })
+    EnhancedDocumentMerger("./docs", storage=storage).run()
+
+    names = {path.name for path in storage.files()}
+    assert "预算管理_合并文档.md" in names
+    assert not {"预算修复.md", "预算总结.md"} & names
+    assert list(workdir.iterdir()) == []
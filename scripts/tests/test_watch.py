@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+"""监视模式：合并器自身写入和删除的文件不触发下一轮合并"""
+
+import errno
+import os
+
+import pytest
+
+from doc_watcher import InotifyWatcher
+from merge_docs_by_theme import DocumentMerger
+from merge_docs_enhanced import EnhancedDocumentMerger
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_own_writes_and_deletions_are_recorded(corpus, merger_class):
+    before = set(corpus.rglob('*'))
+    merger = merger_class(str(corpus), incremental=True)
+    merger.run()
+    after = set(corpus.rglob('*'))
+
+    touched = {path for path in before ^ after | set(merger.merged_outputs) if merger.is_document(path)}
+    assert merger.merged_outputs and touched
+    assert [path for path in touched if not merger.is_recorded(path)] == []
+
+
+@pytest.mark.skipif(not InotifyWatcher.available(), reason="需要 inotify")
+def test_inotify_falls_back_to_polling_when_watch_limit_is_reached(tmp_path):
+    watcher = InotifyWatcher(tmp_path, lambda path: True, poll_interval=0.01)
+    try:
+        def exhausted(path):
+            raise OSError(errno.ENOSPC, f"无法监视目录 {path}: {os.strerror(errno.ENOSPC)}")
+        watcher._add_watch = exhausted
+
+        (tmp_path / "new").mkdir()
+        assert watcher.read_changes(timeout=1.0) == (set(), True)
+        assert watcher.name == "polling"
+
+        (tmp_path / "new" / "a.md").write_text("# a\n", encoding='utf-8')
+        changed, rescan = watcher.read_changes(timeout=1.0)
+        assert changed == {tmp_path / "new" / "a.md"} and not rescan
+    finally:
+        watcher.close()
+
+
+@pytest.mark.parametrize("merger_class", [DocumentMerger, EnhancedDocumentMerger])
+def test_each_watch_round_writes_its_own_metrics_file(corpus, workdir, merger_class):
+    merger = merger_class(str(corpus), incremental=True)
+    merger.run()
+    (corpus / "预算修复补充.md").write_text("# 预算修复补充\n\n预算 budget\n", encoding='utf-8')
+    merger.reset_run_state()
+    merger.run()
+
+    metrics_files = sorted((workdir / "logs").glob("*metrics*.json"))
+    assert len(metrics_files) == 2
+    assert len({path.read_text(encoding='utf-8') for path in metrics_files}) == 2
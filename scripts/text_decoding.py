@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文本编码识别与解码
+依次识别 BOM、快速校验 UTF-8，均不满足时只取一小段样本交给 chardet 判断编码
+（未安装 chardet 时按 GB18030 尝试），并支持只解码文件开头的一段字节
+"""
+
+import codecs
+import logging
+from typing import Optional, Tuple
+
+try:
+    import chardet
+except ImportError:  # chardet 为可选依赖
+    chardet = None
+
+# 编码识别使用的样本大小
+SNIFF_BYTES = 64 * 1024
+
+# 支持的编码中单个字符最多占用的字节数（UTF-8/GB18030/UTF-16 代理对均不超过4字节）
+MAX_BYTES_PER_CHAR = 4
+
+# 无法识别时的兜底编码（GBK/GB2312 的超集，覆盖常见的中文旧文档）
+FALLBACK_ENCODING = 'gb18030'
+
+# UTF-32 的 BOM 以 UTF-16 LE 的 BOM 开头，必须先判断
+BOMS = [
+    (codecs.BOM_UTF32_LE, 'utf-32'),
+    (codecs.BOM_UTF32_BE, 'utf-32'),
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+]
+
+# chardet 返回的编码名归一化（GB2312/GBK 统一按超集 GB18030 解码）
+ENCODING_ALIASES = {
+    'ascii': 'utf-8',
+    'gb2312': 'gb18030',
+    'gbk': 'gb18030',
+}
+
+
+def is_utf8(sample: bytes, complete: bool = True) -> bool:
+    """样本是否为合法的UTF-8（截断的样本允许末尾有不完整的多字节字符）"""
+    try:
+        sample.decode('utf-8')
+        return True
+    except UnicodeDecodeError as e:
+        return not complete and e.reason == 'unexpected end of data' and e.start >= len(sample) - 3
+
+
+def sniff_encoding(sample: bytes, complete: bool = True) -> str:
+    """根据样本判断编码：BOM → UTF-8 → chardet → GB18030"""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+
+    sample = sample[:SNIFF_BYTES]
+    if is_utf8(sample, complete and len(sample) < SNIFF_BYTES):
+        return 'utf-8'
+
+    if chardet is not None:
+        encoding = chardet.detect(sample).get('encoding')
+        if encoding:
+            encoding = encoding.lower()
+            return ENCODING_ALIASES.get(encoding, encoding)
+    return FALLBACK_ENCODING
+
+
+def normalize_newlines(text: str) -> str:
+    """与文本模式读取保持一致的换行处理"""
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+def decode_bytes(raw: bytes, source: str = "文件", logger: Optional[logging.Logger] = None) -> Tuple[str, str]:
+    """解码完整文件内容，返回文本和实际使用的编码；所有候选编码均失败时抛出 UnicodeDecodeError
+
+    识别为 UTF-8 的文件在样本之后出现个别不合法的字节时，只把这些字节替换为 U+FFFD 并记录警告，
+    不改按兜底编码解码整个文件（否则正确的 UTF-8 文本会变成乱码，且与 decode_prefix 的结果不一致）
+    """
+    encoding = sniff_encoding(raw)
+    try:
+        return normalize_newlines(raw.decode(encoding)), encoding
+    except (UnicodeDecodeError, LookupError) as e:
+        if isinstance(e, UnicodeDecodeError) and encoding in ('utf-8', 'utf-8-sig'):
+            (logger or logging.getLogger(__name__)).warning(
+                f"⚠️ {source} 按 {encoding} 解码时第 {e.start} 字节起有不合法的字节，已替换为 U+FFFD")
+            return normalize_newlines(raw.decode(encoding, errors='replace')), encoding
+        if encoding == FALLBACK_ENCODING:
+            raise
+    # 样本之后出现了不符合识别结果的字节，再按兜底编码尝试一次
+    return normalize_newlines(raw.decode(FALLBACK_ENCODING)), FALLBACK_ENCODING
+
+
+def decode_prefix(raw: bytes, max_chars: int) -> Optional[str]:
+    """解码文件开头的一段字节，返回前 max_chars 个字符；无法解码时返回None"""
+    encoding = sniff_encoding(raw, complete=False)
+    try:
+        decoder = codecs.getincrementaldecoder(encoding)(errors='strict')
+        text = decoder.decode(raw, final=False)
+    except (UnicodeDecodeError, LookupError):
+        return None
+    return normalize_newlines(text)[:max_chars]
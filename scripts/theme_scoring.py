@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量主题评分
+每个文档只扫描一次得到命中的关键词（及来源权重），随后把整个语料的命中情况组成
+文档×关键词稀疏矩阵，与关键词×主题矩阵相乘，一次得到所有文档在所有主题上的得分。
+安装了 NumPy/SciPy 时使用矩阵运算，否则使用等价的纯Python实现
+"""
+
+import math
+from typing import Dict, List, Sequence, Tuple
+
+from keyword_matcher import ThemeMatcher
+
+try:
+    import numpy as np
+except ImportError:  # NumPy 为可选依赖
+    np = None
+
+try:
+    from scipy import sparse
+except ImportError:  # SciPy 为可选依赖
+    sparse = None
+
+# keywords: 命中关键词按来源权重计分（与逐文档计分完全一致）
+# tfidf: 再乘以关键词的逆文档频率，“问题”“修复”等在大量文档中出现的关键词权重降低
+SCORING_MODES = ["keywords", "tfidf"]
+
+KeywordHits = Dict[int, int]
+
+
+class ThemeScorer:
+    def __init__(self, matcher: ThemeMatcher, mode: str = "keywords"):
+        if mode not in SCORING_MODES:
+            raise ValueError(f"未知的主题评分方式: {mode}")
+        self.matcher = matcher
+        self.themes = matcher.themes
+        self.mode = mode
+        if sparse is not None and np is not None:
+            self.backend = "scipy"
+        elif np is not None:
+            self.backend = "numpy"
+        else:
+            self.backend = "python"
+
+    def idf(self, doc_hits: Sequence[KeywordHits]) -> List[float]:
+        """各关键词的平滑逆文档频率 ln((1+N)/(1+df)) + 1"""
+        df = [0] * self.matcher.keyword_count
+        for hits in doc_hits:
+            for keyword_id in hits:
+                df[keyword_id] += 1
+        total = len(doc_hits)
+        return [math.log((1 + total) / (1 + count)) + 1 for count in df]
+
+    def score_matrix(self, doc_hits: Sequence[KeywordHits]) -> List[List[float]]:
+        """返回文档×主题得分矩阵（行顺序与输入一致，列顺序与主题表一致）"""
+        if not doc_hits:
+            return []
+        weights = self.idf(doc_hits) if self.mode == "tfidf" else None
+        if self.backend == "python":
+            return self._score_python(doc_hits, weights)
+
+        keyword_themes = self.matcher.keyword_themes
+        rows, cols, values = [], [], []
+        for row, hits in enumerate(doc_hits):
+            for keyword_id, weight in hits.items():
+                rows.append(row)
+                cols.append(keyword_id)
+                values.append(weight * weights[keyword_id] if weights else weight)
+        theme_rows = [keyword_id for keyword_id, themes in enumerate(keyword_themes) for _ in themes]
+        theme_cols = [theme_index for themes in keyword_themes for theme_index in themes]
+        shape = (len(doc_hits), len(keyword_themes))
+        theme_shape = (len(keyword_themes), len(self.themes))
+
+        if self.backend == "scipy":
+            # 重复的 (行, 列) 会被累加，同一关键词在一个主题中出现多次时按次数计分，与逐个计数一致
+            hit_matrix = sparse.csr_matrix((values, (rows, cols)), shape=shape, dtype=np.float64)
+            theme_matrix = sparse.csr_matrix(
+                (np.ones(len(theme_rows)), (theme_rows, theme_cols)), shape=theme_shape, dtype=np.float64
+            )
+            scores = (hit_matrix @ theme_matrix).toarray()
+        else:
+            hit_matrix = np.zeros(shape)
+            np.add.at(hit_matrix, (rows, cols), values)
+            theme_matrix = np.zeros(theme_shape)
+            np.add.at(theme_matrix, (theme_rows, theme_cols), 1.0)
+            scores = hit_matrix @ theme_matrix
+        return scores.tolist()
+
+    def _score_python(self, doc_hits: Sequence[KeywordHits], weights) -> List[List[float]]:
+        keyword_themes = self.matcher.keyword_themes
+        matrix = []
+        for hits in doc_hits:
+            scores = [0] * len(self.themes)
+            for keyword_id, weight in hits.items():
+                value = weight * weights[keyword_id] if weights else weight
+                for theme_index in keyword_themes[keyword_id]:
+                    scores[theme_index] += value
+            matrix.append(scores)
+        return matrix
+
+    def matches(self, scores: Sequence[float]) -> List[Tuple[str, float]]:
+        """得分大于0的主题（按主题表顺序）；keywords 模式下得分为整数"""
+        if self.mode == "keywords":
+            return [(theme, int(round(score))) for theme, score in zip(self.themes, scores) if score > 0]
+        return [(theme, round(score, 4)) for theme, score in zip(self.themes, scores) if score > 0]
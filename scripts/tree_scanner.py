@@ -0,0 +1,192 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文档目录扫描
+基于 os.scandir：目录项自带的类型信息用于区分文件和目录，扩展名不符的文件只做一次字符串比较、
+不创建 Path 对象；互不依赖的子目录可以在线程池中同时列出。
+忽略规则使用 .gitignore 语法，在扫描前一次性编译为正则，被忽略的目录整棵跳过。
+返回的文档顺序与 os.walk 的同步扫描完全一致
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+# 文档目录中的忽略规则文件（.gitignore 语法）
+IGNORE_FILE = '.docmergeignore'
+
+# 默认的扫描线程数（同时列出的目录数）
+DEFAULT_SCAN_THREADS = 4
+
+
+def _translate(pattern: str) -> str:
+    """将 .gitignore 的通配符模式转换为正则（* 不跨越目录，** 匹配任意层目录）"""
+    parts = []
+    i, n = 0, len(pattern)
+    while i < n:
+        c = pattern[i]
+        if pattern.startswith('**/', i):
+            parts.append('(?:.*/)?')
+            i += 3
+        elif pattern.startswith('**', i):
+            parts.append('.*')
+            i += 2
+        elif c == '*':
+            parts.append('[^/]*')
+            i += 1
+        elif c == '?':
+            parts.append('[^/]')
+            i += 1
+        elif c == '[':
+            end = pattern.find(']', i + 2)
+            if end < 0:
+                parts.append(re.escape(c))
+                i += 1
+                continue
+            body = pattern[i + 1:end]
+            if body[0] in '!^':
+                body = '^' + body[1:]
+            parts.append('[' + body.replace('\\', '\\\\') + ']')
+            i = end + 1
+        elif c == '\\' and i + 1 < n:
+            parts.append(re.escape(pattern[i + 1]))
+            i += 2
+        else:
+            parts.append(re.escape(c))
+            i += 1
+    return ''.join(parts)
+
+
+class IgnoreRules:
+    """按 .gitignore 语法编译的忽略规则（后出现的规则优先，! 开头的规则重新包含）"""
+
+    def __init__(self, patterns: Iterable[str] = ()):
+        self.patterns: List[str] = []
+        self._rules: List[Tuple["re.Pattern", bool, bool]] = []
+        for pattern in patterns:
+            self.add(pattern)
+
+    def add(self, pattern: str):
+        pattern = pattern.rstrip('\n').rstrip()
+        if not pattern or pattern.startswith('#'):
+            return
+        self.patterns.append(pattern)
+
+        negate = pattern.startswith('!')
+        if negate:
+            pattern = pattern[1:]
+        elif pattern.startswith(('\\!', '\\#')):
+            pattern = pattern[1:]
+        dir_only = pattern.endswith('/')
+        pattern = pattern.rstrip('/')
+        # 含有斜杠（末尾的除外）的模式相对于文档目录，否则匹配任意层级下的同名文件或目录
+        anchored = '/' in pattern
+        pattern = pattern.lstrip('/')
+        if not pattern:
+            return
+        regex = _translate(pattern)
+        if not anchored:
+            regex = '(?:.*/)?' + regex
+        self._rules.append((re.compile(regex + r'\Z', re.DOTALL), negate, dir_only))
+
+    def add_file(self, ignore_file: Path, storage=None):
+        """追加忽略规则文件中的规则（文件不存在时忽略）；指定存储后端时经由存储后端读取"""
+        if storage is not None:
+            if storage.exists(ignore_file) and not storage.is_dir(ignore_file):
+                for line in storage.read_bytes(ignore_file).decode('utf-8').splitlines():
+                    self.add(line)
+        elif Path(ignore_file).is_file():
+            with open(ignore_file, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self.add(line)
+
+    def match(self, rel_path: str, is_dir: bool = False) -> bool:
+        """相对路径（POSIX格式）本身是否被忽略；不检查上级目录，扫描时被忽略的目录已整棵跳过"""
+        for regex, negate, dir_only in reversed(self._rules):
+            if dir_only and not is_dir:
+                continue
+            if regex.match(rel_path):
+                return not negate
+        return False
+
+
+def list_directory(path: Path, suffixes: Optional[Set[str]] = None,
+                   want_stat: bool = False) -> Tuple[List[Tuple[str, Optional[os.stat_result]]], List[str]]:
+    """列出目录中扩展名符合的文件（可附带 stat 信息）和可进入的子目录，顺序与 os.walk 一致"""
+    files, dirs = [], []
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    is_dir = entry.is_dir()
+                except OSError:
+                    is_dir = False
+                if is_dir:
+                    try:
+                        # os.walk 默认不进入指向目录的符号链接
+                        if not entry.is_symlink():
+                            dirs.append(entry.name)
+                    except OSError:
+                        pass
+                    continue
+                if suffixes is not None and os.path.splitext(entry.name)[1].lower() not in suffixes:
+                    continue
+                st = None
+                if want_stat:
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        pass
+                files.append((entry.name, st))
+    except OSError:
+        pass  # 与 os.walk 一致，忽略无法列出的目录
+    return files, dirs
+
+
+def scan_tree(root: Path, keep_directory: Callable[[Path], bool], is_document: Callable[[Path], bool],
+              suffixes: Optional[Set[str]] = None, threads: int = DEFAULT_SCAN_THREADS,
+              stats: Optional[Dict[Path, os.stat_result]] = None,
+              lister: Callable[..., Tuple[list, List[str]]] = list_directory) -> List[Path]:
+    """扫描目录树中的文档
+
+    suffixes 为小写扩展名集合，不符合的文件直接跳过（is_document 只对其余文件调用）；
+    指定 stats 时顺带记录各文档的 stat 信息。threads 大于1时逐层并行列出同一层的所有目录。
+    lister 为列出单个目录的函数（默认直接访问本地磁盘，可换成存储后端的 list_directory）
+    """
+    root = Path(root)
+    want_stat = stats is not None
+    listings: Dict[Path, Tuple[List[Path], List[Path]]] = {}
+
+    def visit(path: Path, listing) -> List[Path]:
+        file_entries, dir_names = listing
+        files = []
+        for name, st in file_entries:
+            file_path = path / name
+            if is_document(file_path):
+                files.append(file_path)
+                if want_stat and st is not None:
+                    stats[file_path] = st
+        dirs = [path / name for name in dir_names if keep_directory(path / name)]
+        listings[path] = (files, dirs)
+        return dirs
+
+    level = [root]
+    if threads > 1:
+        with ThreadPoolExecutor(max_workers=threads, thread_name_prefix="doc-scan") as executor:
+            while level:
+                results = executor.map(lambda p: lister(p, suffixes, want_stat), level)
+                level = [d for path, listing in zip(level, results) for d in visit(path, listing)]
+    else:
+        while level:
+            level = [d for path in level for d in visit(path, lister(path, suffixes, want_stat))]
+
+    # 按 os.walk 的先序顺序（先本目录文件，再依次进入子目录）还原文档顺序
+    documents: List[Path] = []
+    stack = [root]
+    while stack:
+        files, dirs = listings.get(stack.pop(), ([], []))
+        documents.extend(files)
+        stack.extend(reversed(dirs))
+    return documents